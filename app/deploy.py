@@ -5,31 +5,37 @@ Epic Games Free Game Collection Deployment Module
 This module orchestrates the automated collection of free games from Epic Games Store
 using browser automation and scheduling capabilities.
 
+The browser stack (playwright, camoufox, browserforge) and the scheduler are imported
+on first use, so `python deploy.py --check` can answer "is there anything to claim?"
+from the promotions feed and the local ledger without paying for them.
+
 @Time    : 2025/7/16 21:28
 @Author  : QIN2DIM
 @GitHub  : https://github.com/QIN2DIM
 """
 
+import argparse
 import asyncio
 import json
 import signal
 import sys
 from contextlib import suppress
 from datetime import datetime
+from typing import TYPE_CHECKING
 
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
-from browserforge.fingerprints import Screen
-from camoufox import AsyncCamoufox
 from loguru import logger
-from playwright.async_api import ViewportSize
-from pytz import timezone
 
-from services.epic_authorization_service import EpicAuthorization
-from services.epic_games_service import EpicAgent
-from settings import LOG_DIR, RECORD_DIR
+from services.account_service import load_accounts
+from services.http_service import aclose_http_client
+from services.metrics_service import instrument_scheduler, observe_job, start_metrics_server
+from services.preflight_service import preflight
+from services.tracing_service import span, trace_attributes, tracer
+from settings import LOG_DIR
 from settings import settings
-from utils import init_log
+from utils import TIMEZONE, init_log
+
+if TYPE_CHECKING:
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 # Initialize logging configuration for runtime, error, and serialization logs
 init_log(
@@ -38,12 +44,9 @@ init_log(
     serialize=LOG_DIR.joinpath("serialize.log"),
 )
 
-# Default timezone for scheduling operations
-TIMEZONE = timezone("Asia/Shanghai")
 
-
-@logger.catch
-async def execute_browser_tasks(headless: bool = True):
+@logger.catch(default=False)
+async def execute_browser_tasks(headless: bool = True) -> bool:
     """
     Execute Epic Games free game collection tasks using browser automation.
 
@@ -52,47 +55,119 @@ async def execute_browser_tasks(headless: bool = True):
 
     Args:
         headless: Whether to run browser in headless mode
+
+    Returns:
+        False if the workflow raised (the error is logged instead of propagated)
     """
+    from services.browser_service import open_browser_context
+    from services.epic_authorization_service import EpicAuthorization
+    from services.epic_games_service import EpicAgent
+    from services.network_service import apply_network_profile
+    from services.recording_service import RecordingSession
+
     logger.debug("Starting Epic Games collection task")
 
-    # Configure browser with anti-detection features and video recording
-    async with AsyncCamoufox(
-        persistent_context=True,
-        user_data_dir=settings.user_data_dir,
-        screen=Screen(max_width=1920, max_height=1080, min_height=1080, min_width=1920),
-        record_video_dir=RECORD_DIR,
-        record_video_size=ViewportSize(width=1920, height=1080),
-        humanize=0.2,
-        headless=headless,
-    ) as browser:
-        # Initialize or reuse existing browser page
-        page = browser.pages[0] if browser.pages else await browser.new_page()
-        logger.debug("Browser initialized successfully")
-
-        # Handle Epic Games authentication
-        logger.debug("Initiating Epic Games authentication")
-        agent = EpicAuthorization(page)
-        await agent.invoke()
-        logger.debug("Authentication completed")
-
-        # Execute a free games collection on new page
-        logger.debug("Starting free games collection process")
-        game_page = await browser.new_page()
-        agent = EpicAgent(game_page)
-        await agent.collect_epic_games()
-        logger.debug("Free games collection completed")
-
-        # Cleanup browser resources
-        logger.debug("Cleaning up browser resources")
-        with suppress(Exception):
-            for p in browser.pages:
-                await p.close()
-
-        with suppress(Exception):
-            await browser.close()
+    # Configure browser with anti-detection features and the video recording policy
+    # The context is either the persistent profile or a fresh one restored from storage_state
+    with (
+        trace_attributes(account=settings.EPIC_EMAIL),
+        span("run"),
+        RecordingSession() as recording,
+    ):
+        async with open_browser_context(
+            settings.user_data_dir, headless=headless, **recording.context_options()
+        ) as browser:
+            # Block heavy store resources before any navigation happens
+            network_stats = await apply_network_profile(browser)
+
+            # Initialize or reuse existing browser page
+            page = browser.pages[0] if browser.pages else await browser.new_page()
+            logger.debug("Browser initialized successfully")
+
+            # Handle Epic Games authentication
+            logger.debug("Initiating Epic Games authentication")
+            agent = EpicAuthorization(page)
+            await agent.invoke()
+            logger.debug("Authentication completed")
+
+            # Execute a free games collection on new page
+            logger.debug("Starting free games collection process")
+            game_page = await browser.new_page()
+            agent = EpicAgent(game_page)
+            await agent.collect_epic_games()
+            logger.debug("Free games collection completed")
+
+            if network_stats:
+                network_stats.log_summary()
+
+            # Cleanup pages, the context itself is closed after its storage state is exported
+            logger.debug("Cleaning up browser resources")
+            with suppress(Exception):
+                for p in browser.pages:
+                    await p.close()
 
         logger.debug("Browser tasks execution finished successfully")
 
+    tracer.flush()
+    return True
+
+
+async def execute_scheduled_tasks(
+    headless: bool = True, scheduler: "AsyncIOScheduler | None" = None
+) -> bool:
+    """
+    Run the browser tasks only for accounts where the preflight stage finds something to claim.
+
+    The preflight reads the promotion windows and the local claim ledger without
+    launching a browser. With more than one registered account, the pending accounts
+    are driven concurrently by the account pool. When a scheduler is given, a one-off
+    job is also registered for the start of the next promotion window.
+
+    Args:
+        headless: Whether to run browser in headless mode
+        scheduler: The running scheduler used to register the next wake-up
+
+    Returns:
+        False if any account's browser run failed; the scheduler listener records it as an error
+    """
+    accounts = load_accounts()
+
+    plans = {}
+    if settings.ENABLE_PREFLIGHT:
+        plans = {a.email: await preflight(a.email, country=a.country) for a in accounts}
+    pending = [a for a in accounts if a.email not in plans or plans[a.email].should_run]
+
+    ok = True
+    if not pending:
+        logger.success("Skip browser tasks - All active promotions are already claimed")
+    elif len(accounts) > 1:
+        from services.account_pool_service import AccountPool
+
+        results = await AccountPool(pending, headless=headless).run()
+        ok = all(results.values())
+    else:
+        ok = await execute_browser_tasks(headless=headless)
+
+    wakeups = [p.next_wakeup for p in plans.values() if p.next_wakeup]
+    if scheduler and wakeups:
+        from apscheduler.triggers.date import DateTrigger
+
+        next_wakeup = min(wakeups)
+        scheduler.add_job(
+            execute_scheduled_tasks,
+            trigger=DateTrigger(run_date=next_wakeup),
+            id="promotion_window_task",
+            name="promotion_window_task",
+            args=[headless, scheduler],
+            replace_existing=True,
+            max_instances=1,
+        )
+        logger.debug(
+            f"Next promotion window wake-up: {next_wakeup.astimezone(TIMEZONE).strftime('%Y-%m-%d %H:%M:%S %Z')}"
+        )
+
+    return ok
+
 
 async def deploy():
     """
@@ -110,37 +185,46 @@ async def deploy():
         f"Starting deployment with configuration: {json.dumps(sj, indent=2, ensure_ascii=False)}"
     )
 
-    # Execute an immediate collection task
-    await execute_browser_tasks(headless=headless)
+    # Expose Prometheus metrics when METRICS_PORT is configured
+    start_metrics_server()
 
     # Skip scheduler setup if disabled in configuration
     if not settings.ENABLE_APSCHEDULER:
+        await execute_scheduled_tasks(headless=headless)
         logger.debug("Scheduler is disabled, deployment completed")
         return
 
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+    from apscheduler.triggers.cron import CronTrigger
+
     # Initialize and configure async scheduler
     scheduler = AsyncIOScheduler()
+    refresh_next_runs = instrument_scheduler(scheduler)
+
+    # Execute an immediate collection task
+    with observe_job("startup_task") as run:
+        run.ok = await execute_scheduled_tasks(headless=headless, scheduler=scheduler)
 
     # Strategy 1: Thursday 23:30 to Friday 03:30, every hour (Beijing Time)
     scheduler.add_job(
-        execute_browser_tasks,
+        execute_scheduled_tasks,
         trigger=CronTrigger(
             day_of_week="thu", hour="23,0,1,2,3", minute="30", timezone="Asia/Shanghai"
         ),
         id="weekly_epic_games_task",
         name="weekly_epic_games_task",
-        args=[headless],
+        args=[headless, scheduler],
         replace_existing=False,
         max_instances=1,
     )
 
     # Strategy 2: Daily at 12:00 PM (Beijing Time)
     scheduler.add_job(
-        execute_browser_tasks,
+        execute_scheduled_tasks,
         trigger=CronTrigger(hour="12", minute="0", timezone="Asia/Shanghai"),
         id="daily_epic_games_task",
         name="daily_epic_games_task",
-        args=[headless],
+        args=[headless, scheduler],
         replace_existing=False,
         max_instances=1,
     )
@@ -158,6 +242,7 @@ async def deploy():
 
     # Start scheduler and log status information
     scheduler.start()
+    refresh_next_runs()
     logger.debug("Epic Games scheduler started successfully")
     logger.debug(f"Current time: {datetime.now(TIMEZONE).strftime('%Y-%m-%d %H:%M:%S %Z')}")
 
@@ -179,5 +264,43 @@ async def deploy():
         logger.success("Scheduler stopped gracefully")
 
 
+async def check() -> bool:
+    """
+    Report whether any account has a promotion left to claim, without launching a browser.
+
+    Only the promotions feed and the local claim ledger are read, so this is cheap enough
+    to gate short-lived containers from a cron job: `python deploy.py --check && ...`
+
+    Returns:
+        True if at least one account should run the browser tasks
+    """
+    accounts = load_accounts()
+    try:
+        plans = await asyncio.gather(*(preflight(a.email, country=a.country) for a in accounts))
+    finally:
+        await aclose_http_client()
+
+    report = [
+        {
+            "email": a.email,
+            "should_run": p.should_run,
+            "reason": p.reason,
+            "claimable": [o.title for o in p.claimable],
+            "next_wakeup": p.next_wakeup.isoformat() if p.next_wakeup else None,
+        }
+        for a, p in zip(accounts, plans)
+    ]
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return any(p.should_run for p in plans)
+
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Claim weekly free games from Epic Games Store")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="only report whether there is anything to claim (exit code 0 = yes, 1 = no)",
+    )
+    if parser.parse_args().check:
+        sys.exit(0 if asyncio.run(check()) else 1)
     asyncio.run(deploy())
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/13 09:20
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : AiHubMix 中转补丁：修正 genai.Client 的 base_url，并用内存中的 Base64 绕过文件上传
+
+google.genai 与 hcaptcha_challenger 的导入都很重（合计约 1s），补丁不再在 import settings 时
+应用，而是由 SolverManager 在创建第一个求解器之前调用 install_aihubmix_patch()。
+"""
+import asyncio
+import hashlib
+from collections import OrderedDict
+from pathlib import Path
+
+from loguru import logger
+
+from services.metrics_service import record_llm_call
+from services.model_router_service import ModelRouter, Route
+from services.tracing_service import record_llm_usage, span
+from settings import settings
+
+_installed = False
+
+
+def relay_url(base_url: str) -> str:
+    """AiHubMix 的 Gemini 兼容接口挂在 /gemini 下"""
+    base_url = base_url.rstrip('/')
+    if base_url.endswith('/v1'): base_url = base_url[:-3]
+    if not base_url.endswith('/gemini'): base_url = f"{base_url}/gemini"
+    return base_url
+
+
+class BypassFileCache:
+    """
+    伪造上传的图片缓存：按内容哈希去重，引用计数归零（generate_content 消费完）即释放，
+    同时受数量与内存上限约束，未被消费的残留条目按 LRU 淘汰
+    """
+
+    PREFIX = "bypass_"
+
+    def __init__(self, max_items: int, max_bytes: int):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, list]" = OrderedDict()  # file_id -> [data, refs]
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, file_id: str) -> bool:
+        return file_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def put(self, data: bytes) -> str:
+        file_id = f"{self.PREFIX}{hashlib.sha256(data).hexdigest()}"
+        if entry := self._entries.get(file_id):
+            entry[1] += 1
+            self._entries.move_to_end(file_id)
+        else:
+            self._entries[file_id] = [data, 1]
+            self._bytes += len(data)
+            self._evict()
+        return file_id
+
+    def consume(self, file_id: str) -> bytes | None:
+        entry = self._entries.get(file_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        entry[1] -= 1
+        if entry[1] <= 0:
+            self._drop(file_id)
+        return entry[0]
+
+    def _drop(self, file_id: str):
+        data, _ = self._entries.pop(file_id)
+        self._bytes -= len(data)
+
+    def _evict(self):
+        # 保留刚写入的条目，即使它本身超过内存上限
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_items or self._bytes > self.max_bytes
+        ):
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "items": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+bypass_file_cache = BypassFileCache(
+    max_items=settings.BYPASS_CACHE_MAX_ITEMS, max_bytes=settings.BYPASS_CACHE_MAX_MB * 1024 * 1024
+)
+
+def install_aihubmix_patch():
+    """幂等，多次调用只应用一次"""
+    global _installed
+    if _installed or not settings.GEMINI_API_KEY:
+        return
+    _installed = True
+
+    try:
+        from google import genai
+        from google.genai import types
+        
+        # 1. 劫持 Client 初始化 (自动修正中转路径)
+        orig_init = genai.Client.__init__
+        def new_init(self, *args, **kwargs):
+            if hasattr(settings.GEMINI_API_KEY, 'get_secret_value'):
+                api_key = settings.GEMINI_API_KEY.get_secret_value()
+            else:
+                api_key = str(settings.GEMINI_API_KEY)
+            
+            kwargs['api_key'] = api_key
+            
+            base_url = relay_url(settings.GEMINI_BASE_URL)
+            kwargs['http_options'] = types.HttpOptions(base_url=base_url)
+            logger.info(f"🚀 AiHubMix 补丁已应用 | 模型: {settings.GEMINI_MODEL} | 地址: {base_url}")
+            orig_init(self, *args, **kwargs)
+        
+        genai.Client.__init__ = new_init
+
+        # 2. 劫持文件上传 (绕过 400/403 错误，并修复 TypeError)
+        try:
+            # 自定义 helper，避免依赖 google 内部库
+            def _local_to_list(c):
+                return c if isinstance(c, list) else [c]
+
+            async def patched_upload(self_files, file, **kwargs):
+                if hasattr(file, 'read'): content = file.read()
+                elif isinstance(file, (str, Path)):
+                    with open(file, 'rb') as f: content = f.read()
+                else: content = bytes(file)
+                
+                if asyncio.iscoroutine(content): content = await content
+                
+                # 伪造文件上传，实际只存内存（按内容哈希去重，消费后释放）
+                file_id = bypass_file_cache.put(content)
+                return types.File(name=file_id, uri=file_id, mime_type="image/png")
+
+            orig_generate = genai.models.AsyncModels.generate_content
+            router = ModelRouter.from_settings()
+            relay_clients = {}
+
+            def _models_for(self_models, route: Route):
+                if route.base_url is None:
+                    return self_models
+                # 备用中转的客户端绕过 new_init，否则 base_url 会被改回 GEMINI_BASE_URL
+                if route.base_url not in relay_clients:
+                    client = genai.Client.__new__(genai.Client)
+                    orig_init(
+                        client,
+                        api_key=settings.GEMINI_API_KEY.get_secret_value(),
+                        http_options=types.HttpOptions(base_url=relay_url(route.base_url)),
+                    )
+                    relay_clients[route.base_url] = client
+                return relay_clients[route.base_url].aio.models
+
+            async def patched_generate(self_models, model, contents, **kwargs):
+                normalized = _local_to_list(contents)
+                
+                for content in normalized:
+                    if hasattr(content, 'parts'):
+                        for i, part in enumerate(content.parts):
+                            # 如果发现是我们伪造的文件 ID，立马替换成 Base64
+                            file_uri = part.file_data.file_uri if part.file_data else None
+                            if not file_uri or not file_uri.startswith(BypassFileCache.PREFIX):
+                                continue
+                            data = bypass_file_cache.consume(file_uri)
+                            if data is None:
+                                logger.warning(
+                                    f"Bypass cache miss - {file_uri=} stats={bypass_file_cache.stats}"
+                                )
+                                continue
+                            content.parts[i] = types.Part.from_bytes(data=data, mime_type="image/png")
+                
+                # [核心修复点] 强制使用关键字参数 model= 和 contents=
+                # 这解决了 "takes 1 positional argument but 3 were given" 的报错
+                async def _call(route: Route):
+                    record_llm_call(route.model)
+                    attributes = {"llm.model": route.model, "llm.requested_model": model}
+                    if route.base_url:
+                        attributes["llm.base_url"] = route.base_url
+                    with span("llm.generate_content", **attributes) as s:
+                        response = await orig_generate(
+                            _models_for(self_models, route),
+                            model=route.model,
+                            contents=normalized,
+                            **kwargs,
+                        )
+                        record_llm_usage(s, route.model, response)
+                    return response
+
+                if not settings.ENABLE_MODEL_ROUTER:
+                    return await _call(Route(model))
+                return await router.generate(_call, model)
+
+            genai.files.AsyncFiles.upload = patched_upload
+            genai.models.AsyncModels.generate_content = patched_generate
+            logger.info("🚀 Base64 文件绕过补丁加载成功 (参数兼容版)")
+            
+        except Exception as ie:
+            logger.warning(f"⚠️ 文件绕过补丁依然失败: {ie}")
+
+    except Exception as e:
+        logger.error(f"❌ 严重：AiHubMix 补丁加载完全失败! 原因: {e}")
@@ -29,11 +29,11 @@ def init_app():
         worker_concurrency=settings.CELERY_WORKER_CONCURRENCY,
     )
 
-    imports = ["schedule.epic_collect_games_task"]
+    imports = ["schedule.collect_epic_games_task"]
     beat_schedule = {
-        "epic_collect_games_task": {
-            "task": "schedule.epic_collect_games_task.epic_collect_games_task",
-            "schedule": crontab("1 */5 * * *"),
+        "discover_promotions_task": {
+            "task": "schedule.collect_epic_games_task.discover_promotions_task",
+            "schedule": crontab(minute="1", hour="*/5"),
         }
     }
     celery_app.conf.update(beat_schedule=beat_schedule, imports=imports)
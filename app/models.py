@@ -4,9 +4,17 @@
 # GitHub     : https://github.com/QIN2DIM
 # Description:
 
+from datetime import datetime
 from typing import List
 
-from pydantic import BaseModel, Field
+from loguru import logger
+from pydantic import BaseModel, ConfigDict, Field, SecretStr, ValidationError, field_validator
+
+
+class Account(BaseModel):
+    email: str
+    password: SecretStr
+    country: str | None = None
 
 
 class OrderItem(BaseModel):
@@ -18,6 +26,7 @@ class OrderItem(BaseModel):
 class Order(BaseModel):
     orderType: str
     orderId: str
+    createdAtMillis: int | None = None
     items: List[OrderItem] = Field(default_factory=list)
 
 
@@ -27,9 +36,110 @@ class CompletedOrder(BaseModel):
 
 
 class PromotionGame(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     title: str
     id: str
     namespace: str
     description: str
     offerType: str
     url: str
+    # 可领取该促销的国家/地区，为空表示不区分地区
+    regions: List[str] = Field(default_factory=list)
+
+    def is_available_in(self, country: str | None) -> bool:
+        return not self.regions or not country or country.upper() in self.regions
+
+
+# ----------------------------------------------------------------
+# freeGamesPromotions
+# 只声明用到的字段，其余字段在校验时直接丢弃
+# ----------------------------------------------------------------
+
+
+class FeedModel(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
+
+class DiscountSetting(FeedModel):
+    discountType: str | None = None
+    discountPercentage: int | None = None
+
+
+class PromotionalOffer(FeedModel):
+    startDate: datetime | None = None
+    endDate: datetime | None = None
+    discountSetting: DiscountSetting | None = None
+
+    @property
+    def is_free(self) -> bool:
+        return self.discountSetting is not None and self.discountSetting.discountPercentage == 0
+
+
+class PromotionalOfferGroup(FeedModel):
+    promotionalOffers: List[PromotionalOffer] = Field(default_factory=list)
+
+
+class Promotions(FeedModel):
+    promotionalOffers: List[PromotionalOfferGroup] | None = None
+    upcomingPromotionalOffers: List[PromotionalOfferGroup] | None = None
+
+
+class Category(FeedModel):
+    path: str = ""
+
+
+class OfferMapping(FeedModel):
+    pageSlug: str | None = None
+    pageType: str | None = None
+
+
+class CatalogElement(FeedModel):
+    title: str = ""
+    id: str
+    namespace: str
+    description: str = ""
+    offerType: str = ""
+    productSlug: str | None = None
+    urlSlug: str | None = None
+    categories: List[Category] | None = None
+    offerMappings: List[OfferMapping] | None = None
+    promotions: Promotions | None = None
+
+
+class FeedSearchStore(FeedModel):
+    elements: List[CatalogElement] = Field(default_factory=list)
+
+    @field_validator("elements", mode="before")
+    @classmethod
+    def drop_invalid_elements(cls, value):
+        # 逐个校验商品，单个商品字段异常时丢弃它，而不是让整个 feed 校验失败
+        if not isinstance(value, list):
+            return value
+        elements = []
+        for i, element in enumerate(value):
+            try:
+                elements.append(CatalogElement.model_validate(element))
+            except ValidationError as err:
+                title = element.get("title") if isinstance(element, dict) else None
+                logger.warning(
+                    f"Drop invalid catalog element - index={i} {title=} "
+                    f"errors={err.error_count()}"
+                )
+        return elements
+
+
+class FeedCatalog(FeedModel):
+    searchStore: FeedSearchStore
+
+
+class FeedData(FeedModel):
+    Catalog: FeedCatalog
+
+
+class PromotionsFeed(FeedModel):
+    data: FeedData
+
+    @property
+    def elements(self) -> List[CatalogElement]:
+        return self.data.Catalog.searchStore.elements
@@ -6,18 +6,31 @@
 @Desc    :
 """
 import asyncio
+import os
 import sys
+import time
 from contextlib import suppress
 from typing import List
 
-from browserforge.fingerprints import Screen
-from camoufox import AsyncCamoufox
+from celery import signals
+from loguru import logger
 from playwright.async_api import Page
-from playwright.async_api import ViewportSize
 
+from models import Account, PromotionGame
+from services.account_pool_service import AccountPool
+from services.account_service import load_accounts
+from services.browser_service import open_browser_context
 from services.epic_authorization_service import EpicAuthorization
 from services.epic_games_service import EpicAgent
-from settings import LOG_DIR, RECORD_DIR, settings
+from services.http_service import aclose_http_client
+from services.ledger_service import ClaimLedger
+from services.metrics_service import mark_process_dead, record_claim, record_job
+from services.metrics_service import is_multiprocess, start_metrics_server
+from services.network_service import apply_network_profile
+from services.promotions_service import discover_promotions, promotions_for_account
+from services.recording_service import RecordingSession
+from services.tracing_service import span, trace_attributes, tracer
+from settings import LOG_DIR, settings
 from utils import init_log
 from extensions.ext_celery import ext_celery_app
 
@@ -27,6 +40,68 @@ init_log(
     serialize=LOG_DIR.joinpath("serialize.log"),
 )
 
+QUEUE_NAME = "epic-awesome-gamer"
+
+FAILED_TASK_STATUSES = ("failed", "unknown_account")
+
+_task_started: dict = {}
+
+
+@signals.worker_init.connect
+def _start_metrics_server(**kwargs):
+    # 在 worker 主进程中暴露指标，prefork 子进程通过 PROMETHEUS_MULTIPROC_DIR 汇总
+    if not settings.METRICS_PORT:
+        return
+    if not is_multiprocess():
+        # 子进程跑完一个任务就退出（max_tasks_per_child=1），进程内的指标随之丢失，
+        # 主进程暴露的只会是一组永远为空的指标
+        logger.warning(
+            "METRICS_PORT is set but PROMETHEUS_MULTIPROC_DIR is not, "
+            "skip metrics server in celery worker"
+        )
+        return
+    start_metrics_server()
+
+
+@signals.worker_process_shutdown.connect
+def _mark_metrics_process_dead(pid=None, **kwargs):
+    mark_process_dead(pid or os.getpid())
+
+
+@signals.task_prerun.connect
+def _observe_task_start(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+@signals.task_postrun.connect
+def _observe_task_end(task_id=None, task=None, state=None, retval=None, **kwargs):
+    if (start := _task_started.pop(task_id, None)) is not None:
+        # 领取任务在 AccountPool 内部捕获了异常，失败体现在返回的 status 上
+        failed = isinstance(retval, dict) and retval.get("status") in FAILED_TASK_STATUSES
+        status = "ok" if state == "SUCCESS" and not failed else "error"
+        record_job(task.name.rsplit(".", 1)[-1], status, time.perf_counter() - start)
+
+
+def _headless():
+    return "virtual" if "linux" in sys.platform else False
+
+
+def run_async(coro):
+    """Celery worker 是同步执行的，在任务内部为协程创建独立的事件循环"""
+
+    async def _run():
+        try:
+            return await coro
+        finally:
+            # 共享 HTTP 客户端绑定在本次事件循环上，循环结束前关闭连接池
+            await aclose_http_client()
+
+    try:
+        return asyncio.run(_run())
+    finally:
+        # 子进程跑完一个任务就退出，等后台线程把剩余的 span 发送完
+        tracer.shutdown()
+
 
 async def add_games_to_cart(page: Page, urls: List[str] | None = None):
     """
@@ -69,35 +144,87 @@ async def authorize(page: Page):
     await agent.invoke()
 
 
-@ext_celery_app.task(queue="epic-awesome-gamer")
-async def collect_epic_games_task():
-    headless = "virtual" if "linux" in sys.platform else False
+async def collect_epic_games():
+    with (
+        trace_attributes(account=settings.EPIC_EMAIL),
+        span("run"),
+        RecordingSession() as recording,
+    ):
+        async with open_browser_context(
+            settings.user_data_dir, headless=_headless(), **recording.context_options()
+        ) as browser:
+            network_stats = await apply_network_profile(browser)
+            page = browser.pages[0] if browser.pages else await browser.new_page()
+
+            agent = EpicAuthorization(page)
+            await agent.invoke()
+
+            game_page = await browser.new_page()
+            agent = EpicAgent(game_page)
+            await agent.collect_epic_games()
+
+            if network_stats:
+                network_stats.log_summary()
+
+            with suppress(Exception):
+                for p in browser.pages:
+                    await p.close()
+
+
+async def claim_promotion(account: Account, promotion: PromotionGame) -> bool:
+    """在独立的浏览器上下文中为单个账号领取单个促销，同一账号的多个任务之间不会争用 profile 锁"""
+    pool = AccountPool([account], headless=_headless(), promotions=[promotion])
+    results = await pool.run()
+    return results.get(account.email, False)
+
+
+@ext_celery_app.task(queue=QUEUE_NAME)
+def collect_epic_games_task():
+    run_async(collect_epic_games())
+
+
+@ext_celery_app.task(queue=QUEUE_NAME)
+def discover_promotions_task() -> dict:
+    """
+    发现本周促销，为每个（账号，促销）组合投递一个领取任务，台账中已入库的组合会被跳过
+    """
+    accounts = load_accounts()
+    # 账号所在地区的 feed 也要拉取，否则只在该地区上架的促销会被漏掉
+    regions = [*settings.PROMOTION_REGIONS, *(a.country for a in accounts if a.country)]
+    promotions = run_async(discover_promotions(regions))
+    dispatched = []
+
+    for account in accounts:
+        ledger = ClaimLedger(account.email)
+        for promotion in promotions_for_account(promotions, account):
+            if promotion.namespace in ledger:
+                record_claim("skipped")
+                continue
+            # 密码不经过 broker，worker 按 email 从账号注册表中读取
+            claim_promotion_task.delay(account.email, promotion.model_dump(mode="json"))
+            dispatched.append({"email": account.email, "namespace": promotion.namespace})
+
+    logger.debug(f"Discover promotions - promotions={len(promotions)} dispatched={len(dispatched)}")
+    return {"promotions": len(promotions), "dispatched": dispatched}
 
-    async with AsyncCamoufox(
-        persistent_context=True,
-        user_data_dir=settings.user_data_dir,
-        screen=Screen(max_width=1920, max_height=1080, min_height=1080, min_width=1920),
-        record_video_dir=RECORD_DIR,
-        record_video_size=ViewportSize(width=1920, height=1080),
-        humanize=0.2,
-        headless=headless,
-    ) as browser:
-        page = browser.pages[0] if browser.pages else await browser.new_page()
 
-        agent = EpicAuthorization(page)
-        await agent.invoke()
+@ext_celery_app.task(queue=QUEUE_NAME, acks_late=True)
+def claim_promotion_task(email: str, promotion: dict) -> dict:
+    promotion = PromotionGame(**promotion)
+    result = {"email": email, "namespace": promotion.namespace, "title": promotion.title}
 
-        game_page = await browser.new_page()
-        agent = EpicAgent(game_page)
-        await agent.collect_epic_games()
+    account = next((a for a in load_accounts() if a.email == email), None)
+    if not account:
+        logger.error(f"Unknown account - {email=}")
+        return {**result, "status": "unknown_account"}
 
-        with suppress(Exception):
-            for p in browser.pages:
-                await p.close()
+    with logger.contextualize(account=email):
+        finished = run_async(claim_promotion(account, promotion))
 
-        with suppress(Exception):
-            await browser.close()
+    claimed = promotion.namespace in ClaimLedger(email)
+    status = "claimed" if claimed else ("unconfirmed" if finished else "failed")
+    return {**result, "status": status}
 
 
 if __name__ == '__main__':
-    asyncio.run(collect_epic_games_task())
+    collect_epic_games_task()
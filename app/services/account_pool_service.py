@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/3 11:05
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 多账号并发领取：有限个 Camoufox 进程，每个账号独立的浏览器上下文
+"""
+import asyncio
+import time
+from contextlib import AsyncExitStack, suppress
+from typing import Dict, List
+
+from camoufox import AsyncCamoufox
+from loguru import logger
+from playwright.async_api import Browser
+
+from models import Account, PromotionGame
+from services.account_service import account_data_dir
+from services.browser_service import launch_options
+from services.epic_authorization_service import EpicAuthorization
+from services.epic_games_service import EpicAgent
+from services.network_service import apply_network_profile
+from services.profile_service import STORAGE_STATE_NAME, load_storage_state, save_storage_state
+from services.recording_service import RecordingSession
+from services.tracing_service import instrument_context, span, trace_attributes, tracer
+from settings import settings
+
+
+class AccountPool:
+    """
+    在 ``max_browsers`` 个浏览器进程内并发驱动多个账号，同时运行的账号数不超过 ``max_concurrency``
+
+    账号之间通过独立的 BrowserContext 隔离，登录态以 storage_state 的形式保存在各自的
+    user_data 目录下，下次运行时直接恢复。
+    """
+
+    def __init__(
+        self,
+        accounts: List[Account],
+        *,
+        headless: bool | str = True,
+        max_concurrency: int | None = None,
+        max_browsers: int | None = None,
+        promotions: List[PromotionGame] | None = None,
+    ):
+        self.accounts = accounts
+        self.promotions = promotions
+        self.headless = headless
+        self.max_concurrency = max(max_concurrency or settings.MAX_CONCURRENT_ACCOUNTS, 1)
+        self.max_browsers = max(max_browsers or settings.MAX_BROWSER_PROCESSES, 1)
+
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._browsers: List[Browser] = []
+        self._browser_load: Dict[int, int] = {}
+
+    def _acquire_browser(self) -> Browser:
+        # 选择当前承载上下文最少的浏览器进程
+        index = min(range(len(self._browsers)), key=lambda i: self._browser_load[i])
+        self._browser_load[index] += 1
+        return self._browsers[index]
+
+    def _release_browser(self, browser: Browser):
+        self._browser_load[self._browsers.index(browser)] -= 1
+
+    async def _run_account(self, account: Account) -> bool:
+        async with self._semaphore:
+            browser = self._acquire_browser()
+            storage_state = account_data_dir(account.email).joinpath(STORAGE_STATE_NAME)
+            start = time.perf_counter()
+            context = None
+
+            with (
+                logger.contextualize(account=account.email),
+                trace_attributes(account=account.email),
+                span("account.run"),
+                RecordingSession() as recording,
+            ):
+                try:
+                    with span("browser.new_context"):
+                        context = await browser.new_context(
+                            storage_state=load_storage_state(storage_state),
+                            **recording.context_options(),
+                        )
+                    instrument_context(context)
+                    network_stats = await apply_network_profile(context)
+                    page = await context.new_page()
+                    await EpicAuthorization(page, account=account).invoke()
+
+                    game_page = await context.new_page()
+                    agent = EpicAgent(game_page, account=account)
+                    await agent.collect_epic_games(promotions=self.promotions)
+
+                    await save_storage_state(context, storage_state)
+                    if network_stats:
+                        network_stats.log_summary()
+                    logger.success(
+                        f"Account task finished - elapsed={time.perf_counter() - start:.2f}s"
+                    )
+                    return True
+                except Exception as err:
+                    logger.exception(f"Account task failed - {err}")
+                    return False
+                finally:
+                    if context is not None:
+                        with suppress(Exception):
+                            await context.close()
+                    self._release_browser(browser)
+
+    async def run(self) -> Dict[str, bool]:
+        """并发执行全部账号，返回 {email: 是否成功}"""
+        if not self.accounts:
+            return {}
+
+        n_browsers = min(self.max_browsers, len(self.accounts))
+        logger.debug(
+            f"Starting account pool - accounts={len(self.accounts)} "
+            f"browsers={n_browsers} concurrency={self.max_concurrency}"
+        )
+
+        async with AsyncExitStack() as stack:
+            for i in range(n_browsers):
+                with span("browser.launch", **{"browser.mode": "pool"}):
+                    browser = await stack.enter_async_context(
+                        AsyncCamoufox(**launch_options(headless=self.headless))
+                    )
+                self._browsers.append(browser)
+                self._browser_load[i] = 0
+
+            # 单个账号在 try 之外抛出的异常（如录屏收尾失败）不应中断其他账号，记为失败
+            results = await asyncio.gather(
+                *[self._run_account(a) for a in self.accounts], return_exceptions=True
+            )
+
+        for account, result in zip(self.accounts, results):
+            if isinstance(result, BaseException):
+                logger.opt(exception=result).error(f"Account task crashed - {account.email}")
+
+        self._browsers.clear()
+        self._browser_load.clear()
+        tracer.flush()
+        return {a.email: result is True for a, result in zip(self.accounts, results)}
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/3 10:30
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 账号注册表：合并 EPIC_EMAIL 与多账号配置文件
+"""
+import json
+from pathlib import Path
+from typing import List
+
+from loguru import logger
+from pydantic import ValidationError
+
+from models import Account
+from settings import USER_DATA_DIR, settings
+
+
+def default_account() -> Account:
+    return Account(
+        email=settings.EPIC_EMAIL, password=settings.EPIC_PASSWORD, country=settings.EPIC_COUNTRY
+    )
+
+
+def account_data_dir(email: str) -> Path:
+    target_ = USER_DATA_DIR.joinpath(email)
+    target_.mkdir(parents=True, exist_ok=True)
+    return target_
+
+
+def load_accounts(path: str | Path | None = None) -> List[Account]:
+    """
+    读取全部账号，EPIC_EMAIL 始终排在第一位，配置文件中的重复账号会被忽略
+
+    配置文件格式：[{"email": "...", "password": "...", "country": "US"}, ...]，country 可省略
+    """
+    accounts = {settings.EPIC_EMAIL: default_account()}
+
+    path = path or settings.EPIC_ACCOUNTS_FILE
+    if not path:
+        return list(accounts.values())
+
+    try:
+        records = json.loads(Path(path).read_text(encoding="utf8"))
+    except (OSError, ValueError) as err:
+        logger.error(f"Failed to load accounts file - {path=} {err=}")
+        return list(accounts.values())
+
+    for record in records:
+        try:
+            account = Account(**record)
+        except (ValidationError, TypeError) as err:
+            logger.warning(f"Invalid account record in {path} - {err}")
+            continue
+        accounts.setdefault(account.email, account)
+
+    return list(accounts.values())
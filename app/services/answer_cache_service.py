@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/9 17:45
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 人机挑战答案缓存：按题目文本 + 图块/画布的感知哈希（dHash）复用已验证通过的模型答案
+
+hCaptcha 的图片集会被大量复用，命中时直接返回缓存的分类结果或坐标，未命中才请求模型。
+答案只有在挑战通过后才会写入；命中的答案如果导致挑战失败，会被删除。
+
+- 九宫格分类挑战按图块缓存：每个图块单独哈希、单独记录是否应选中，九个图块全部命中才复用。
+  整张挑战画面的哈希对单个图块的替换不敏感，题目相同、只换了一个图块的新挑战会复用旧答案
+- 空间类挑战只对画布（canvas）区域哈希，坐标以 challenge-view 左上角为原点保存，命中时按当前位置平移
+"""
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from PIL import Image
+from hcaptcha_challenger.models import (
+    BoundingBoxCoordinate,
+    ImageAreaSelectChallenge,
+    ImageBinaryChallenge,
+    ImageDragDropChallenge,
+    PointCoordinate,
+)
+from loguru import logger
+from pydantic import BaseModel
+
+from settings import HCAPTCHA_DIR
+
+ANSWER_CACHE_DIR = HCAPTCHA_DIR.joinpath("answers")
+
+HASH_SIZE = 16
+MAX_DISTANCE = 10  # 256 位 dHash 允许的汉明距离，作用在单个图块或画布上
+
+VIEW_SELECTOR = "//div[@class='challenge-view']"
+TILE_SELECTOR = "//div[@class='task']"
+CANVAS_SELECTOR = "//div[@class='challenge-view']//canvas"
+GRID_SIZE = 3
+
+# RoboticArm 上被缓存的推理器 -> (答案类型, 答案是否包含页面坐标)
+CACHED_REASONERS = {
+    "_image_classifier": (ImageBinaryChallenge, False),
+    "_spatial_point_reasoner": (ImageAreaSelectChallenge, True),
+    "_spatial_path_reasoner": (ImageDragDropChallenge, True),
+}
+
+
+def dhash(image: Path | str | Image.Image, hash_size: int = HASH_SIZE) -> int:
+    """差值哈希：缩放为 (hash_size+1) x hash_size 的灰度图，比较水平相邻像素的明暗"""
+    if not isinstance(image, Image.Image):
+        with Image.open(image) as opened:
+            return dhash(opened.copy(), hash_size)
+    image = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+    pixels = image.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def region_hashes(screenshot: Path | str, view: dict, boxes: List[dict]) -> List[int]:
+    """
+    对 challenge-view 截图中的若干区域分别计算 dHash
+    Args:
+        screenshot: challenge-view 的元素截图
+        view: challenge-view 的 bounding_box
+        boxes: 图块或画布的 bounding_box（页面坐标）
+
+    """
+    with Image.open(screenshot) as image:
+        # 截图按设备像素保存，bounding_box 是 CSS 像素
+        scale = image.width / view["width"]
+        hashes = []
+        for box in boxes:
+            left = round((box["x"] - view["x"]) * scale)
+            top = round((box["y"] - view["y"]) * scale)
+            right = left + round(box["width"] * scale)
+            bottom = top + round(box["height"] * scale)
+            hashes.append(dhash(image.crop((left, top, right, bottom))))
+    return hashes
+
+
+def shift_points(model: BaseModel, dx: float, dy: float) -> BaseModel:
+    """返回一个所有 PointCoordinate 都平移 (dx, dy) 的副本"""
+
+    def _shift(value: Any) -> Any:
+        if isinstance(value, PointCoordinate):
+            return value.model_copy(update={"x": round(value.x + dx), "y": round(value.y + dy)})
+        if isinstance(value, BaseModel):
+            return value.model_copy(
+                update={name: _shift(getattr(value, name)) for name in type(value).model_fields}
+            )
+        if isinstance(value, list):
+            return [_shift(v) for v in value]
+        return value
+
+    return _shift(model)
+
+
+@dataclass
+class PendingAnswer:
+    kind: str
+    prompt: str
+    path: Path
+    payload: dict
+    from_cache: bool
+    # 产生该答案的挑战轮次（RoboticArm.captcha_payload），失败重试的轮次不能写入缓存
+    round: Any = None
+
+
+class AnswerCache:
+    def __init__(self, root: Path = ANSWER_CACHE_DIR, max_distance: int = MAX_DISTANCE):
+        self.root = root
+        self.max_distance = max_distance
+        self.hits = 0
+        self.misses = 0
+        # (kind, prompt) -> [(hash, path)]，按目录惰性加载
+        self._index: Dict[Tuple[str, str], List[Tuple[int, Path]]] = {}
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _bucket(self, kind: str, prompt: str) -> Path:
+        digest = hashlib.sha1(prompt.strip().lower().encode("utf8")).hexdigest()[:16]
+        return self.root.joinpath(kind, digest)
+
+    def _entries(self, kind: str, prompt: str) -> List[Tuple[int, Path]]:
+        key = (kind, prompt)
+        if key not in self._index:
+            bucket = self._bucket(kind, prompt)
+            entries = []
+            if bucket.is_dir():
+                for path in bucket.glob("*.json"):
+                    try:
+                        entries.append((int(path.stem, 16), path))
+                    except ValueError:
+                        continue
+            self._index[key] = entries
+        return self._index[key]
+
+    def lookup(self, kind: str, prompt: str, image_hash: int) -> Tuple[Path, dict | None]:
+        """返回 (条目路径, 缓存的答案)；未命中时答案为 None，路径用于挑战通过后写入"""
+        best: Tuple[int, Path] | None = None
+        for value, path in self._entries(kind, prompt):
+            distance = (value ^ image_hash).bit_count()
+            if distance <= self.max_distance and (best is None or distance < best[0]):
+                best = (distance, path)
+
+        if best:
+            try:
+                return best[1], json.loads(best[1].read_text(encoding="utf8"))
+            except (OSError, ValueError):
+                pass
+
+        name = f"{image_hash:0{HASH_SIZE * HASH_SIZE // 4}x}.json"
+        return self._bucket(kind, prompt).joinpath(name), None
+
+    def record(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def commit(self, pending: PendingAnswer):
+        if pending.from_cache:
+            return
+        try:
+            pending.path.parent.mkdir(parents=True, exist_ok=True)
+            text = json.dumps(pending.payload, ensure_ascii=False)
+            pending.path.write_text(text, encoding="utf8")
+        except OSError as err:
+            logger.warning(f"Failed to save captcha answer - {err}")
+            return
+        entries = self._entries(pending.kind, pending.prompt)
+        if all(path != pending.path for _, path in entries):
+            entries.append((int(pending.path.stem, 16), pending.path))
+
+    def discard(self, pending: PendingAnswer):
+        """命中的答案没能通过挑战，删除该条目"""
+        if not pending.from_cache:
+            return
+        pending.path.unlink(missing_ok=True)
+        entries = self._entries(pending.kind, pending.prompt)
+        entries[:] = [e for e in entries if e[1] != pending.path]
+
+
+class CachedReasoner:
+    """替换 RoboticArm 上的推理器，命中缓存时不再请求模型"""
+
+    def __init__(self, kind: str, reasoner, arm, cache: AnswerCache, pending: list):
+        self._kind = kind
+        self._reasoner = reasoner
+        self._arm = arm
+        self._cache = cache
+        self._pending = pending
+        self._response_type, self._spatial = CACHED_REASONERS[kind]
+        self._last_from_cache = False
+
+    def __getattr__(self, item):
+        return getattr(self._reasoner, item)
+
+    def _prompt(self) -> str:
+        payload = getattr(self._arm, "captcha_payload", None)
+        if payload is not None:
+            try:
+                return payload.get_requester_question()
+            except Exception:
+                pass
+        return getattr(self._arm, "_challenge_prompt", None) or ""
+
+    async def _layout(self) -> Tuple[dict | None, List[dict]]:
+        """challenge-view 与需要哈希的区域：分类挑战为各个图块，空间类挑战为画布"""
+        frame = await self._arm.get_challenge_frame_locator()
+        view = await frame.locator(VIEW_SELECTOR).bounding_box()
+        selector = CANVAS_SELECTOR if self._spatial else TILE_SELECTOR
+        boxes = [await loc.bounding_box() for loc in await frame.locator(selector).all()]
+        if self._spatial:
+            boxes = boxes[:1]
+        elif len(boxes) != GRID_SIZE * GRID_SIZE:
+            boxes = []
+        return view, boxes
+
+    async def __call__(self, *, challenge_screenshot, **kwargs):
+        self._last_from_cache = False
+        prompt = self._prompt()
+        try:
+            view, boxes = await self._layout()
+            hashes = region_hashes(challenge_screenshot, view, boxes) if view and boxes else []
+        except Exception as err:
+            logger.debug(f"Answer cache skipped - {err}")
+            hashes = []
+        if not prompt or not hashes:
+            return await self._reasoner(challenge_screenshot=challenge_screenshot, **kwargs)
+
+        current_round = getattr(self._arm, "captcha_payload", None)
+        entries = [self._cache.lookup(self._kind, prompt, h) for h in hashes]
+        if all(payload is not None for _, payload in entries):
+            try:
+                response = self._restore([payload["answer"] for _, payload in entries], view)
+            except Exception as err:
+                logger.debug(f"Answer cache entry unusable - {err}")
+            else:
+                logger.debug(f"Answer cache hit - kind={self._kind} {prompt=}")
+                self._cache.record(True)
+                self._last_from_cache = True
+                self._pending.extend(
+                    PendingAnswer(self._kind, prompt, path, payload, True, current_round)
+                    for path, payload in entries
+                )
+                return response
+
+        self._cache.record(False)
+        response = await self._reasoner(challenge_screenshot=challenge_screenshot, **kwargs)
+        created_at = int(time.time())
+        for (path, _), answer in zip(entries, self._answers(response, view)):
+            payload = {"prompt": prompt, "answer": answer, "created_at": created_at}
+            self._pending.append(
+                PendingAnswer(self._kind, prompt, path, payload, False, current_round)
+            )
+        return response
+
+    def _answers(self, response: BaseModel, view: dict) -> List[dict]:
+        """模型响应拆成每个区域的缓存答案"""
+        if self._spatial:
+            return [shift_points(response, -view["x"], -view["y"]).model_dump(mode="json")]
+        return [{"selected": s} for s in response.convert_box_to_boolean_matrix()]
+
+    def _restore(self, answers: List[dict], view: dict) -> BaseModel:
+        """由每个区域的缓存答案还原出推理器的响应"""
+        if self._spatial:
+            answer = self._response_type.model_validate(answers[0])
+            return shift_points(answer, view["x"], view["y"])
+        coordinates = [
+            BoundingBoxCoordinate(box_2d=[i // GRID_SIZE, i % GRID_SIZE])
+            for i, answer in enumerate(answers)
+            if answer["selected"]
+        ]
+        return self._response_type(challenge_prompt=self._prompt(), coordinates=coordinates)
+
+    def cache_response(self, path: Path):
+        # 命中缓存时没有新的模型响应，避免把上一次的响应写成本次的答案
+        if not self._last_from_cache:
+            self._reasoner.cache_response(path)
+
+
+answer_cache = AnswerCache()
+
+
+def install_answer_cache(agent, cache: AnswerCache = answer_cache) -> list:
+    """给 AgentV 的推理器套上答案缓存，返回该 agent 的待确认答案列表"""
+    arm = agent.robotic_arm
+    pending: list = []
+    for attr in CACHED_REASONERS:
+        reasoner = getattr(arm, attr, None)
+        if reasoner is None or isinstance(reasoner, CachedReasoner):
+            continue
+        setattr(arm, attr, CachedReasoner(attr, reasoner, arm, cache, pending))
+    return pending
+
+
+def settle_answers(
+    pending: List[PendingAnswer], success: bool, agent, cache: AnswerCache = answer_cache
+):
+    """
+    挑战结束后结算待确认的答案：只有最终通过的那一轮的答案会写入缓存，
+    其余轮次（包括 AgentV 内部失败重试的轮次）中命中的缓存答案会被删除
+    """
+    final_round = getattr(agent.robotic_arm, "captcha_payload", None)
+    for answer in pending:
+        if success and answer.round is final_round:
+            cache.commit(answer)
+        else:
+            cache.discard(answer)
+    if pending:
+        logger.debug(
+            f"Answer cache - hits={cache.hits} misses={cache.misses} "
+            f"hit_rate={cache.hit_rate:.0%}"
+        )
+    pending.clear()
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/3 10:12
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : Camoufox 启动参数与浏览器上下文参数的统一出口
+"""
+from contextlib import AsyncExitStack, asynccontextmanager, suppress
+from pathlib import Path
+from typing import AsyncIterator
+
+from browserforge.fingerprints import Screen
+from camoufox import AsyncCamoufox
+from loguru import logger
+from playwright.async_api import BrowserContext
+
+from services.profile_service import (
+    STORAGE_STATE_NAME,
+    load_storage_state,
+    prune_profile,
+    remove_profile,
+    save_storage_state,
+)
+from services.session_service import SESSION_CACHE_NAME
+from services.tracing_service import instrument_context, span
+from settings import settings
+
+
+def launch_options(headless: bool | str = True, **kwargs) -> dict:
+    """浏览器进程级别的参数（指纹、拟人化、无头模式）"""
+    return {
+        "screen": Screen(max_width=1920, max_height=1080, min_height=1080, min_width=1920),
+        "humanize": 0.2,
+        "headless": headless,
+        **kwargs,
+    }
+
+
+def persistent_launch_options(
+    user_data_dir: Path, headless: bool | str = True, **context_options
+) -> dict:
+    """
+    单账号持久化上下文（AsyncCamoufox(persistent_context=True)）的完整参数
+    Args:
+        user_data_dir:
+        headless:
+        **context_options: 上下文级别的参数，例如 RecordingSession.context_options()
+
+    Returns:
+
+    """
+    return launch_options(
+        headless=headless,
+        persistent_context=True,
+        user_data_dir=user_data_dir,
+        **context_options,
+    )
+
+
+def _has_profile(user_data_dir: Path) -> bool:
+    return user_data_dir.joinpath("cookies.sqlite").is_file()
+
+
+async def _close_quietly(context: BrowserContext):
+    with suppress(Exception):
+        await context.close()
+
+
+@asynccontextmanager
+async def open_browser_context(
+    user_data_dir: Path, headless: bool | str = True, mode: str | None = None, **context_options
+) -> AsyncIterator[BrowserContext]:
+    """
+    按 BROWSER_CONTEXT_MODE 打开单账号的浏览器上下文，退出时导出精简的 storage_state
+
+    - persistent: 加载完整的 Firefox Profile（启动前清理缓存目录）
+    - storage_state: 启动临时上下文，只从 storage_state.json 恢复 Epic 域名的 Cookie 与 localStorage；
+      还没有快照但存在旧 Profile 时，本次仍以持久化方式启动并导出快照，完成迁移；
+      迁移成功（正常退出且快照中有 Epic Cookie）后删除旧 Profile，只保留快照与会话缓存
+
+    Args:
+        user_data_dir:
+        headless:
+        mode: 缺省时读取 settings.BROWSER_CONTEXT_MODE
+        **context_options: 上下文级别的参数，例如 RecordingSession.context_options()
+
+    Returns:
+
+    """
+    mode = mode or settings.BROWSER_CONTEXT_MODE
+    state_path = user_data_dir.joinpath(STORAGE_STATE_NAME)
+    state = load_storage_state(state_path) if mode == "storage_state" else None
+
+    if settings.PRUNE_PROFILE_CACHE and _has_profile(user_data_dir):
+        prune_profile(user_data_dir)
+
+    ephemeral = mode == "storage_state" and (state is not None or not _has_profile(user_data_dir))
+    migrate = mode == "storage_state" and not ephemeral
+    if migrate:
+        logger.debug("No storage state snapshot yet, migrate from the persistent profile")
+
+    async with AsyncExitStack() as stack:
+        with span("browser.launch", **{"browser.mode": "storage_state" if ephemeral else mode}):
+            if ephemeral:
+                browser = await stack.enter_async_context(
+                    AsyncCamoufox(**launch_options(headless=headless))
+                )
+                context = await browser.new_context(storage_state=state, **context_options)
+                stack.push_async_callback(_close_quietly, context)
+            else:
+                context = await stack.enter_async_context(
+                    AsyncCamoufox(
+                        **persistent_launch_options(
+                            user_data_dir, headless=headless, **context_options
+                        )
+                    )
+                )
+        instrument_context(context)
+
+        saved = False
+        try:
+            yield context
+        finally:
+            with suppress(Exception):
+                saved = bool((await save_storage_state(context, state_path))["cookies"])
+
+    # 浏览器已关闭，Profile 不再被占用
+    if migrate and saved:
+        remove_profile(user_data_dir, keep=(STORAGE_STATE_NAME, SESSION_CACHE_NAME))
@@ -10,23 +10,32 @@ import json
 import time
 from contextlib import suppress
 
-from hcaptcha_challenger.agent import AgentV
 from loguru import logger
 from playwright.async_api import expect, Page, Response
 
-from settings import SCREENSHOTS_DIR, settings
-
-URL_CLAIM = "https://store.epicgames.com/en-US/free-games"
+from models import Account
+from services.account_service import account_data_dir, default_account
+from services.retry_service import RetryableError, RetryExhausted, RetryPolicy
+from services.session_service import SessionProbe
+from services.solver_service import SolverManager
+from services.tracing_service import traced
+from settings import SCREENSHOTS_DIR
 
 
 class EpicAuthorization:
 
-    def __init__(self, page: Page):
+    def __init__(self, page: Page, account: Account | None = None):
         self.page = page
+        self.account = account or default_account()
 
         self._is_login_success_signal = asyncio.Queue()
         self._is_refresh_csrf_signal = asyncio.Queue()
 
+        self._login_retry = RetryPolicy("login", max_attempts=3, base_delay=3, budget=600)
+        self._session = SessionProbe.for_context(
+            self.page.context, account_data_dir(self.account.email)
+        )
+
     async def _on_response_anything(self, r: Response):
         if r.request.method != "POST" or "talon" in r.url:
             return
@@ -67,8 +76,10 @@ class EpicAuthorization:
                     btn_ids.remove(action)
 
     async def _login(self) -> bool | None:
-        # 尽可能早地初始化机器人
-        agent = AgentV(page=self.page, agent_config=settings)
+        # 尽可能早地初始化机器人，重试时复用同一个已预热的求解器
+        solver = SolverManager.for_context(self.page.context)
+        solver.get(self.page)
+        solver.reset(self.page)
 
         # {{< SIGN IN PAGE >}}
         logger.debug("Login with Email")
@@ -80,7 +91,7 @@ class EpicAuthorization:
             # 1. 使用电子邮件地址登录
             email_input = self.page.locator("#email")
             await email_input.clear()
-            await email_input.type(settings.EPIC_EMAIL)
+            await email_input.type(self.account.email)
 
             # 2. 点击继续按钮
             await self.page.click("#continue")
@@ -88,14 +99,14 @@ class EpicAuthorization:
             # 3. 输入密码
             password_input = self.page.locator("#password")
             await password_input.clear()
-            await password_input.type(settings.EPIC_PASSWORD.get_secret_value())
+            await password_input.type(self.account.password.get_secret_value())
 
             # 4. 点击登录按钮，触发人机挑战值守监听器
             # Active hCaptcha checkbox
             await self.page.click("#sign-in")
 
             # Active hCaptcha challenge
-            await agent.wait_for_challenge()
+            await solver.solve(self.page)
 
             # Wait for the page to redirect
             await asyncio.wait_for(self._is_login_success_signal.get(), timeout=60)
@@ -111,15 +122,23 @@ class EpicAuthorization:
             await self.page.screenshot(path=sr.joinpath(f"login-{int(time.time())}.png"))
             return None
 
-    async def invoke(self):
-        self.page.on("response", self._on_response_anything)
+    @traced("login.attempt")
+    async def _login_attempt(self) -> bool:
+        # 会话探测的结果与 EpicAgent 共享，一次运行只检查一次
+        if await self._session.verify(self.page):
+            logger.success("Epic Games is already logged in")
+            return True
 
-        for _ in range(3):
-            await self.page.goto(URL_CLAIM, wait_until="domcontentloaded")
+        if not await self._login():
+            raise RetryableError("Login attempt failed")
+        self._session.mark_valid()
+        return True
 
-            if "true" == await self.page.locator("//egs-navigation").get_attribute("isloggedin"):
-                logger.success("Epic Games is already logged in")
-                return True
+    @traced("login")
+    async def invoke(self):
+        self.page.on("response", self._on_response_anything)
 
-            if await self._login():
-                return
+        try:
+            return await self._login_retry.run(self._login_attempt)
+        except RetryExhausted as err:
+            logger.error(f"Failed to login - {err}")
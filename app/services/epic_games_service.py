@@ -4,21 +4,30 @@
 # GitHub     : https://github.com/QIN2DIM
 # Description: 游戏商城控制句柄
 
+import asyncio
 import json
+import re
 from contextlib import suppress
-from json import JSONDecodeError
-from typing import List
+from enum import Enum
+from typing import Awaitable, Callable, List
 
-import httpx
-from hcaptcha_challenger.agent import AgentV
 from loguru import logger
-from playwright.async_api import Page
+from playwright.async_api import Page, Response
 from playwright.async_api import expect, TimeoutError, FrameLocator
 from tenacity import retry, retry_if_exception_type, stop_after_attempt
 
-from models import OrderItem, Order
+from models import Account, OrderItem
 from models import PromotionGame
-from settings import settings, RUNTIME_DIR
+from services.account_service import account_data_dir, default_account
+from services.ledger_service import ClaimLedger
+from services.metrics_service import record_claim, sample_browser_rss
+from services.ownership_service import OwnershipClient, SessionExpired
+from services.promotions_service import get_promotions, promotions_for_account
+from services.retry_service import RetryableError, RetryExhausted, RetryPolicy
+from services.session_service import SessionProbe
+from services.solver_service import SolverManager
+from services.tracing_service import current_span, traced
+from settings import settings
 
 URL_CLAIM = "https://store.epicgames.com/en-US/free-games"
 URL_LOGIN = (
@@ -27,117 +36,84 @@ URL_LOGIN = (
 URL_CART = "https://store.epicgames.com/en-US/cart"
 URL_CART_SUCCESS = "https://store.epicgames.com/en-US/cart/success"
 
+IFRAME_PURCHASE_SELECTOR = (
+    "//iframe[contains(@id, 'webPurchaseContainer') or contains(@src, 'purchase')]"
+)
+CART_CARD_SELECTOR = "div[data-testid='offer-card-layout-wrapper']"
 
-URL_PROMOTIONS = "https://store-site-backend-static.ak.epicgames.com/freeGamesPromotions"
-URL_PRODUCT_PAGE = "https://store.epicgames.com/en-US/p/"
-URL_PRODUCT_BUNDLES = "https://store.epicgames.com/en-US/bundles/"
-
-
-def get_promotions() -> List[PromotionGame]:
-    """获取周免游戏数据"""
-    def is_discount_game(prot: dict) -> bool | None:
-        with suppress(KeyError, IndexError, TypeError):
-            offers = prot["promotions"]["promotionalOffers"][0]["promotionalOffers"]
-            for i, offer in enumerate(offers):
-                if offer["discountSetting"]["discountPercentage"] == 0:
-                    return True
-
-    promotions: List[PromotionGame] = []
-
-    resp = httpx.get(URL_PROMOTIONS, params={"local": "zh-CN"})
-
-    try:
-        data = resp.json()
-    except JSONDecodeError as err:
-        logger.error("Failed to get promotions", err=err)
-        return []
+# 结账信号的等待上限（毫秒）
+CHECKOUT_SIGNAL_TIMEOUT = 15000
+CART_RERENDER_TIMEOUT = 5000
 
-    with suppress(Exception):
-        cache_key = RUNTIME_DIR.joinpath("promotions.json")
-        cache_key.parent.mkdir(parents=True, exist_ok=True)
-        cache_key.write_text(json.dumps(data, indent=2, ensure_ascii=False))
 
-    # Get store promotion data and <this week free> games
-    for e in data["data"]["Catalog"]["searchStore"]["elements"]:
-        if not is_discount_game(e):
-            continue
+class CheckoutSignal(str, Enum):
+    IFRAME_DETACHED = "iframe_detached"
+    ORDER_CONFIRMED = "order_confirmed"
+    SUCCESS_URL = "success_url"
+    CAPTCHA = "captcha"
 
-        # -----------------------------------------------------------
-        # 🟢 智能 URL 识别逻辑
-        # -----------------------------------------------------------
-        is_bundle = False
-        if e.get("offerType") == "BUNDLE":
-            is_bundle = True
-        
-        # 补充检测：分类和标题
-        if not is_bundle:
-            for cat in e.get("categories", []):
-                if "bundle" in cat.get("path", "").lower():
-                    is_bundle = True
-                    break
-        if not is_bundle and "Collection" in e.get("title", ""):
-             is_bundle = True
 
-        base_url = URL_PRODUCT_BUNDLES if is_bundle else URL_PRODUCT_PAGE
+def _is_order_confirmation(response: Response) -> bool:
+    return "confirm-order" in response.url and response.ok
 
-        try:
-            if e.get('offerMappings'):
-                slug = e['offerMappings'][0]['pageSlug']
-                e["url"] = f"{base_url.rstrip('/')}/{slug}"
-            elif e.get("productSlug"):
-                e["url"] = f"{base_url.rstrip('/')}/{e['productSlug']}"
-            else:
-                 e["url"] = f"{base_url.rstrip('/')}/{e.get('urlSlug', 'unknown')}"
-        except (KeyError, IndexError):
-            logger.info(f"Failed to get URL: {e}")
-            continue
 
-        logger.info(e["url"])
-        promotions.append(PromotionGame(**e))
-
-    return promotions
+def _is_checkout_success_url(url: str) -> bool:
+    return "/cart/success" in url or "/purchase/success" in url
 
 
 class EpicAgent:
-    def __init__(self, page: Page):
+    def __init__(self, page: Page, account: Account | None = None):
         self.page = page
+        self.account = account or default_account()
         self.epic_games = EpicGames(self.page)
         self._promotions: List[PromotionGame] = []
+        self._candidates: List[PromotionGame] | None = None
+        self._skipped: int = 0
         self._ctx_cookies_is_available: bool = False
         self._orders: List[OrderItem] = []
-        self._namespaces: List[str] = []
+        self._orders_synced: bool = False
         self._cookies = None
+        self._ledger = ClaimLedger(self.account.email)
+        self._ownership = OwnershipClient(self.page.request, self._ledger)
+        self._session = SessionProbe.for_context(
+            self.page.context, account_data_dir(self.account.email)
+        )
 
+    @traced("order.sync")
     async def _sync_order_history(self):
-        if self._orders:
+        """增量同步订单记录，只解析比台账游标更新的订单（按时间倒序返回）"""
+        if self._orders_synced:
             return
-        completed_orders: List[OrderItem] = []
         try:
-            await self.page.goto("https://www.epicgames.com/account/v2/payment/ajaxGetOrderHistory")
-            text_content = await self.page.text_content("//pre")
-            data = json.loads(text_content)
-            for _order in data["orders"]:
-                order = Order(**_order)
-                if order.orderType != "PURCHASE":
-                    continue
-                for item in order.items:
-                    if not item.namespace or len(item.namespace) != 32:
-                        continue
-                    completed_orders.append(item)
+            self._orders = await self._ownership.sync()
+        except SessionExpired as err:
+            # 领取过程中会话失效，清掉会话缓存，下次运行重新登录
+            logger.warning(err)
+            self._session.invalidate()
+            return
         except Exception as err:
             logger.warning(err)
-        self._orders = completed_orders
+            return
+        self._orders_synced = True
 
     async def _check_orders(self):
-        await self._sync_order_history()
-        self._namespaces = self._namespaces or [order.namespace for order in self._orders]
-        self._promotions = [p for p in get_promotions() if p.namespace not in self._namespaces]
+        if self._candidates is not None:
+            promotions = promotions_for_account(self._candidates, self.account)
+        else:
+            promotions = await get_promotions(self.account.country)
+
+        # 台账已覆盖全部周免游戏时无需再请求订单记录
+        owned = self._ownership.owned(p.namespace for p in promotions)
+        if not all(owned.values()):
+            await self._sync_order_history()
+            owned = self._ownership.owned(owned)
+
+        self._promotions = [p for p in promotions if not owned[p.namespace]]
+        self._skipped = len(promotions) - len(self._promotions)
 
     async def _should_ignore_task(self) -> bool:
         self._ctx_cookies_is_available = False
-        await self.page.goto(URL_CLAIM, wait_until="domcontentloaded")
-        status = await self.page.locator("//egs-navigation").get_attribute("isloggedin")
-        if status == "false":
+        if not await self._session.verify(self.page):
             logger.error("❌ context cookies is not available")
             return False
         self._ctx_cookies_is_available = True
@@ -146,8 +122,19 @@ class EpicAgent:
             return True
         return False
 
-    async def collect_epic_games(self):
-        if await self._should_ignore_task():
+    async def collect_epic_games(self, promotions: List[PromotionGame] | None = None):
+        """
+        领取周免游戏
+        Args:
+            promotions: 只处理指定的促销，缺省时从 freeGamesPromotions 获取本周全部周免游戏
+
+        Returns:
+
+        """
+        self._candidates = promotions
+        ignored = await self._should_ignore_task()
+        record_claim("skipped", self._skipped)
+        if ignored:
             logger.success("All week-free games are already in the library")
             return
 
@@ -170,7 +157,21 @@ class EpicAgent:
                 await self.epic_games.collect_weekly_games(self._promotions)
             except Exception as e:
                 logger.exception(e)
-        
+
+            if "/id/login" in self.page.url:
+                logger.warning("Redirected to the login page while claiming, session expired")
+                self._session.invalidate()
+
+            # 刷新订单记录，让下一次预检可以跳过已经领取的游戏
+            self._orders_synced = False
+            await self._sync_order_history()
+
+            owned = self._ownership.owned(p.namespace for p in self._promotions)
+            succeeded = sum(owned.values())
+            record_claim("succeeded", succeeded)
+            record_claim("failed", len(owned) - succeeded)
+            sample_browser_rss()
+
         logger.debug("All tasks in the workflow have been completed")
 
 
@@ -178,6 +179,17 @@ class EpicGames:
     def __init__(self, page: Page):
         self.page = page
         self._promotions: List[PromotionGame] = []
+        self._captcha_lock = asyncio.Lock()
+
+        self._checkout_retry = RetryPolicy("checkout", max_attempts=3, base_delay=2, budget=300)
+        self._cart_retry = RetryPolicy(
+            "empty_cart",
+            max_attempts=6,
+            base_delay=0.5,
+            max_delay=4,
+            budget=60,
+            retry_on=(RetryableError,),
+        )
 
     @staticmethod
     async def _agree_license(page: Page):
@@ -191,8 +203,7 @@ class EpicGames:
     @staticmethod
     async def _active_purchase_container(page: Page):
         logger.debug("Scanning for purchase iframe...")
-        iframe_selector = "//iframe[contains(@id, 'webPurchaseContainer') or contains(@src, 'purchase')]"
-        wpc = page.frame_locator(iframe_selector).first
+        wpc = page.frame_locator(IFRAME_PURCHASE_SELECTOR).first
 
         logger.debug("Looking for 'PLACE ORDER' button...")
         place_order_btn = wpc.locator("button", has_text="PLACE ORDER")
@@ -222,163 +233,293 @@ class EpicGames:
                 await accept.click()
                 return True
 
+    @staticmethod
+    async def _wait_for_checkout_signal(
+        page: Page,
+        action: Callable[[], Awaitable] | None = None,
+        *,
+        captcha: bool = True,
+        timeout: int = CHECKOUT_SIGNAL_TIMEOUT,
+    ) -> CheckoutSignal | None:
+        """
+        先挂好监听再执行 action（通常是点击付款按钮），返回最先出现的结账信号，超时返回 None
+        Args:
+            page:
+            action: 注册监听之后执行的操作
+            captcha: 是否把人机挑战的出现也视为信号
+            timeout: 等待上限（毫秒）
+
+        Returns:
+
+        """
+        waiters = {
+            CheckoutSignal.IFRAME_DETACHED: page.wait_for_selector(
+                IFRAME_PURCHASE_SELECTOR, state="detached", timeout=timeout
+            ),
+            CheckoutSignal.ORDER_CONFIRMED: page.wait_for_event(
+                "response", predicate=_is_order_confirmation, timeout=timeout
+            ),
+            CheckoutSignal.SUCCESS_URL: page.wait_for_url(
+                _is_checkout_success_url, wait_until="commit", timeout=timeout
+            ),
+        }
+        if captcha:
+            waiters[CheckoutSignal.CAPTCHA] = page.wait_for_event(
+                "response", predicate=lambda r: "/getcaptcha/" in r.url, timeout=timeout
+            )
+
+        tasks = {asyncio.create_task(coro): signal for signal, coro in waiters.items()}
+        try:
+            # 让监听先注册，避免错过点击后立即返回的响应
+            await asyncio.sleep(0)
+            if action:
+                await action()
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if not task.exception():
+                        return tasks[task]
+            return None
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            with suppress(Exception):
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    @traced("checkout.instant")
     async def _handle_instant_checkout(self, page: Page):
         logger.info("🚀 Triggering Instant Checkout Flow...")
-        agent = AgentV(page=page, agent_config=settings)
+        solver = SolverManager.for_context(page.context)
+        solver.get(page)
 
         try:
             wpc, payment_btn = await self._active_purchase_container(page)
             logger.debug(f"Clicking payment button: {await payment_btn.text_content()}")
-            await payment_btn.click(force=True)
-            await page.wait_for_timeout(3000)
-            
-            try:
-                logger.debug("Checking for CAPTCHA...")
-                await agent.wait_for_challenge()
-            except Exception as e:
-                logger.info(f"CAPTCHA detection skipped (Likely no CAPTCHA needed): {e}")
 
-            try:
-                if not await payment_btn.is_visible():
-                     logger.success("🎉 Instant Checkout: Payment button disappeared (Success inferred)")
-                     return
-            except Exception:
-                logger.success("🎉 Instant Checkout: Iframe closed (Success inferred)")
-                return
+            # 第二轮为兜底补点：首次点击后既没有成功信号也没有人机挑战
+            for _ in range(2):
+                solver.reset(page)
+                signal = await self._wait_for_checkout_signal(
+                    page, action=lambda: payment_btn.click(force=True, timeout=5000)
+                )
 
-            with suppress(Exception):
-                await payment_btn.click(force=True)
-                await page.wait_for_timeout(2000)
-            
-            logger.success("Instant checkout flow finished (Blind Success).")
+                if signal == CheckoutSignal.CAPTCHA:
+                    # 并发模式下同一时间只解一个挑战，解题前把页面切到前台避免后台节流
+                    async with self._captcha_lock:
+                        try:
+                            logger.debug("CAPTCHA detected, solving...")
+                            await page.bring_to_front()
+                            await solver.solve(page)
+                        except Exception as e:
+                            logger.warning(f"CAPTCHA solving failed: {e}")
+                    signal = await self._wait_for_checkout_signal(page, captcha=False)
+
+                if signal:
+                    logger.success(f"🎉 Instant Checkout success - {signal=}")
+                    return
+
+                logger.warning("No checkout signal received, re-click payment button")
+
+            logger.warning("Instant checkout unconfirmed (Game might still be claimed)")
 
         except Exception as err:
             logger.warning(f"Instant checkout warning (Game might still be claimed): {err}")
             await page.reload()
 
-    async def add_promotion_to_cart(self, page: Page, urls: List[str]) -> bool:
-        has_pending_cart_items = False
+    @traced("promotion.add")
+    async def _add_promotion(self, page: Page, url: str) -> bool:
+        """处理单个促销页面，返回是否把游戏加入了购物车（需要后续统一结账）"""
+        current_span().set(**{"promotion.url": url})
+        await page.goto(url, wait_until="load")
 
-        for url in urls:
-            await page.goto(url, wait_until="load")
+        # 404 检测
+        title = await page.title()
+        if "404" in title or "Page Not Found" in title:
+            logger.error(f"❌ Invalid URL (404 Page): {url}")
+            return False
 
-            # 404 检测
-            title = await page.title()
-            if "404" in title or "Page Not Found" in title:
-                logger.error(f"❌ Invalid URL (404 Page): {url}")
-                continue
+        # 处理年龄限制弹窗
+        try:
+            continue_btn = page.locator("//button//span[text()='Continue']")
+            if await continue_btn.is_visible(timeout=5000):
+                await continue_btn.click()
+        except Exception:
+            pass 
+
+        # ------------------------------------------------------------
+        # 🔥 新思路：彻底解决按钮识别问题 (黑名单机制 + 智能点击)
+        # ------------------------------------------------------------
+        
+        # 1. 尝试找到所有可能的“主按钮”
+        # Epic 按钮通常有 'purchase-cta-button' 这个 TestID
+        purchase_btn = page.locator("//button[@data-testid='purchase-cta-button']").first
 
-            # 处理年龄限制弹窗
-            try:
-                continue_btn = page.locator("//button//span[text()='Continue']")
-                if await continue_btn.is_visible(timeout=5000):
-                    await continue_btn.click()
-            except Exception:
-                pass 
-
-            # ------------------------------------------------------------
-            # 🔥 新思路：彻底解决按钮识别问题 (黑名单机制 + 智能点击)
-            # ------------------------------------------------------------
-            
-            # 1. 尝试找到所有可能的“主按钮”
-            # Epic 按钮通常有 'purchase-cta-button' 这个 TestID
-            purchase_btn = page.locator("//button[@data-testid='purchase-cta-button']").first
+        # 2. 如果没找到主按钮，尝试找“库中”状态
+        try:
+            if not await purchase_btn.is_visible(timeout=5000):
+                # 再次检查是否在库中 (有时按钮不叫 purchase-cta，而是简单的 disabled button)
+                # 只定位包含状态文字的按钮，不再读取整页文本
+                owned_btn = page.locator("button", has_text=re.compile(r"In Library|Owned"))
+                if await owned_btn.count():
+                    logger.success(f"Already in the library (Owned Button) - {url=}")
+                    return False
+                logger.warning(f"Could not find any purchase button - {url=}")
+                return False
+        except Exception:
+            pass
 
-            # 2. 如果没找到主按钮，尝试找“库中”状态
-            try:
-                if not await purchase_btn.is_visible(timeout=5000):
-                    # 再次检查是否在库中 (有时按钮不叫 purchase-cta，而是简单的 disabled button)
-                    all_text = await page.locator("body").text_content()
-                    if "In Library" in all_text or "Owned" in all_text:
-                         logger.success(f"Already in the library (Page Text Scan) - {url=}")
-                         continue
-                    logger.warning(f"Could not find any purchase button - {url=}")
-                    continue
-            except Exception:
-                pass
-
-            # 3. 获取按钮文字
-            btn_text = await purchase_btn.text_content()
-            if not btn_text: btn_text = ""
-            btn_text_upper = btn_text.strip().upper()
-            
-            logger.debug(f"👉 Found Button: '{btn_text}'")
-
-            # 4. 黑名单检查：只有这些情况绝对不能点
-            # 如果是 'IN LIBRARY', 'OWNED', 'UNAVAILABLE', 'COMING SOON' -> 跳过
-            if any(s in btn_text_upper for s in ["IN LIBRARY", "OWNED", "UNAVAILABLE", "COMING SOON"]):
-                logger.success(f"Game status is '{btn_text}' - Skipping.")
-                continue
-
-            # 5. 白名单检查 (Add to Cart 特殊处理)
-            # 如果包含 'CART'，说明是加入购物车流程
-            if "CART" in btn_text_upper:
-                logger.debug(f"🛒 Logic: Add To Cart - {url=}")
-                await purchase_btn.click()
-                has_pending_cart_items = True
-                continue
-            
-            # 6. 默认处理 (盲点逻辑)
-            # 只要不是黑名单，也不是购物车，统统当做 "Get/Purchase" 直接点击！
-            # 不管它写的是 'Get', 'Free', 'Purchase', 'Buy Now'，只要 API 说是免费的，我们就点！
-            logger.debug(f"⚡️ Logic: Aggressive Click (Text: {btn_text}) - {url=}")
+        # 3. 获取按钮文字
+        btn_text = await purchase_btn.text_content()
+        if not btn_text: btn_text = ""
+        btn_text_upper = btn_text.strip().upper()
+        
+        logger.debug(f"👉 Found Button: '{btn_text}'")
+
+        # 4. 黑名单检查：只有这些情况绝对不能点
+        # 如果是 'IN LIBRARY', 'OWNED', 'UNAVAILABLE', 'COMING SOON' -> 跳过
+        if any(s in btn_text_upper for s in ["IN LIBRARY", "OWNED", "UNAVAILABLE", "COMING SOON"]):
+            logger.success(f"Game status is '{btn_text}' - Skipping.")
+            return False
+
+        # 5. 白名单检查 (Add to Cart 特殊处理)
+        # 如果包含 'CART'，说明是加入购物车流程
+        if "CART" in btn_text_upper:
+            logger.debug(f"🛒 Logic: Add To Cart - {url=}")
             await purchase_btn.click()
-            
-            # 点击后，转入即时结账流程
-            await self._handle_instant_checkout(page)
-            # ------------------------------------------------------------
+            return True
+        
+        # 6. 默认处理 (盲点逻辑)
+        # 只要不是黑名单，也不是购物车，统统当做 "Get/Purchase" 直接点击！
+        # 不管它写的是 'Get', 'Free', 'Purchase', 'Buy Now'，只要 API 说是免费的，我们就点！
+        logger.debug(f"⚡️ Logic: Aggressive Click (Text: {btn_text}) - {url=}")
+        await purchase_btn.click()
+        
+        # 点击后，转入即时结账流程
+        await self._handle_instant_checkout(page)
+        # ------------------------------------------------------------
+        return False
+
+    async def add_promotion_to_cart(self, page: Page, urls: List[str]) -> bool:
+        has_pending_cart_items = False
+
+        for url in urls:
+            if await self._add_promotion(page, url):
+                has_pending_cart_items = True
 
         return has_pending_cart_items
 
-    async def _empty_cart(self, page: Page, wait_rerender: int = 30) -> bool | None:
-        has_paid_free = False
+    async def add_promotion_to_cart_concurrently(self, urls: List[str], concurrency: int) -> bool:
+        """
+        在同一个浏览器上下文中为每个促销打开独立页面并发处理，人机挑战仍然串行执行
+        Args:
+            urls:
+            concurrency: 同时打开的页面数
+
+        Returns: 是否有游戏被加入购物车
+
+        """
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+        async def worker(url: str) -> bool:
+            async with semaphore:
+                page = await self.page.context.new_page()
+                try:
+                    return await self._add_promotion(page, url)
+                except Exception as err:
+                    logger.warning(f"Failed to handle promotion - {url=} {err=}")
+                    return False
+                finally:
+                    with suppress(Exception):
+                        await page.close()
+
+        results = await asyncio.gather(*[worker(url) for url in urls])
+        return any(results)
+
+    @staticmethod
+    async def _paid_cards(page: Page) -> list:
+        paid = []
+        for card in await page.query_selector_all(CART_CARD_SELECTOR):
+            if not await card.query_selector("//span[text()='Free']"):
+                paid.append(card)
+        return paid
+
+    async def _move_paid_games_to_wishlist(self, page: Page):
+        n_cards = len(await page.query_selector_all(CART_CARD_SELECTOR))
+        paid = await self._paid_cards(page)
+        for card in paid:
+            wishlist_btn = await card.query_selector("//button//span[text()='Move to wishlist']")
+            await wishlist_btn.click()
+
+        if paid:
+            # 等待购物车卡片减少（重新渲染完成），而不是固定休眠
+            with suppress(TimeoutError):
+                await page.wait_for_function(
+                    "([selector, n]) => document.querySelectorAll(selector).length < n",
+                    arg=[CART_CARD_SELECTOR, n_cards],
+                    timeout=CART_RERENDER_TIMEOUT,
+                )
+            raise RetryableError(f"Moved {len(paid)} paid game(s) out, re-check the cart")
+
+    async def _empty_cart(self, page: Page) -> bool:
         try:
-            cards = await page.query_selector_all("//div[@data-testid='offer-card-layout-wrapper']")
-            for card in cards:
-                is_free = await card.query_selector("//span[text()='Free']")
-                if not is_free:
-                    has_paid_free = True
-                    wishlist_btn = await card.query_selector(
-                        "//button//span[text()='Move to wishlist']"
-                    )
-                    await wishlist_btn.click()
-
-            if has_paid_free and wait_rerender:
-                wait_rerender -= 1
-                await page.wait_for_timeout(2000)
-                return await self._empty_cart(page, wait_rerender)
+            await self._cart_retry.run(self._move_paid_games_to_wishlist, page)
             return True
-        except TimeoutError as err:
+        except (RetryExhausted, TimeoutError) as err:
+            # 最后一轮仍然移出了游戏时，结果还没有被检查过，再确认一次购物车
+            if isinstance(err, RetryExhausted) and isinstance(err.last_error, RetryableError):
+                with suppress(TimeoutError):
+                    if not await self._paid_cards(page):
+                        return True
             logger.warning("Failed to empty shopping cart", err=err)
             return False
 
-    async def _purchase_free_game(self):
+    async def _purchase_attempt(self):
+        from hcaptcha_challenger.models import ChallengeSignal
+
         await self.page.goto(URL_CART, wait_until="domcontentloaded")
         logger.debug("Move ALL paid games from the shopping cart out")
         await self._empty_cart(self.page)
 
-        agent = AgentV(page=self.page, agent_config=settings)
+        solver = SolverManager.for_context(self.page.context)
+        solver.get(self.page)
+        solver.reset(self.page)
         await self.page.click("//button//span[text()='Check Out']")
         await self._agree_license(self.page)
 
+        logger.debug("Move to webPurchaseContainer iframe")
+        wpc, payment_btn = await self._active_purchase_container(self.page)
+        logger.debug("Click payment button")
+        await self._uk_confirm_order(wpc)
+        signal = await solver.solve(self.page)
+        if signal != ChallengeSignal.SUCCESS:
+            raise RetryableError(f"Captcha challenge not passed - {signal=}")
+
+    @traced("checkout.cart")
+    async def _purchase_free_game(self) -> bool:
         try:
-            logger.debug("Move to webPurchaseContainer iframe")
-            wpc, payment_btn = await self._active_purchase_container(self.page)
-            logger.debug("Click payment button")
-            await self._uk_confirm_order(wpc)
-            await agent.wait_for_challenge()
-        except Exception as err:
+            await self._checkout_retry.run(self._purchase_attempt)
+            return True
+        except RetryExhausted as err:
             logger.warning(f"Failed to solve captcha - {err}")
-            await self.page.reload()
-            return await self._purchase_free_game()
+            return False
 
     @retry(retry=retry_if_exception_type(TimeoutError), stop=stop_after_attempt(2), reraise=True)
     async def collect_weekly_games(self, promotions: List[PromotionGame]):
         urls = [p.url for p in promotions]
-        has_cart_items = await self.add_promotion_to_cart(self.page, urls)
+        if settings.PROMOTION_CONCURRENCY > 1 and len(urls) > 1:
+            has_cart_items = await self.add_promotion_to_cart_concurrently(
+                urls, concurrency=settings.PROMOTION_CONCURRENCY
+            )
+        else:
+            has_cart_items = await self.add_promotion_to_cart(self.page, urls)
 
         if has_cart_items:
-            await self._purchase_free_game()
+            if not await self._purchase_free_game():
+                logger.warning("Failed to collect cart games")
+                return
             try:
                 await self.page.wait_for_url(URL_CART_SUCCESS)
                 logger.success("🎉 Successfully collected cart games")
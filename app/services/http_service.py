@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/10 10:05
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 非浏览器 Epic 接口共用的 httpx.AsyncClient：HTTP/2、keep-alive、有界连接池与统一超时
+
+同一进程内的所有账号复用同一个连接池。AsyncClient 绑定创建它的事件循环，
+Celery 任务每次 asyncio.run 都会得到新的循环，因此按循环惰性创建客户端。
+"""
+import asyncio
+from importlib.util import find_spec
+
+import httpx
+from loguru import logger
+
+HTTP_TIMEOUT = httpx.Timeout(15.0, connect=5.0)
+HTTP_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60)
+HTTP_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:135.0) Gecko/20100101 Firefox/135.0"
+    ),
+    "Accept": "application/json",
+}
+
+_client: httpx.AsyncClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+
+
+def create_http_client(**kwargs) -> httpx.AsyncClient:
+    options = {
+        # h2 由 httpx[http2] 提供，缺失时退回 HTTP/1.1 keep-alive
+        "http2": find_spec("h2") is not None,
+        "timeout": HTTP_TIMEOUT,
+        "limits": HTTP_LIMITS,
+        "headers": HTTP_HEADERS,
+        "follow_redirects": True,
+        **kwargs,
+    }
+    return httpx.AsyncClient(**options)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """返回当前事件循环共享的客户端"""
+    global _client, _client_loop
+
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = create_http_client()
+        _client_loop = loop
+        logger.debug("Shared HTTP client created")
+    return _client
+
+
+async def aclose_http_client():
+    global _client, _client_loop
+
+    if _client is not None and _client_loop is asyncio.get_running_loop():
+        await _client.aclose()
+    _client = None
+    _client_loop = None
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/2 17:05
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 已入库游戏的本地台账，替代每次运行都全量解析订单记录
+"""
+import json
+from pathlib import Path
+from typing import Dict, Iterable, Set
+
+from loguru import logger
+
+from models import OrderItem
+from settings import RUNTIME_DIR
+
+LEDGER_DIR = RUNTIME_DIR.joinpath("ledger")
+
+
+class ClaimLedger:
+    """
+    按账号保存的 append-only JSONL 台账
+
+    - 每行记录一个已入库的 OrderItem，按 offerId（缺省时按 namespace）去重
+    - 同目录的 .cursor 文件记录已同步的最新订单时间（createdAtMillis），
+      下一次同步只需解析比它更新的订单
+    - 一次同步没能翻到游标（超过翻页上限）时，.backfill 文件记录断点，游标保持不动，
+      下一次同步从断点继续
+    """
+
+    def __init__(self, email: str, ledger_dir: Path = LEDGER_DIR):
+        self.path = ledger_dir.joinpath(f"{email}.jsonl")
+        self.cursor_path = ledger_dir.joinpath(f"{email}.cursor")
+        self.backfill_path = ledger_dir.joinpath(f"{email}.backfill")
+
+        self._items: Dict[str, OrderItem] | None = None
+        self._namespaces: Set[str] = set()
+        self._cursor: int | None = None
+
+    @staticmethod
+    def _key(item: OrderItem) -> str:
+        return item.offerId or item.namespace
+
+    def _load(self) -> Dict[str, OrderItem]:
+        items = {}
+        if not self.path.is_file():
+            return items
+        with self.path.open("r", encoding="utf8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                    item = OrderItem(
+                        description=record.get("description", ""),
+                        offerId=record.get("offerId", ""),
+                        namespace=record["namespace"],
+                    )
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    continue
+                items[self._key(item)] = item
+                self._namespaces.add(item.namespace)
+        return items
+
+    @property
+    def items(self) -> Dict[str, OrderItem]:
+        if self._items is None:
+            self._items = self._load()
+        return self._items
+
+    @property
+    def namespaces(self) -> Set[str]:
+        _ = self.items
+        return self._namespaces
+
+    @property
+    def cursor(self) -> int | None:
+        """已同步的最新订单时间戳（毫秒），None 表示从未同步"""
+        if self._cursor is None and self.cursor_path.is_file():
+            try:
+                self._cursor = int(self.cursor_path.read_text(encoding="utf8").strip())
+            except ValueError:
+                self._cursor = None
+        return self._cursor
+
+    @property
+    def backfill(self) -> dict | None:
+        """
+        未完成的订单同步断点，None 表示没有
+            next_page_token: 下一页的 nextPageToken
+            cursor: 断点之后要翻到的旧游标
+            latest: 断点之前已经同步过的最新订单时间，补齐后成为新的游标
+        """
+        try:
+            return json.loads(self.backfill_path.read_text(encoding="utf8"))
+        except (OSError, ValueError):
+            return None
+
+    def set_backfill(self, state: dict | None):
+        try:
+            if state is None:
+                self.backfill_path.unlink(missing_ok=True)
+            else:
+                self.backfill_path.parent.mkdir(parents=True, exist_ok=True)
+                self.backfill_path.write_text(json.dumps(state), encoding="utf8")
+        except OSError as err:
+            logger.warning(f"Failed to update claim ledger backfill - {err}")
+
+    def __contains__(self, key: str) -> bool:
+        """按 namespace 或 offerId 判断是否已入库"""
+        return key in self.namespaces or key in self.items
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def add_items(self, items: Iterable[OrderItem], cursor: int | None = None) -> int:
+        """追加台账中尚未出现的订单条目并推进同步游标，返回新增数量"""
+        new_items = {}
+        for item in items:
+            if (key := self._key(item)) not in self.items:
+                new_items[key] = item
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if new_items:
+                with self.path.open("a", encoding="utf8") as file:
+                    for item in new_items.values():
+                        file.write(item.model_dump_json() + "\n")
+            if cursor and cursor > (self.cursor or 0):
+                self.cursor_path.write_text(str(cursor), encoding="utf8")
+                self._cursor = cursor
+        except OSError as err:
+            logger.warning(f"Failed to update claim ledger - {err}")
+            return 0
+
+        self.items.update(new_items)
+        self._namespaces.update(item.namespace for item in new_items.values())
+        return len(new_items)
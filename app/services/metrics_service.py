@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/12 15:40
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : Prometheus 指标：常驻的 deploy() 调度进程与 Celery worker 共用
+
+prometheus_client 是可选依赖（pip install prometheus-client），未安装或未配置 METRICS_PORT 时
+所有记录函数都是空操作，不影响领取流程。
+
+Celery 的 prefork 子进程每跑一个任务就退出（worker_max_tasks_per_child=1），需要设置
+PROMETHEUS_MULTIPROC_DIR，子进程把指标写入该目录，由 worker 主进程汇总后暴露。
+
+指标：
+    epic_job_runs_total{job_id,status}         调度任务 / Celery 任务的执行次数
+    epic_job_duration_seconds{job_id}          任务耗时
+    epic_claims_total{result}                  succeeded / failed / skipped
+    epic_captcha_attempts_total{signal}        人机挑战次数
+    epic_captcha_duration_seconds              人机挑战耗时
+    epic_llm_calls_total{model}                模型调用次数
+    epic_browser_rss_bytes                     浏览器子进程的常驻内存之和（抓取时采样）
+    epic_next_run_timestamp_seconds{job_id}    下一次调度时间
+"""
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from importlib.util import find_spec
+from pathlib import Path
+from typing import Dict, Literal
+
+from loguru import logger
+
+from settings import settings
+
+ClaimResult = Literal["succeeded", "failed", "skipped"]
+
+METRICS_ENABLED = find_spec("prometheus_client") is not None
+
+if METRICS_ENABLED:
+    from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, start_http_server
+
+    REGISTRY = CollectorRegistry()
+
+    JOB_RUNS = Counter(
+        "epic_job_runs", "Scheduled job runs", ["job_id", "status"], registry=REGISTRY
+    )
+    JOB_DURATION = Histogram(
+        "epic_job_duration_seconds",
+        "Scheduled job duration",
+        ["job_id"],
+        buckets=(10, 30, 60, 120, 300, 600, 900, 1200, 1800),
+        registry=REGISTRY,
+    )
+    CLAIMS = Counter("epic_claims", "Claim outcomes per promotion", ["result"], registry=REGISTRY)
+    CAPTCHA_ATTEMPTS = Counter(
+        "epic_captcha_attempts", "Captcha challenges", ["signal"], registry=REGISTRY
+    )
+    CAPTCHA_DURATION = Histogram(
+        "epic_captcha_duration_seconds",
+        "Captcha challenge duration",
+        buckets=(1, 2.5, 5, 10, 20, 30, 60, 120),
+        registry=REGISTRY,
+    )
+    LLM_CALLS = Counter("epic_llm_calls", "LLM calls", ["model"], registry=REGISTRY)
+    # 多进程模式下子进程在任务结束后退出，保留最后一次写入的值
+    BROWSER_RSS = Gauge(
+        "epic_browser_rss_bytes",
+        "Browser processes RSS",
+        multiprocess_mode="mostrecent",
+        registry=REGISTRY,
+    )
+    NEXT_RUN = Gauge(
+        "epic_next_run_timestamp_seconds",
+        "Next scheduled run",
+        ["job_id"],
+        multiprocess_mode="mostrecent",
+        registry=REGISTRY,
+    )
+
+_server_started = False
+
+
+def is_multiprocess() -> bool:
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def _child_pids(root: int) -> list:
+    """遍历 /proc 找出 root 的全部后代进程（Camoufox/Firefox 及其内容进程）"""
+    parents: Dict[int, list] = {}
+    for stat in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            # 进程名可能包含空格，ppid 在最后一个 ')' 之后的第二个字段
+            fields = stat.read_text().rsplit(")", 1)[1].split()
+            parents.setdefault(int(fields[1]), []).append(int(stat.parent.name))
+        except (OSError, IndexError, ValueError):
+            continue
+
+    pids, stack = [], [root]
+    while stack:
+        for pid in parents.get(stack.pop(), []):
+            pids.append(pid)
+            stack.append(pid)
+    return pids
+
+
+def browser_rss_bytes(root: int | None = None) -> int:
+    """当前进程所有子进程的常驻内存之和，非 Linux 平台返回 0"""
+    if not Path("/proc").is_dir():
+        return 0
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    total = 0
+    for pid in _child_pids(root or os.getpid()):
+        try:
+            total += int(Path(f"/proc/{pid}/statm").read_text().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+def start_metrics_server(port: int | None = None) -> bool:
+    """启动内嵌的 /metrics HTTP 服务，未安装 prometheus_client 或未配置端口时跳过"""
+    global _server_started
+
+    port = port or settings.METRICS_PORT
+    if _server_started or not port:
+        return _server_started
+    if not METRICS_ENABLED:
+        logger.warning("METRICS_PORT is set but prometheus_client is not installed")
+        return False
+
+    registry = REGISTRY
+    if is_multiprocess():
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+
+    try:
+        start_http_server(port, addr=settings.METRICS_ADDR, registry=registry)
+    except OSError as err:
+        logger.warning(f"Failed to start metrics server - {port=} {err}")
+        return False
+
+    if not is_multiprocess():
+        # 单进程（deploy 调度器）在每次抓取时实时采样，多进程由任务调用 sample_browser_rss
+        BROWSER_RSS.set_function(browser_rss_bytes)
+    _server_started = True
+    logger.debug(f"Metrics server started - http://{settings.METRICS_ADDR}:{port}/metrics")
+    return True
+
+
+def record_job(job_id: str, status: str, duration: float):
+    if METRICS_ENABLED:
+        JOB_RUNS.labels(job_id=job_id, status=status).inc()
+        JOB_DURATION.labels(job_id=job_id).observe(duration)
+
+
+class JobRun:
+    """observe_job 的句柄：任务内部吞掉了异常时，由调用方把 ok 置为 False"""
+
+    ok: bool = True
+
+
+def job_status(ok) -> str:
+    """任务返回 False 视为失败，None（没有返回值）视为成功"""
+    return "error" if ok is False else "ok"
+
+
+@contextmanager
+def observe_job(job_id: str):
+    start = time.perf_counter()
+    run = JobRun()
+    status = "error"
+    try:
+        yield run
+        status = job_status(run.ok)
+    finally:
+        record_job(job_id, status, time.perf_counter() - start)
+
+
+def record_claim(result: ClaimResult, count: int = 1):
+    if METRICS_ENABLED and count:
+        CLAIMS.labels(result=result).inc(count)
+
+
+def record_captcha(signal: str, duration: float):
+    if METRICS_ENABLED:
+        CAPTCHA_ATTEMPTS.labels(signal=signal).inc()
+        CAPTCHA_DURATION.observe(duration)
+
+
+def record_llm_call(model: str):
+    if METRICS_ENABLED:
+        LLM_CALLS.labels(model=model).inc()
+
+
+def sample_browser_rss():
+    """在浏览器关闭前采样一次，供 Celery 子进程使用"""
+    if METRICS_ENABLED:
+        BROWSER_RSS.set(browser_rss_bytes())
+
+
+def mark_process_dead(pid: int):
+    """多进程模式下清理已退出子进程的 live 指标文件"""
+    if METRICS_ENABLED and is_multiprocess():
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(pid)
+
+
+def set_next_run(job_id: str, next_run: datetime | None):
+    if METRICS_ENABLED:
+        NEXT_RUN.labels(job_id=job_id).set(next_run.timestamp() if next_run else 0)
+
+
+def instrument_scheduler(scheduler):
+    """
+    监听 APScheduler 的任务事件，记录每个 job_id 的执行次数与耗时，并刷新下一次调度时间
+
+    AsyncIOScheduler 在任务协程结束时才发出 EXECUTED/ERROR 事件，耗时从 SUBMITTED 开始计算；
+    浏览器任务会自行捕获异常，任务返回 False 时同样记为 error
+    """
+    from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_EXECUTED, EVENT_JOB_SUBMITTED
+
+    started: Dict[str, float] = {}
+
+    def refresh_next_runs():
+        for job in scheduler.get_jobs():
+            set_next_run(job.id, job.next_run_time)
+
+    def listener(event):
+        if event.code == EVENT_JOB_SUBMITTED:
+            started[event.job_id] = time.perf_counter()
+        else:
+            start = started.pop(event.job_id, None)
+            failed = event.code == EVENT_JOB_ERROR
+            status = "error" if failed else job_status(getattr(event, "retval", None))
+            if start is not None:
+                record_job(event.job_id, status, time.perf_counter() - start)
+        refresh_next_runs()
+
+    scheduler.add_listener(listener, EVENT_JOB_SUBMITTED | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
+    return refresh_next_runs
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/13 14:10
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 人机挑战的模型路由：按（模型，中转地址）统计滚动延迟与错误率，对冲请求并自动降级
+
+挑战窗口很短，决定成败的是尾延迟而不是平均延迟：
+- 请求超过该路由的 p90 仍未返回时，向下一个候选（另一个中转或 flash 模型）发出第二个请求，先返回者胜出
+- 某条路由近期的 p90 超过 MODEL_SLOW_THRESHOLD 或错误率过高时排到候选末尾，pro 模型变慢即自动降级到 flash
+- 对冲落败被取消的请求按已等待的时长记为截尾样本（真实延迟不低于此值），同时计入失败率，
+  否则一直落败的慢路由只剩下偶尔赢的快样本，永远不会被降级
+- 统计只保留 MODEL_STATS_TTL 内的样本，过期后被降级的路由会重新获得首发机会
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, NamedTuple, TypeVar
+
+from loguru import logger
+
+from settings import settings
+
+T = TypeVar("T")
+
+MIN_SAMPLES = 5
+
+
+class Route(NamedTuple):
+    model: str
+    # None 表示调用方自己的客户端（GEMINI_BASE_URL）
+    base_url: str | None = None
+
+
+class RouteStats:
+    def __init__(self, window: int, ttl: float):
+        self.ttl = ttl
+        # (timestamp, seconds, outcome)，outcome 为 ok / error / censored
+        self._samples: deque = deque(maxlen=window)
+
+    def _prune(self, now: float):
+        while self._samples and now - self._samples[0][0] > self.ttl:
+            self._samples.popleft()
+
+    def record(
+        self, seconds: float, ok: bool, now: float | None = None, *, censored: bool = False
+    ):
+        """censored: 请求被取消，seconds 只是真实延迟的下界"""
+        now = now or time.monotonic()
+        self._prune(now)
+        outcome = "censored" if censored else ("ok" if ok else "error")
+        self._samples.append((now, seconds, outcome))
+
+    def quantile(self, q: float, now: float | None = None) -> float | None:
+        """成功与截尾请求的延迟分位数，样本不足时返回 None"""
+        self._prune(now or time.monotonic())
+        latencies = sorted(s for _, s, outcome in self._samples if outcome != "error")
+        if len(latencies) < MIN_SAMPLES:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q))]
+
+    def error_rate(self, now: float | None = None) -> float:
+        """失败或对冲落败的比例"""
+        self._prune(now or time.monotonic())
+        if len(self._samples) < MIN_SAMPLES:
+            return 0.0
+        return sum(outcome != "ok" for _, _, outcome in self._samples) / len(self._samples)
+
+
+class ModelRouter:
+    """
+    Usage:
+        router = ModelRouter.from_settings()
+        response = await router.generate(lambda route: call(route), model="gemini-2.5-pro")
+    """
+
+    def __init__(
+        self,
+        fallbacks: Dict[str, List[str]] | None = None,
+        base_urls: List[str] | None = None,
+        *,
+        window: int = 50,
+        ttl: float = 600,
+        hedge_quantile: float = 0.9,
+        hedge_min_delay: float = 3,
+        hedge_default_delay: float = 10,
+        slow_threshold: float = 15,
+        max_error_rate: float = 0.5,
+    ):
+        self.fallbacks = fallbacks or {}
+        self.base_urls: List[str | None] = [None, *(base_urls or [])]
+        self.window = window
+        self.ttl = ttl
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+        self.slow_threshold = slow_threshold
+        self.max_error_rate = max_error_rate
+        self._stats: Dict[Route, RouteStats] = {}
+
+    @classmethod
+    def from_settings(cls) -> "ModelRouter":
+        return cls(
+            settings.MODEL_FALLBACKS,
+            settings.GEMINI_FALLBACK_BASE_URLS,
+            window=settings.MODEL_STATS_WINDOW,
+            ttl=settings.MODEL_STATS_TTL,
+            hedge_quantile=settings.MODEL_HEDGE_QUANTILE,
+            hedge_min_delay=settings.MODEL_HEDGE_MIN_DELAY,
+            hedge_default_delay=settings.MODEL_HEDGE_DEFAULT_DELAY,
+            slow_threshold=settings.MODEL_SLOW_THRESHOLD,
+        )
+
+    def stats(self, route: Route) -> RouteStats:
+        if route not in self._stats:
+            self._stats[route] = RouteStats(self.window, self.ttl)
+        return self._stats[route]
+
+    def is_degraded(self, route: Route) -> bool:
+        stats = self.stats(route)
+        p = stats.quantile(self.hedge_quantile)
+        return (p is not None and p > self.slow_threshold) or (
+            stats.error_rate() > self.max_error_rate
+        )
+
+    def candidates(self, model: str) -> List[Route]:
+        """请求的模型优先、其后是它的降级模型；每个模型依次尝试各个中转，变慢的路由排到末尾"""
+        models = list(dict.fromkeys([model, *self.fallbacks.get(model, [])]))
+        routes = [Route(m, url) for m in models for url in self.base_urls]
+        # sorted 是稳定的，未降级的路由保持配置顺序
+        return sorted(routes, key=self.is_degraded)
+
+    def hedge_delay(self, route: Route) -> float:
+        p = self.stats(route).quantile(self.hedge_quantile)
+        return self.hedge_default_delay if p is None else max(self.hedge_min_delay, p)
+
+    async def generate(self, call: Callable[[Route], Awaitable[T]], model: str) -> T:
+        """
+        同时最多两个请求在途：首个请求超过其 p90 未返回时对冲下一个候选，失败时立即切换
+        Args:
+            call: 对给定路由发起一次请求
+            model: 调用方请求的模型
+
+        Returns:
+            最先成功返回的响应
+
+        """
+        candidates = self.candidates(model)
+        pending: Dict[asyncio.Task, tuple] = {}
+        last_error: BaseException | None = None
+
+        def launch():
+            route = candidates.pop(0)
+            pending[asyncio.ensure_future(call(route))] = (route, time.monotonic())
+
+        launch()
+        try:
+            while pending:
+                hedge = len(pending) == 1 and candidates
+                timeout = self.hedge_delay(next(iter(pending.values()))[0]) if hedge else None
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    logger.debug(f"Hedge model request - after={timeout:.1f}s next={candidates[0]}")
+                    launch()
+                    continue
+
+                for task in done:
+                    route, start = pending.pop(task)
+                    elapsed = time.monotonic() - start
+                    if (err := task.exception()) is None:
+                        self.stats(route).record(elapsed, True)
+                        return task.result()
+                    self.stats(route).record(elapsed, False)
+                    last_error = err
+                    logger.warning(f"Model request failed - {route=} {err=}")
+
+                if not pending and candidates:
+                    launch()
+            raise last_error
+        finally:
+            # 落后的请求直接取消，已等待的时长作为截尾样本计入统计
+            now = time.monotonic()
+            for task, (route, start) in pending.items():
+                task.cancel()
+                self.stats(route).record(now - start, False, now, censored=True)
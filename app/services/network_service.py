@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/6 22:15
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 浏览器上下文的请求拦截：商城页面不加载视频、图片、字体与第三方统计
+
+注意：Playwright 只要在上下文上注册了 route，就会关闭该上下文的 HTTP 缓存。持久化 Profile
+中缓存的商城 JS/CSS 因此每次都会重新下载，拦截省下的流量可能还抵不上缓存失效多出的流量。
+默认 off；lite/strict 适合本来就没有缓存的场景（storage_state 模式的临时上下文、首次运行）。
+这里只为会被拦截的资源（按扩展名）和统计域名注册具体的 glob，而不是 **/*，其余请求不经过 Python。
+"""
+from collections import Counter
+from typing import Literal
+from urllib.parse import urlparse
+
+from loguru import logger
+from playwright.async_api import BrowserContext, Route
+
+from settings import settings
+
+NetworkProfile = Literal["off", "lite", "strict"]
+
+BLOCKED_RESOURCE_TYPES = {
+    "off": set(),
+    "lite": {"media", "font"},
+    "strict": {"media", "font", "image"},
+}
+
+# 人机挑战与付款 iframe 的资源一律放行
+ALLOWED_HOST_SUFFIXES = ("hcaptcha.com", "payment-website-pci.ol.epicgames.com")
+ALLOWED_FRAME_KEYWORDS = ("hcaptcha", "purchase", "payment")
+
+TRACKER_HOST_SUFFIXES = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "facebook.net",
+    "facebook.com",
+    "hotjar.com",
+    "sentry.io",
+    "datadoghq.com",
+    "browser-intake-datadoghq.com",
+    "bat.bing.com",
+    "analytics.tiktok.com",
+    "redditstatic.com",
+    "onetrust.com",
+    "cookielaw.org",
+    "tracking.epicgames.com",
+)
+
+# 按资源类型注册的 URL glob，route 只能按 URL 匹配，处理函数里再核对 resource_type
+RESOURCE_TYPE_GLOBS = {
+    "media": ("**/*.{mp4,webm,m3u8,m4s,mov}", "**/*.{mp4,webm,m3u8,m4s,mov}?*"),
+    "font": ("**/*.{woff,woff2,ttf,otf}", "**/*.{woff,woff2,ttf,otf}?*"),
+    "image": (
+        "**/*.{png,jpg,jpeg,gif,webp,avif,svg}",
+        "**/*.{png,jpg,jpeg,gif,webp,avif,svg}?*",
+    ),
+}
+
+# 被拦截的请求没有响应，拿不到真实大小，按类型的典型体积估算节省的流量（字节）
+ESTIMATED_BYTES = {
+    "media": 2_000_000,
+    "image": 80_000,
+    "font": 40_000,
+    "tracker": 25_000,
+}
+
+def _host_matches(host: str, suffixes) -> bool:
+    return any(host == s or host.endswith(f".{s}") for s in suffixes)
+
+
+def tracker_globs() -> list:
+    return [g for s in TRACKER_HOST_SUFFIXES for g in (f"*://{s}/**", f"*://*.{s}/**")]
+
+
+class NetworkStats:
+    def __init__(self):
+        self.blocked = Counter()
+        self.allowed = 0
+
+    @property
+    def blocked_requests(self) -> int:
+        return sum(self.blocked.values())
+
+    @property
+    def estimated_bytes_saved(self) -> int:
+        return sum(ESTIMATED_BYTES.get(k, 0) * n for k, n in self.blocked.items())
+
+    def log_summary(self):
+        if not self.blocked_requests:
+            return
+        logger.debug(
+            f"Network profile summary - blocked={self.blocked_requests} allowed={self.allowed} "
+            f"estimated_saved={self.estimated_bytes_saved / 1024 / 1024:.1f}MB "
+            f"(typical size per type, not measured) detail={dict(self.blocked)}"
+        )
+
+
+class RequestBlocker:
+    def __init__(self, profile: NetworkProfile):
+        self.profile = profile
+        self.blocked_types = BLOCKED_RESOURCE_TYPES.get(profile, set())
+        self.stats = NetworkStats()
+
+    def classify(self, url: str, resource_type: str, frame_url: str = "") -> str | None:
+        """返回拦截原因（资源类型或 tracker），放行时返回 None"""
+        host = urlparse(url).hostname or ""
+        if _host_matches(host, ALLOWED_HOST_SUFFIXES):
+            return None
+        if any(k in frame_url for k in ALLOWED_FRAME_KEYWORDS):
+            return None
+        if _host_matches(host, TRACKER_HOST_SUFFIXES):
+            return "tracker"
+        if resource_type in self.blocked_types:
+            return resource_type
+        return None
+
+    async def handle(self, route: Route):
+        request = route.request
+        frame_url = ""
+        try:
+            frame_url = request.frame.url
+        except Exception:
+            # Service Worker 发起的请求没有 frame
+            pass
+
+        if reason := self.classify(request.url, request.resource_type, frame_url):
+            self.stats.blocked[reason] += 1
+            await route.abort("blockedbyclient")
+            return
+
+        self.stats.allowed += 1
+        await route.fallback()
+
+
+async def apply_network_profile(
+    context: BrowserContext, profile: NetworkProfile | None = None
+) -> NetworkStats | None:
+    """在浏览器上下文上挂载请求拦截，返回本次运行的统计对象；off 模式不挂载"""
+    profile = profile or settings.NETWORK_BLOCK_PROFILE
+    if profile == "off":
+        return None
+
+    blocker = RequestBlocker(profile)
+    globs = [g for t in sorted(blocker.blocked_types) for g in RESOURCE_TYPE_GLOBS[t]]
+    globs.extend(tracker_globs())
+    for url in globs:
+        await context.route(url, blocker.handle)
+    logger.debug(f"Network profile applied - {profile=} routes={len(globs)} (HTTP cache disabled)")
+    return blocker.stats
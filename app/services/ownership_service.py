@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/10 15:40
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 游戏归属查询：直接请求订单记录 JSON（携带浏览器上下文的 Cookie），不再导航页面
+
+页面导航 + 解析 //pre 的方式每次都要加载整个标签页，这里改用 page.request（与浏览器上下文共享
+Cookie）按页拉取订单记录，并以台账为基础一次性回答一批 namespace/offerId 是否已拥有。
+"""
+from typing import Dict, Iterable, List, Tuple
+
+from loguru import logger
+from playwright.async_api import APIRequestContext
+
+from models import Order, OrderItem
+from services.ledger_service import ClaimLedger
+
+URL_ORDER_HISTORY = "https://www.epicgames.com/account/v2/payment/ajaxGetOrderHistory"
+
+
+class SessionExpired(RuntimeError):
+    """订单接口返回未登录，浏览器上下文中的会话已失效"""
+
+
+# 订单记录按时间倒序分页，增量同步通常只需要第一页；单次同步的翻页上限，超出部分下次继续
+MAX_ORDER_PAGES = 20
+
+
+class OwnershipClient:
+    """
+    Usage:
+        client = OwnershipClient(page.request, ledger)
+        await client.sync()
+        owned = client.owned([p.namespace for p in promotions])
+    """
+
+    def __init__(
+        self, request: APIRequestContext, ledger: ClaimLedger, max_pages: int = MAX_ORDER_PAGES
+    ):
+        self.request = request
+        self.ledger = ledger
+        self.max_pages = max_pages
+
+    async def _fetch_page(self, next_page_token: str | None) -> dict:
+        params = {"sortDir": "DESC", "sortBy": "DATE", "locale": "en-US"}
+        if next_page_token:
+            params["nextPageToken"] = next_page_token
+        resp = await self.request.get(URL_ORDER_HISTORY, params=params)
+        if resp.status in (401, 403):
+            raise SessionExpired(f"Order history is unauthenticated - status={resp.status}")
+        if not resp.ok:
+            raise RuntimeError(f"Order history request failed - status={resp.status}")
+        return await resp.json()
+
+    async def fetch_new_orders(
+        self, cursor: int | None = None, next_page_token: str | None = None
+    ) -> Tuple[List[OrderItem], int | None, str | None]:
+        """
+        拉取比游标更新的订单
+        Args:
+            cursor: 台账中最新订单的 createdAtMillis，遇到不晚于它的订单即停止翻页
+            next_page_token: 从该页开始翻页，缺省从第一页（最新的订单）开始
+
+        Returns:
+            (已完成的 PURCHASE 订单条目, 最新的 createdAtMillis, 断点)；
+            翻到游标或没有更多订单时断点为 None，否则为下一页的 nextPageToken
+
+        """
+        latest = cursor
+        items: List[OrderItem] = []
+
+        for _ in range(self.max_pages):
+            data = await self._fetch_page(next_page_token)
+            reached_cursor = False
+            for _order in data.get("orders", []):
+                created_at = _order.get("createdAtMillis")
+                if cursor and created_at and created_at <= cursor:
+                    reached_cursor = True
+                    break
+                latest = max(latest or 0, created_at or 0)
+                if _order.get("orderType") != "PURCHASE":
+                    continue
+                order = Order(**_order)
+                items.extend(i for i in order.items if i.namespace and len(i.namespace) == 32)
+
+            next_page_token = data.get("nextPageToken")
+            if reached_cursor or not next_page_token or not data.get("orders"):
+                return items, latest, None
+
+        logger.debug(f"Order history paging limit reached - pages={self.max_pages}")
+        return items, latest, next_page_token
+
+    async def sync(self) -> List[OrderItem]:
+        """
+        增量同步订单记录到台账，返回本次新拉取的条目
+
+        只有翻到旧游标（或没有更多订单）时才推进游标，否则记录断点：
+        下一次先同步断点之前新增的订单，再从断点继续翻到旧游标。
+        """
+        backfill = self.ledger.backfill
+        head_cursor = backfill["latest"] if backfill else self.ledger.cursor
+        items, latest, token = await self.fetch_new_orders(head_cursor)
+
+        if token:
+            # 最新的一段就没翻完，从这里继续即可覆盖旧断点之后的全部订单
+            old_cursor = backfill["cursor"] if backfill else self.ledger.cursor
+            backfill = {"next_page_token": token, "cursor": old_cursor, "latest": latest}
+        elif backfill:
+            more, _, token = await self.fetch_new_orders(
+                backfill["cursor"], backfill["next_page_token"]
+            )
+            items.extend(more)
+            backfill = {**backfill, "next_page_token": token, "latest": latest} if token else None
+
+        added = self.ledger.add_items(items, cursor=None if backfill else latest)
+        self.ledger.set_backfill(backfill)
+        logger.debug(
+            f"Order history synced - new_items={added} ledger_size={len(self.ledger)} "
+            f"complete={backfill is None}"
+        )
+        return items
+
+    def owned(self, keys: Iterable[str]) -> Dict[str, bool]:
+        """批量判断 namespace 或 offerId 是否已经拥有"""
+        return {key: key in self.ledger for key in keys}
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/2 17:40
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 启动浏览器之前的预检：根据促销窗口和本地台账判断本次是否需要执行领取任务
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Container, List, Tuple
+
+from loguru import logger
+from pydantic import BaseModel, Field, ValidationError
+
+from models import CatalogElement, PromotionalOfferGroup, PromotionsFeed
+from services.ledger_service import ClaimLedger
+from services.promotions_service import PromotionsClient, client_for_region, load_feed
+
+# 促销开始后留出一点时间，等待商城页面与后端数据同步
+WAKEUP_DELAY = timedelta(minutes=5)
+
+
+class OfferWindow(BaseModel):
+    title: str
+    namespace: str
+    start: datetime
+    end: datetime
+
+
+class RunPlan(BaseModel):
+    should_run: bool
+    reason: str
+    claimable: List[OfferWindow] = Field(default_factory=list)
+    next_wakeup: datetime | None = None
+
+
+def _as_utc(dt: datetime) -> datetime:
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _free_offer_windows(
+    element: CatalogElement, groups: List[PromotionalOfferGroup] | None
+) -> List[OfferWindow]:
+    windows = []
+    for group in groups or []:
+        for offer in group.promotionalOffers:
+            if not offer.is_free or not offer.startDate or not offer.endDate:
+                continue
+            windows.append(
+                OfferWindow(
+                    title=element.title,
+                    namespace=element.namespace,
+                    start=_as_utc(offer.startDate),
+                    end=_as_utc(offer.endDate),
+                )
+            )
+    return windows
+
+
+def extract_offer_windows(feed: PromotionsFeed) -> Tuple[List[OfferWindow], List[OfferWindow]]:
+    """拆分出当前（promotionalOffers）和即将开始（upcomingPromotionalOffers）的免费窗口"""
+    current, upcoming = [], []
+    for e in feed.elements:
+        if not e.promotions:
+            continue
+        current.extend(_free_offer_windows(e, e.promotions.promotionalOffers))
+        upcoming.extend(_free_offer_windows(e, e.promotions.upcomingPromotionalOffers))
+    return current, upcoming
+
+
+def plan_run(
+    feed: PromotionsFeed | dict | None, claimed: Container[str], now: datetime | None = None
+) -> RunPlan:
+    now = now or datetime.now(timezone.utc)
+
+    if not feed:
+        return RunPlan(should_run=True, reason="Promotions feed is unavailable")
+
+    try:
+        current, upcoming = extract_offer_windows(load_feed(feed))
+    except ValidationError as err:
+        return RunPlan(should_run=True, reason=f"Unexpected promotions payload - {err}")
+
+    active = [w for w in current if w.start <= now < w.end]
+    claimable = [w for w in active if w.namespace not in claimed]
+
+    starts = [w.start for w in current + upcoming if w.start > now]
+    next_wakeup = min(starts) + WAKEUP_DELAY if starts else None
+
+    if claimable:
+        return RunPlan(
+            should_run=True,
+            reason=f"{len(claimable)} promotion(s) not in the ledger",
+            claimable=claimable,
+            next_wakeup=next_wakeup,
+        )
+    return RunPlan(
+        should_run=False,
+        reason="All active promotions are already claimed",
+        next_wakeup=next_wakeup,
+    )
+
+
+async def preflight(
+    email: str, client: PromotionsClient | None = None, country: str | None = None
+) -> RunPlan:
+    """读取账号所在地区的 feed（未指定地区时使用默认 feed）并与台账比对"""
+    client = client or client_for_region(country)
+    plan = plan_run(await client.fetch_feed(), ClaimLedger(email))
+    logger.debug(
+        f"Preflight - should_run={plan.should_run} reason='{plan.reason}' "
+        f"next_wakeup={plan.next_wakeup}"
+    )
+    return plan
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/11 15:20
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 账号浏览器状态的持久化：只保存 Epic 域名下的 storage_state，并清理持久化 Profile 中的缓存
+
+持久化 Profile 每次启动都要加载、退出时再写回整个 Firefox 配置目录，缓存与历史记录会越积越多。
+storage_state 模式只保存 Cookie 与 localStorage（仅 Epic 相关域名），从中启动一个临时上下文；
+从旧 Profile 迁移出快照后，旧 Profile 会被删除（remove_profile），只保留快照与会话缓存。
+"""
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Iterable
+from urllib.parse import urlparse
+
+from loguru import logger
+from playwright.async_api import BrowserContext
+
+STORAGE_STATE_NAME = "storage_state.json"
+
+# 登录态只依赖这些域名下的 Cookie 与 localStorage
+STATE_DOMAINS = ("epicgames.com", "hcaptcha.com")
+
+# Firefox Profile 中可以随时删除、会被重新生成的缓存与遥测目录；
+# 历史记录等 *.sqlite 不在清理范围，单独删除数据库而留下 -wal/-shm 时 SQLite 会回放不属于它的日志
+PROFILE_CACHE_ENTRIES = (
+    "cache2",
+    "startupCache",
+    "datareporting",
+    "saved-telemetry-pings",
+)
+
+
+def _match_domain(host: str, domains: Iterable[str] = STATE_DOMAINS) -> bool:
+    host = host.lstrip(".").lower()
+    return any(host == d or host.endswith(f".{d}") for d in domains)
+
+
+def compact_storage_state(state: dict, domains: Iterable[str] = STATE_DOMAINS) -> dict:
+    """只保留指定域名下的 Cookie 与 localStorage"""
+    domains = tuple(domains)
+    return {
+        "cookies": [c for c in state.get("cookies", []) if _match_domain(c["domain"], domains)],
+        "origins": [
+            o
+            for o in state.get("origins", [])
+            if _match_domain(urlparse(o["origin"]).hostname or "", domains)
+        ],
+    }
+
+
+def load_storage_state(path: Path) -> dict | None:
+    try:
+        return json.loads(path.read_text(encoding="utf8"))
+    except (OSError, ValueError):
+        return None
+
+
+async def save_storage_state(context: BrowserContext, path: Path) -> dict:
+    """导出精简后的 storage_state，先写临时文件再替换，避免中途退出留下损坏的快照"""
+    state = compact_storage_state(await context.storage_state())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, ensure_ascii=False, separators=(",", ":")), encoding="utf8")
+    os.replace(tmp, path)
+    logger.debug(
+        f"Storage state saved - cookies={len(state['cookies'])} "
+        f"origins={len(state['origins'])} size={path.stat().st_size}B"
+    )
+    return state
+
+
+def dir_size(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    total = 0
+    for p in path.rglob("*"):
+        try:
+            if p.is_file() and not p.is_symlink():
+                total += p.stat().st_size
+        except OSError:
+            continue
+    return total
+
+
+def prune_profile(user_data_dir: Path) -> int:
+    """删除持久化 Profile 中的缓存目录，返回释放的字节数；登录态（cookies.sqlite、storage）不受影响"""
+    freed = 0
+    for name in PROFILE_CACHE_ENTRIES:
+        target = user_data_dir.joinpath(name)
+        if not target.exists():
+            continue
+        size = dir_size(target)
+        try:
+            shutil.rmtree(target)
+        except OSError as err:
+            logger.warning(f"Failed to prune profile entry - {target} {err}")
+            continue
+        freed += size
+    if freed:
+        logger.debug(f"Profile pruned - {user_data_dir.name} freed={freed / 1024 / 1024:.1f}MB")
+    return freed
+
+
+def remove_profile(user_data_dir: Path, keep: Iterable[str] = (STORAGE_STATE_NAME,)) -> int:
+    """删除整个 Firefox Profile，只保留 keep 中的文件，返回释放的字节数；调用时浏览器必须已关闭"""
+    keep = set(keep)
+    freed = 0
+    for target in user_data_dir.iterdir():
+        if target.name in keep:
+            continue
+        size = dir_size(target)
+        try:
+            if target.is_dir() and not target.is_symlink():
+                shutil.rmtree(target)
+            else:
+                target.unlink()
+        except OSError as err:
+            logger.warning(f"Failed to remove profile entry - {target} {err}")
+            continue
+        freed += size
+    logger.debug(f"Profile removed - {user_data_dir.name} freed={freed / 1024 / 1024:.1f}MB")
+    return freed
@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/2 15:20
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 周免游戏数据源，带 ETag/Last-Modified 条件请求与本地快照复用
+
+配置 PROMOTION_REGIONS 后会并发拉取各国家/地区的 feed（每个地区单独缓存快照），
+按 namespace + offer id 合并去重，并记录每个促销适用的地区。
+"""
+import asyncio
+import re
+import time
+from contextlib import suppress
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import httpx
+from loguru import logger
+from pydantic import BaseModel, ValidationError
+
+from models import Account, CatalogElement, PromotionGame, PromotionsFeed
+from services.http_service import get_http_client
+from settings import RUNTIME_DIR, settings
+
+URL_PROMOTIONS = "https://store-site-backend-static.ak.epicgames.com/freeGamesPromotions"
+URL_PRODUCT_PAGE = "https://store.epicgames.com/en-US/p/"
+URL_PRODUCT_BUNDLES = "https://store.epicgames.com/en-US/bundles/"
+
+_MAX_AGE_PATTERN = re.compile(r"max-age=(\d+)", re.IGNORECASE)
+
+
+class SnapshotMeta(BaseModel):
+    """快照的响应校验器，与 promotions.json 同目录保存"""
+
+    etag: str | None = None
+    last_modified: str | None = None
+    fetched_at: float = 0
+    expires_at: float = 0
+
+    @classmethod
+    def from_response(cls, resp: httpx.Response) -> "SnapshotMeta":
+        now = time.time()
+        return cls(
+            etag=resp.headers.get("ETag"),
+            last_modified=resp.headers.get("Last-Modified"),
+            fetched_at=now,
+            expires_at=now + parse_max_age(resp.headers),
+        )
+
+    @property
+    def is_fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    def conditional_headers(self) -> dict:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+def parse_max_age(headers: httpx.Headers) -> int:
+    """从 Cache-Control 中解析剩余可用秒数，no-cache/no-store 视为立即过期"""
+    cache_control = headers.get("Cache-Control", "")
+    if "no-cache" in cache_control or "no-store" in cache_control:
+        return 0
+    if not (m := _MAX_AGE_PATTERN.search(cache_control)):
+        return 0
+    age = 0
+    with suppress(ValueError):
+        age = int(headers.get("Age", 0))
+    return max(int(m.group(1)) - age, 0)
+
+
+def is_discount_game(element: CatalogElement) -> bool:
+    """本周促销（promotionalOffers 的第一组）中存在 0 折扣的报价"""
+    groups = element.promotions.promotionalOffers if element.promotions else None
+    if not groups:
+        return False
+    return any(offer.is_free for offer in groups[0].promotionalOffers)
+
+
+def is_bundle(element: CatalogElement) -> bool:
+    if element.offerType == "BUNDLE":
+        return True
+    # 补充检测：分类和标题
+    if any("bundle" in c.path.lower() for c in element.categories or []):
+        return True
+    return "Collection" in element.title
+
+
+def load_feed(data: PromotionsFeed | dict | bytes | str) -> PromotionsFeed:
+    """把原始响应（bytes/str）或已解析的 dict 校验为 PromotionsFeed"""
+    if isinstance(data, PromotionsFeed):
+        return data
+    if isinstance(data, (bytes, str)):
+        return PromotionsFeed.model_validate_json(data)
+    return PromotionsFeed.model_validate(data)
+
+
+def parse_promotions(data: PromotionsFeed | dict | bytes | str) -> List[PromotionGame]:
+    """从 freeGamesPromotions 响应中筛选出本周可领取的免费游戏"""
+    promotions: List[PromotionGame] = []
+
+    # Get store promotion data and <this week free> games
+    for e in load_feed(data).elements:
+        if not is_discount_game(e):
+            continue
+
+        # -----------------------------------------------------------
+        # 🟢 智能 URL 识别逻辑
+        # -----------------------------------------------------------
+        base_url = (URL_PRODUCT_BUNDLES if is_bundle(e) else URL_PRODUCT_PAGE).rstrip("/")
+
+        if e.offerMappings and e.offerMappings[0].pageSlug:
+            slug = e.offerMappings[0].pageSlug
+        else:
+            slug = e.productSlug or e.urlSlug or "unknown"
+        promotions.append(
+            PromotionGame(
+                title=e.title,
+                id=e.id,
+                namespace=e.namespace,
+                description=e.description,
+                offerType=e.offerType,
+                url=f"{base_url}/{slug}",
+            )
+        )
+
+    if promotions:
+        logger.info(f"Weekly free games - {[p.url for p in promotions]}")
+    return promotions
+
+
+class PromotionsClient:
+    """
+    freeGamesPromotions 的条件请求客户端
+
+    - 快照未过期（Cache-Control max-age）时直接复用内存/磁盘中的解析结果，不发请求
+    - 过期后携带 If-None-Match / If-Modified-Since 复核，304 时沿用快照
+    - 网络异常时退回到最近一次快照
+    """
+
+    def __init__(
+        self,
+        url: str = URL_PROMOTIONS,
+        params: dict | None = None,
+        cache_dir: Path = RUNTIME_DIR,
+        name: str = "promotions",
+        http: httpx.AsyncClient | None = None,
+    ):
+        self.url = url
+        self._http = http
+        self.params = params or {"locale": "zh-CN"}
+        self.snapshot_path = cache_dir.joinpath(f"{name}.json")
+        self.meta_path = cache_dir.joinpath(f"{name}.meta.json")
+
+        self._meta: SnapshotMeta | None = None
+        self._data: PromotionsFeed | None = None
+        self._pending_write: asyncio.Future | None = None
+        self._promotions: List[PromotionGame] | None = None
+
+    def _load_meta(self) -> SnapshotMeta:
+        if self._meta is None:
+            self._meta = SnapshotMeta()
+            with suppress(Exception):
+                if self.snapshot_path.is_file():
+                    self._meta = SnapshotMeta.model_validate_json(self.meta_path.read_bytes())
+        return self._meta
+
+    def _load_snapshot(self) -> PromotionsFeed | None:
+        if self._data is None:
+            with suppress(Exception):
+                self._data = PromotionsFeed.model_validate_json(self.snapshot_path.read_bytes())
+        return self._data
+
+    def _save(self, raw: bytes, meta: SnapshotMeta):
+        try:
+            self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            self.snapshot_path.write_bytes(raw)
+            self.meta_path.write_text(meta.model_dump_json(), encoding="utf8")
+        except OSError as err:
+            logger.warning(f"Failed to save promotions snapshot - {err}")
+
+    def _save_meta(self, meta: SnapshotMeta):
+        with suppress(OSError):
+            self.meta_path.write_text(meta.model_dump_json(), encoding="utf8")
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        return self._http or get_http_client()
+
+    async def flush(self):
+        """等待后台的快照写入完成"""
+        if self._pending_write is not None:
+            await self._pending_write
+            self._pending_write = None
+
+    async def fetch_feed(self) -> PromotionsFeed | None:
+        """返回最新的 freeGamesPromotions 数据，尽可能避免网络请求和重复解析"""
+        meta = self._load_meta()
+        if meta.is_fresh and self._load_snapshot() is not None:
+            logger.debug(f"Promotions snapshot is still fresh - {self.snapshot_path.name}")
+            return self._data
+
+        headers = meta.conditional_headers() if self._load_snapshot() is not None else {}
+        try:
+            resp = await self.http.get(self.url, params=self.params, headers=headers)
+        except httpx.HTTPError as err:
+            logger.warning(f"Failed to request promotions, fallback to snapshot - {err}")
+            return self._load_snapshot()
+
+        if resp.status_code == 304 and self._data is not None:
+            self._meta = SnapshotMeta.from_response(resp)
+            self._meta.etag = self._meta.etag or meta.etag
+            self._meta.last_modified = self._meta.last_modified or meta.last_modified
+            self._save_meta(self._meta)
+            logger.debug("Promotions not modified (304), reuse snapshot")
+            return self._data
+
+        try:
+            # 直接从响应字节校验为类型化模型，不再经过中间的 dict
+            data = PromotionsFeed.model_validate_json(resp.content)
+        except ValidationError as err:
+            logger.error("Failed to get promotions", err=err)
+            return self._load_snapshot()
+
+        self._meta = SnapshotMeta.from_response(resp)
+        self._data = data
+        self._promotions = None
+        # 原始字节原样落盘（不重新序列化），写入放到后台线程，不阻塞事件循环
+        self._pending_write = asyncio.get_running_loop().run_in_executor(
+            None, self._save, resp.content, self._meta
+        )
+        return self._data
+
+    async def get_promotions(self) -> List[PromotionGame]:
+        feed = await self.fetch_feed()
+        if feed is None:
+            return []
+        if self._promotions is None:
+            self._promotions = parse_promotions(feed)
+        return self._promotions.copy()
+
+
+promotions_client = PromotionsClient()
+
+_region_clients: Dict[str, PromotionsClient] = {}
+
+
+def client_for_region(country: str | None) -> PromotionsClient:
+    """返回指定国家/地区的 feed 客户端，各地区的快照分开缓存；country 为空时使用默认 feed"""
+    if not country:
+        return promotions_client
+    country = country.upper()
+    if country not in _region_clients:
+        _region_clients[country] = PromotionsClient(
+            params={
+                **promotions_client.params,
+                "country": country,
+                "allowCountries": country,
+            },
+            cache_dir=promotions_client.snapshot_path.parent,
+            name=f"promotions-{country.lower()}",
+        )
+    return _region_clients[country]
+
+
+def merge_promotions(results: Iterable[Tuple[str, List[PromotionGame]]]) -> List[PromotionGame]:
+    """按 (namespace, offer id) 合并各地区的促销，regions 记录出现过的地区，保持首次出现的顺序"""
+    merged: Dict[Tuple[str, str], PromotionGame] = {}
+    regions: Dict[Tuple[str, str], List[str]] = {}
+    for country, promotions in results:
+        for p in promotions:
+            key = (p.namespace, p.id)
+            merged.setdefault(key, p)
+            if country not in regions.setdefault(key, []):
+                regions[key].append(country)
+    return [p.model_copy(update={"regions": regions[key]}) for key, p in merged.items()]
+
+
+async def discover_promotions(regions: Iterable[str] | None = None) -> List[PromotionGame]:
+    """
+    并发拉取多个地区的周免游戏并去重
+    Args:
+        regions: 国家/地区代码，为空时只拉取默认 feed（地区由出口 IP 决定，regions 留空）
+
+    Returns:
+
+    """
+    countries = list(dict.fromkeys(c.upper() for c in regions or [] if c))
+    if not countries:
+        return await promotions_client.get_promotions()
+
+    results = await asyncio.gather(
+        *(client_for_region(c).get_promotions() for c in countries), return_exceptions=True
+    )
+    fetched = []
+    for country, result in zip(countries, results):
+        if isinstance(result, BaseException):
+            logger.warning(f"Failed to discover promotions - {country=} err={result!r}")
+            continue
+        fetched.append((country, result))
+
+    promotions = merge_promotions(fetched)
+    logger.debug(
+        f"Discover promotions - regions={countries} "
+        f"fetched={sum(len(r) for _, r in fetched)} unique={len(promotions)}"
+    )
+    return promotions
+
+
+def promotions_for_account(
+    promotions: List[PromotionGame], account: Account
+) -> List[PromotionGame]:
+    """只保留账号所在地区可以领取的促销"""
+    return [p for p in promotions if p.is_available_in(account.country)]
+
+
+async def get_promotions(country: str | None = None) -> List[PromotionGame]:
+    """
+    获取周免游戏数据
+    Args:
+        country: 指定时只拉取该地区的 feed，否则按 PROMOTION_REGIONS 合并多个地区
+
+    Returns:
+
+    """
+    if country:
+        promotions = await client_for_region(country).get_promotions()
+        return [p.model_copy(update={"regions": [country.upper()]}) for p in promotions]
+    return await discover_promotions(settings.PROMOTION_REGIONS)
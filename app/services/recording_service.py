@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/7 21:40
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 录屏策略：关闭、仅失败时保留、抽样低分辨率录制，以及录屏目录的容量与时效上限
+"""
+import random
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Literal
+
+from loguru import logger
+from playwright.async_api import ViewportSize
+
+from settings import RECORD_DIR, settings
+
+RecordMode = Literal["always", "off", "on-failure", "sampled"]
+
+PENDING_DIR = RECORD_DIR.joinpath(".pending")
+
+
+def enforce_retention(
+    record_dir: Path = RECORD_DIR,
+    max_total_mb: int | None = None,
+    max_age_days: int | None = None,
+) -> int:
+    """先删除过期录屏，再从最旧的开始删除直到总大小低于上限，返回删除的文件数"""
+    max_total_mb = settings.RECORD_MAX_TOTAL_MB if max_total_mb is None else max_total_mb
+    max_age_days = settings.RECORD_MAX_AGE_DAYS if max_age_days is None else max_age_days
+
+    if not record_dir.is_dir():
+        return 0
+
+    videos = []
+    for path in record_dir.glob("*.webm"):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        videos.append((stat.st_mtime, stat.st_size, path))
+    videos.sort()
+
+    removed = 0
+    deadline = time.time() - max_age_days * 86400
+    total = sum(size for _, size, _ in videos)
+    limit = max_total_mb * 1024 * 1024
+
+    for mtime, size, path in videos:
+        if mtime >= deadline and total <= limit:
+            break
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+
+    if removed:
+        logger.debug(f"Recording retention removed {removed} video(s)")
+    return removed
+
+
+class RecordingSession:
+    """
+    一次运行（一个浏览器上下文）的录屏策略
+
+    Usage:
+        with RecordingSession() as recording:
+            async with AsyncCamoufox(**recording.context_options(), ...) as browser:
+                ...
+
+    退出时浏览器已关闭、视频已写完：on-failure 模式下只有抛出异常或运行期间出现 ERROR 日志
+    才会把视频移入 RECORD_DIR，否则直接丢弃。
+    """
+
+    def __init__(self, mode: RecordMode | None = None):
+        self.mode = mode or settings.RECORD_VIDEO_MODE
+        self.id = uuid.uuid4().hex[:12]
+        self.errors = 0
+
+        self.enabled = self.mode in ("always", "on-failure") or (
+            self.mode == "sampled" and random.random() < settings.RECORD_SAMPLE_RATE
+        )
+        self.video_dir = PENDING_DIR.joinpath(self.id) if self.mode == "on-failure" else RECORD_DIR
+
+        # 每次运行都要编码的模式使用低分辨率，只有 always 保留全分辨率
+        if self.mode in ("sampled", "on-failure"):
+            width = settings.RECORD_SAMPLED_WIDTH
+            self.video_size = ViewportSize(width=width, height=width * 9 // 16)
+        else:
+            self.video_size = ViewportSize(width=1920, height=1080)
+
+        self._sink_id: int | None = None
+        self._contextualize = None
+
+    def context_options(self) -> dict:
+        if not self.enabled:
+            return {}
+        return {"record_video_dir": self.video_dir, "record_video_size": self.video_size}
+
+    def mark_failed(self):
+        self.errors += 1
+
+    def _on_error(self, message):
+        self.errors += 1
+
+    def __enter__(self) -> "RecordingSession":
+        if self.enabled and self.mode == "on-failure":
+            self._sink_id = logger.add(
+                self._on_error,
+                level="ERROR",
+                filter=lambda r: r["extra"].get("recording_id") == self.id,
+            )
+            self._contextualize = logger.contextualize(recording_id=self.id)
+            self._contextualize.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._contextualize:
+            self._contextualize.__exit__(exc_type, exc_val, exc_tb)
+        if self._sink_id is not None:
+            logger.remove(self._sink_id)
+
+        if self.enabled:
+            self.finalize(failed=exc_type is not None or self.errors > 0)
+
+    def finalize(self, failed: bool):
+        if self.mode == "on-failure":
+            if failed and self.video_dir.is_dir():
+                RECORD_DIR.mkdir(parents=True, exist_ok=True)
+                for video in self.video_dir.glob("*.webm"):
+                    shutil.move(video, RECORD_DIR.joinpath(f"failed-{self.id}-{video.name}"))
+                logger.debug(f"Run failed, recording kept - {self.id}")
+            shutil.rmtree(self.video_dir, ignore_errors=True)
+
+        enforce_retention(RECORD_DIR)
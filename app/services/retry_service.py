@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/8 20:30
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 结账、清空购物车、登录共用的有界重试策略：次数上限、抖动退避、阶段耗时预算、错误分级
+"""
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Literal, Tuple, Type, TypeVar
+
+from loguru import logger
+from playwright.async_api import Error as PlaywrightError
+
+T = TypeVar("T")
+
+Outcome = Literal["ok", "retry", "fatal", "exhausted"]
+
+
+class RetryableError(Exception):
+    """业务层主动声明可以重试的失败，例如购物车里仍有付费游戏"""
+
+
+class FatalError(Exception):
+    """重试没有意义的失败，立即向上抛出"""
+
+
+class RetryExhausted(Exception):
+    def __init__(self, stage: str, attempts: int, last_error: BaseException | None):
+        super().__init__(f"{stage} failed after {attempts} attempt(s) - {last_error!r}")
+        self.stage = stage
+        self.attempts = attempts
+        self.last_error = last_error
+
+
+def is_fatal(err: BaseException) -> bool:
+    """页面、上下文或浏览器已经关闭时，重试只会重复失败"""
+    if isinstance(err, FatalError):
+        return True
+    return isinstance(err, PlaywrightError) and "has been closed" in str(err)
+
+
+@dataclass
+class AttemptRecord:
+    stage: str
+    attempt: int
+    elapsed: float
+    outcome: Outcome
+    error: str = ""
+
+
+class RetryPolicy:
+    """
+    Usage:
+        policy = RetryPolicy("checkout", max_attempts=3, budget=180)
+        await policy.run(self._purchase_attempt)
+
+    每次尝试的耗时与结果都会记录在 records 中，并以 debug 日志输出。
+    """
+
+    def __init__(
+        self,
+        stage: str,
+        *,
+        max_attempts: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 10.0,
+        budget: float | None = None,
+        retry_on: Tuple[Type[BaseException], ...] = (Exception,),
+    ):
+        self.stage = stage
+        self.max_attempts = max(max_attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.retry_on = retry_on
+        self.records: List[AttemptRecord] = []
+
+    def backoff(self, attempt: int) -> float:
+        """full jitter：在 [0, min(max_delay, base_delay * 2^(attempt-1))] 之间随机"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def _record(self, attempt: int, elapsed: float, outcome: Outcome, err: BaseException | None):
+        error = repr(err) if err else ""
+        record = AttemptRecord(self.stage, attempt, round(elapsed, 3), outcome, error)
+        self.records.append(record)
+        logger.debug(
+            f"Retry policy attempt - stage={self.stage} attempt={attempt}/{self.max_attempts} "
+            f"outcome={outcome} elapsed={record.elapsed}s"
+            + (f" error={record.error}" if err else "")
+        )
+
+    async def run(self, func: Callable[..., Awaitable[T]], *args, **kwargs) -> T:
+        started = time.perf_counter()
+        last_error: BaseException | None = None
+
+        for attempt in range(1, self.max_attempts + 1):
+            attempt_started = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as err:
+                elapsed = time.perf_counter() - attempt_started
+                last_error = err
+
+                if is_fatal(err) or not isinstance(err, self.retry_on):
+                    self._record(attempt, elapsed, "fatal", err)
+                    raise
+
+                if attempt == self.max_attempts:
+                    self._record(attempt, elapsed, "exhausted", err)
+                    break
+
+                delay = self.backoff(attempt)
+                spent = time.perf_counter() - started
+                if self.budget is not None and spent + delay >= self.budget:
+                    self._record(attempt, elapsed, "exhausted", err)
+                    logger.warning(f"Retry budget used up - stage={self.stage} spent={spent:.1f}s")
+                    break
+
+                self._record(attempt, elapsed, "retry", err)
+                await asyncio.sleep(delay)
+            else:
+                self._record(attempt, time.perf_counter() - attempt_started, "ok", None)
+                return result
+
+        raise RetryExhausted(self.stage, attempt, last_error) from last_error
+
+    @property
+    def total_elapsed(self) -> float:
+        return sum(r.elapsed for r in self.records)
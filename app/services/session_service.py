@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/11 09:30
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 轻量的会话探测：本地检查 Cookie 有效期 + 请求一个需要登录的小 JSON 接口
+
+原先登录与领取各自加载一次 free-games 页面并读取 egs-navigation[isloggedin]，
+这里把结果按浏览器上下文缓存（一次运行只探测一次），并把“会话在 T 之前可用”
+写入账号的 user_data 目录，下次运行在有效期内连接口都不用请求。
+"""
+import json
+import time
+import weakref
+from pathlib import Path
+from typing import List
+
+from loguru import logger
+from playwright.async_api import BrowserContext, Page
+
+from services.tracing_service import traced
+from settings import settings
+
+URL_CLAIM = "https://store.epicgames.com/en-US/free-games"
+URL_SESSION_PROBE = "https://www.epicgames.com/account/v2/personal/ajaxGet"
+
+SESSION_COOKIE_URLS = ["https://www.epicgames.com", "https://store.epicgames.com"]
+AUTH_COOKIES = ("EPIC_SSO", "EPIC_SSO_RM", "EPIC_BEARER_TOKEN", "EPIC_EG1")
+
+SESSION_CACHE_NAME = "session.json"
+
+
+def auth_cookie_expiry(cookies: List[dict], now: float | None = None) -> float | None:
+    """
+    返回登录 Cookie 中最晚的过期时间
+    Returns:
+        没有可用的登录 Cookie 时返回 None；仅有会话 Cookie（expires=-1）时返回 inf
+
+    """
+    now = now or time.time()
+    expiry = None
+    for cookie in cookies:
+        if cookie.get("name") not in AUTH_COOKIES:
+            continue
+        expires = cookie.get("expires", -1)
+        expires = float("inf") if expires is None or expires < 0 else expires
+        if expires > now:
+            expiry = max(expiry or 0, expires)
+    return expiry
+
+
+class SessionProbe:
+    """
+    同一个浏览器上下文共享一个 SessionProbe，探测结果在本次运行内复用
+
+    Usage:
+        session = SessionProbe.for_context(page.context, account_data_dir(email))
+        if await session.verify(page):
+            ...
+    """
+
+    _probes: "weakref.WeakKeyDictionary[BrowserContext, SessionProbe]" = (
+        weakref.WeakKeyDictionary()
+    )
+
+    def __init__(self, context: BrowserContext, cache_dir: Path):
+        self.context = context
+        self.cache_path = cache_dir.joinpath(SESSION_CACHE_NAME)
+        self._valid: bool | None = None
+
+    @classmethod
+    def for_context(cls, context: BrowserContext, cache_dir: Path) -> "SessionProbe":
+        if context not in cls._probes:
+            cls._probes[context] = cls(context, cache_dir)
+        return cls._probes[context]
+
+    def _cached_until(self) -> float:
+        try:
+            return float(json.loads(self.cache_path.read_text(encoding="utf8"))["valid_until"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return 0
+
+    def _save(self, valid_until: float):
+        payload = {"valid_until": valid_until, "checked_at": time.time()}
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            self.cache_path.write_text(json.dumps(payload), encoding="utf8")
+        except OSError as err:
+            logger.warning(f"Failed to save session cache - {err}")
+
+    async def _request_probe(self) -> bool | None:
+        try:
+            resp = await self.context.request.get(URL_SESSION_PROBE, max_redirects=0)
+        except Exception as err:
+            logger.debug(f"Session probe request failed - {err}")
+            return None
+        if resp.status in (401, 403) or 300 <= resp.status < 400:
+            return False
+        if resp.ok and "json" in resp.headers.get("content-type", ""):
+            return True
+        return None
+
+    @traced("session.probe")
+    async def check(self) -> bool | None:
+        """
+        Returns:
+            True 会话可用，False 需要登录，None 无法判断（接口异常），调用方应退回到页面检查
+
+        """
+        if self._valid is not None:
+            return self._valid
+
+        cookies = await self.context.cookies(SESSION_COOKIE_URLS)
+        expiry = auth_cookie_expiry(cookies)
+        # 登录 Cookie 不存在（登出后 Epic 会删除 EPIC_* 但保留其他 Cookie）或已全部过期
+        if expiry is None:
+            logger.debug("Session probe - no valid auth cookies")
+            self._valid = False
+            return False
+
+        now = time.time()
+        if self._cached_until() > now:
+            logger.debug("Session probe - cached session is still valid")
+            self._valid = True
+            return True
+
+        result = await self._request_probe()
+        if result is True:
+            self.mark_valid(expiry)
+        elif result is False:
+            self.invalidate()
+        logger.debug(f"Session probe - {result=}")
+        return result
+
+    async def verify(self, page: Page) -> bool:
+        """探测无法判断时才加载 free-games 页面读取登录状态"""
+        if (result := await self.check()) is not None:
+            return result
+
+        await page.goto(URL_CLAIM, wait_until="domcontentloaded")
+        status = await page.locator("//egs-navigation").get_attribute("isloggedin")
+        if status == "true":
+            self.mark_valid()
+            return True
+        self.invalidate()
+        return False
+
+    def mark_valid(self, expiry: float | None = None):
+        """登录成功或探测通过后调用，有效期取 TTL 与 Cookie 过期时间中较早的一个"""
+        self._valid = True
+        valid_until = time.time() + settings.SESSION_CACHE_TTL
+        if expiry is not None:
+            valid_until = min(valid_until, expiry)
+        self._save(valid_until)
+
+    def invalidate(self):
+        self._valid = False
+        self.cache_path.unlink(missing_ok=True)
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/9 10:20
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 人机挑战求解器的复用：每个页面只创建并预热一次 AgentV，整个运行期间反复使用
+
+AgentV 在构造时会解析技能规则、创建多个推理器，并在 page 上注册 response 监听（不会注销）。
+每次挑战都重新构造不仅多出启动延迟，同一页面上还会堆积多个监听器争抢挑战数据。
+"""
+import asyncio
+import time
+import weakref
+from contextlib import suppress
+from typing import TYPE_CHECKING, Dict
+
+from loguru import logger
+from playwright.async_api import BrowserContext, Page
+
+from services.metrics_service import record_captcha
+from services.tracing_service import span
+from settings import agent_config, settings
+
+if TYPE_CHECKING:
+    from hcaptcha_challenger.agent import AgentV
+    from hcaptcha_challenger.models import ChallengeSignal
+
+_REASONER_ATTRS = (
+    "_challenge_router",
+    "_image_classifier",
+    "_spatial_path_reasoner",
+    "_spatial_point_reasoner",
+)
+
+
+def _drain(queue: asyncio.Queue):
+    while not queue.empty():
+        with suppress(asyncio.QueueEmpty):
+            queue.get_nowait()
+
+
+class SolverManager:
+    """
+    同一个浏览器上下文共享一个 SolverManager，按页面缓存 AgentV
+
+    Usage:
+        solver = SolverManager.for_context(page.context)
+        solver.reset(page)          # 触发挑战的点击之前
+        await page.click(...)
+        await solver.solve(page)
+    """
+
+    _managers: "weakref.WeakKeyDictionary[BrowserContext, SolverManager]" = (
+        weakref.WeakKeyDictionary()
+    )
+
+    def __init__(self, agent_config=None):
+        self._agent_config = agent_config
+        self._agents: Dict[Page, "AgentV"] = {}
+        self._pending_answers: Dict[Page, list] = {}
+        self._warmed_up = False
+
+    @classmethod
+    def for_context(cls, context: BrowserContext) -> "SolverManager":
+        if context not in cls._managers:
+            cls._managers[context] = cls()
+        return cls._managers[context]
+
+    @property
+    def agent_config(self):
+        if self._agent_config is None:
+            self._agent_config = agent_config()
+        return self._agent_config
+
+    def _warm_up_dirs(self):
+        if self._warmed_up:
+            return
+        for attr in ("cache_dir", "challenge_dir", "captcha_response_dir"):
+            if path := getattr(self.agent_config, attr, None):
+                path.mkdir(parents=True, exist_ok=True)
+        self._warmed_up = True
+
+    @staticmethod
+    def _warm_up_agent(agent: "AgentV"):
+        """提前创建各推理器的模型客户端，避免在第一次挑战时才初始化"""
+        arm = agent.robotic_arm
+        for attr in _REASONER_ATTRS:
+            provider = getattr(getattr(arm, attr, None), "_provider", None)
+            with suppress(Exception):
+                getattr(provider, "client", None)
+
+    def get(self, page: Page) -> "AgentV":
+        """返回页面对应的 AgentV，首次调用时创建并预热；尽量在触发挑战之前调用以便监听器就位"""
+        if agent := self._agents.get(page):
+            return agent
+
+        # 重量级依赖在第一次需要求解器时才加载，补丁必须先于 genai.Client 的创建
+        from extensions.ext_aihubmix import install_aihubmix_patch
+        from hcaptcha_challenger.agent import AgentV
+        from services.answer_cache_service import install_answer_cache
+
+        install_aihubmix_patch()
+        self._warm_up_dirs()
+        agent = AgentV(page=page, agent_config=self.agent_config)
+        self._warm_up_agent(agent)
+        if settings.ENABLE_ANSWER_CACHE:
+            self._pending_answers[page] = install_answer_cache(agent)
+        self._agents[page] = agent
+        page.once("close", lambda *_: self._forget(page))
+        logger.debug(f"Captcha solver ready - pages={len(self._agents)}")
+        return agent
+
+    def _forget(self, page: Page):
+        self._agents.pop(page, None)
+        self._pending_answers.pop(page, None)
+
+    def reset(self, page: Page):
+        """丢弃上一次挑战残留的载荷与结果，在触发新挑战的操作之前调用"""
+        if agent := self._agents.get(page):
+            _drain(agent._captcha_payload_queue)
+            _drain(agent._captcha_response_queue)
+
+    async def solve(self, page: Page) -> "ChallengeSignal":
+        from hcaptcha_challenger.models import ChallengeSignal
+        from services.answer_cache_service import settle_answers
+
+        agent = self.get(page)
+        signal = None
+        start = time.perf_counter()
+        try:
+            with span("captcha.challenge") as s:
+                signal = await agent.wait_for_challenge()
+                s.set(**{"captcha.signal": str(signal)})
+            return signal
+        finally:
+            record_captcha(str(signal) if signal else "ERROR", time.perf_counter() - start)
+            if (pending := self._pending_answers.get(page)) is not None:
+                settle_answers(pending, signal == ChallengeSignal.SUCCESS, agent)
+            # 本次挑战结束后残留的数据不能被下一次挑战消费
+            self.reset(page)
@@ -0,0 +1,389 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/12 10:10
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 分阶段耗时追踪：基于 contextvars 的轻量 span，导出到本地 JSONL 或 OTLP/HTTP
+
+覆盖浏览器启动、登录、每次 page.goto、按钮识别、每次人机挑战（模型与 token 用量）、结账与订单同步，
+用来判断一次运行的 p95 耗时落在 Epic 页面、LLM 中转还是我们自己的等待上。
+
+Usage:
+    with trace_attributes(account=email), span("run"):
+        ...
+
+    @traced("checkout")
+    async def _purchase_free_game(self): ...
+
+    PYTHONPATH=app python -m services.tracing_service volumes/logs/traces.jsonl
+"""
+import atexit
+import functools
+import inspect
+import json
+import os
+import queue
+import statistics
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List
+
+import httpx
+from loguru import logger
+
+from settings import LOG_DIR, settings
+
+_current_span: ContextVar["Span | None"] = ContextVar("current_span", default=None)
+_trace_attributes: ContextVar[Dict[str, Any]] = ContextVar("trace_attributes", default={})
+
+
+def _new_id(n_bytes: int) -> str:
+    return os.urandom(n_bytes).hex()
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "status",
+        "error",
+    )
+
+    def __init__(self, name: str, parent: "Span | None", attributes: Dict[str, Any]):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else _new_id(16)
+        self.span_id = _new_id(8)
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.status = "OK"
+        self.error = ""
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def incr(self, key: str, value: float = 1):
+        self.attributes[key] = self.attributes.get(key, 0) + value
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class JsonlSpanExporter:
+    """每个结束的 span 写一行 JSON，多个账号并发时由锁保证整行写入"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = self.path.open("a", encoding="utf8", buffering=1)
+            self._file.write(line + "\n")
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+
+class OtlpSpanExporter:
+    """
+    OTLP/HTTP（JSON 编码）导出，不依赖 opentelemetry SDK
+
+    span 先缓存在内存中，攒满一批或运行结束 flush 时交给后台线程发送，事件循环不等待 collector；
+    进程退出前由 shutdown（或 atexit）等待队列中的批次发送完毕
+    """
+
+    def __init__(
+        self, endpoint: str, service_name: str = "epic-awesome-gamer", batch_size: int = 256
+    ):
+        self.url = f"{endpoint.rstrip('/')}/v1/traces"
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self._buffer: List[Span] = []
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue()
+        self._worker: threading.Thread | None = None
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._send_loop, name="otlp-exporter", daemon=True
+                )
+                self._worker.start()
+                atexit.register(self.shutdown)
+
+    def _send_loop(self):
+        while True:
+            batch = self._queue.get()
+            if isinstance(batch, threading.Event):
+                batch.set()
+                continue
+            try:
+                httpx.post(self.url, json=self.encode(batch), timeout=5).raise_for_status()
+            except httpx.HTTPError as err:
+                logger.warning(f"Failed to export spans - count={len(batch)} err={err}")
+
+    def export(self, span: Span):
+        with self._lock:
+            self._buffer.append(span)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self.flush()
+
+    def encode(self, spans: List[Span]) -> dict:
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {"key": "service.name", "value": _otlp_value(self.service_name)}
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": __name__},
+                            "spans": [
+                                {
+                                    "traceId": s.trace_id,
+                                    "spanId": s.span_id,
+                                    "parentSpanId": s.parent.span_id if s.parent else "",
+                                    "name": s.name,
+                                    "kind": 1,
+                                    "startTimeUnixNano": str(s.start_ns),
+                                    "endTimeUnixNano": str(s.end_ns),
+                                    "attributes": [
+                                        {"key": k, "value": _otlp_value(v)}
+                                        for k, v in s.attributes.items()
+                                    ],
+                                    "status": (
+                                        {"code": 2, "message": s.error}
+                                        if s.status == "ERROR"
+                                        else {"code": 1}
+                                    ),
+                                }
+                                for s in spans
+                            ],
+                        }
+                    ],
+                }
+            ]
+        }
+
+    def flush(self):
+        """把缓存的 span 交给后台线程发送，立即返回"""
+        with self._lock:
+            spans, self._buffer = self._buffer, []
+        if spans:
+            self._ensure_worker()
+            self._queue.put(spans)
+
+    def shutdown(self, timeout: float = 5) -> bool:
+        """发送剩余的 span 并等待已入队的批次完成，返回是否在超时前发送完毕"""
+        self.flush()
+        if self._worker is None:
+            return True
+        drained = threading.Event()
+        self._queue.put(drained)
+        return drained.wait(timeout)
+
+
+def create_exporter(kind: str = settings.TRACE_EXPORTER):
+    if kind == "jsonl":
+        return JsonlSpanExporter(Path(settings.TRACE_FILE or LOG_DIR.joinpath("traces.jsonl")))
+    if kind == "otlp":
+        return OtlpSpanExporter(settings.OTLP_ENDPOINT)
+    return None
+
+
+class Tracer:
+    def __init__(self, exporter=None):
+        self.exporter = exporter
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        parent = _current_span.get()
+        s = Span(name, parent, {**_trace_attributes.get(), **attributes})
+        token = _current_span.set(s)
+        try:
+            yield s
+        except BaseException as err:
+            s.status = "ERROR"
+            s.error = repr(err)
+            raise
+        finally:
+            s.end_ns = time.time_ns()
+            _current_span.reset(token)
+            if self.exporter is not None:
+                self.exporter.export(s)
+
+    @contextmanager
+    def attributes(self, **attributes):
+        """在此范围内新建的 span 都带上这些属性（账号、促销等）"""
+        token = _trace_attributes.set({**_trace_attributes.get(), **attributes})
+        try:
+            yield
+        finally:
+            _trace_attributes.reset(token)
+
+    def traced(self, name: str | None = None, **attributes) -> Callable:
+        def decorator(func):
+            span_name = name or func.__qualname__
+
+            if inspect.iscoroutinefunction(func):
+
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(span_name, **attributes):
+                        return await func(*args, **kwargs)
+
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name, **attributes):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def flush(self):
+        if self.exporter is not None:
+            self.exporter.flush()
+
+    def shutdown(self, timeout: float = 5):
+        """在事件循环之外调用：等待导出器把剩余的 span 发送完毕"""
+        if self.exporter is not None and hasattr(self.exporter, "shutdown"):
+            self.exporter.shutdown(timeout)
+
+
+tracer = Tracer(create_exporter())
+
+span = tracer.span
+traced = tracer.traced
+trace_attributes = tracer.attributes
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+def record_llm_usage(s: Span, model: str, response: Any):
+    """记录一次模型调用的 token 用量，并累加到所有上层 span（例如 captcha.challenge）"""
+    usage = getattr(response, "usage_metadata", None)
+    tokens = {
+        "llm.prompt_tokens": getattr(usage, "prompt_token_count", None) or 0,
+        "llm.completion_tokens": getattr(usage, "candidates_token_count", None) or 0,
+        "llm.total_tokens": getattr(usage, "total_token_count", None) or 0,
+    }
+    s.set(**{"llm.model": model}, **tokens)
+
+    parent = s.parent
+    while parent is not None:
+        for key, value in tokens.items():
+            parent.incr(key, value)
+        parent.incr("llm.calls")
+        models = parent.attributes.setdefault("llm.models", [])
+        if model not in models:
+            models.append(model)
+        parent = parent.parent
+
+
+def instrument_page(page):
+    """给页面的 goto 套上 page.goto span，未启用追踪时不做任何改动"""
+    if not tracer.enabled or getattr(page, "_traced_goto", False):
+        return
+    goto = page.goto
+
+    async def traced_goto(url: str, **kwargs):
+        with span("page.goto", **{"http.url": url}) as s:
+            response = await goto(url, **kwargs)
+            if response is not None:
+                s.set(**{"http.status_code": response.status})
+            return response
+
+    page.goto = traced_goto
+    page._traced_goto = True
+
+
+def instrument_context(context):
+    if not tracer.enabled:
+        return
+    for page in context.pages:
+        instrument_page(page)
+    context.on("page", instrument_page)
+
+
+def summarize_spans(records: Iterable[dict]) -> Dict[str, dict]:
+    """按 span 名称统计次数、p50、p95 与累计耗时（毫秒）"""
+    durations: Dict[str, List[float]] = {}
+    for r in records:
+        durations.setdefault(r["name"], []).append(r["duration_ms"])
+
+    summary = {}
+    for name, values in durations.items():
+        values.sort()
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+        summary[name] = {
+            "count": len(values),
+            "p50": round(statistics.median(values), 1),
+            "p95": round(p95, 1),
+            "total": round(sum(values), 1),
+        }
+    return dict(sorted(summary.items(), key=lambda kv: kv[1]["total"], reverse=True))
+
+
+if __name__ == "__main__":
+    _path = Path(sys.argv[1] if len(sys.argv) > 1 else LOG_DIR.joinpath("traces.jsonl"))
+    with _path.open(encoding="utf8") as f:
+        _summary = summarize_spans(json.loads(line) for line in f if line.strip())
+    print(f"{'span':<28}{'count':>8}{'p50':>12}{'p95':>12}{'total':>14}")
+    for _name, _s in _summary.items():
+        print(f"{_name:<28}{_s['count']:>8}{_s['p50']:>12}{_s['p95']:>12}{_s['total']:>14}")
@@ -1,14 +1,13 @@
 # -*- coding: utf-8 -*-
 import os
-import sys
-import asyncio
+from functools import cache
 from pathlib import Path
+from typing import Any, Dict, List, Literal
 
 # === 引入所需库 ===
-from hcaptcha_challenger.agent import AgentConfig
+# hcaptcha_challenger 与 google.genai 导入很重，只在第一次创建求解器时加载（见 agent_config）
 from pydantic import Field, SecretStr
-from pydantic_settings import SettingsConfigDict
-from loguru import logger
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 # --- 核心路径定义 ---
 PROJECT_ROOT = Path(__file__).parent
@@ -21,7 +20,7 @@ RECORD_DIR = VOLUMES_DIR.joinpath("record")
 HCAPTCHA_DIR = VOLUMES_DIR.joinpath("hcaptcha")
 
 # === 配置类定义 ===
-class EpicSettings(AgentConfig):
+class EpicSettings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", env_ignore_empty=True, extra="ignore")
 
     # [基础配置] AiHubMix 必须使用 SecretStr 类型
@@ -42,13 +41,135 @@ class EpicSettings(AgentConfig):
 
     EPIC_EMAIL: str = Field(default_factory=lambda: os.getenv("EPIC_EMAIL"))
     EPIC_PASSWORD: SecretStr = Field(default_factory=lambda: os.getenv("EPIC_PASSWORD"))
+    EPIC_COUNTRY: str | None = Field(
+        default=None, description="EPIC_EMAIL 账号所在的国家/地区代码（如 US、CN），用于筛选可领取的促销"
+    )
+    EPIC_ACCOUNTS_FILE: str | None = Field(
+        default=None,
+        description='多账号配置文件，JSON 数组：[{"email": "...", "password": "...", "country": "US"}]，与 EPIC_EMAIL 合并',
+    )
+    MAX_CONCURRENT_ACCOUNTS: int = Field(
+        default=3, description="多账号模式下同时运行的账号数，受容器内存限制"
+    )
+    MAX_BROWSER_PROCESSES: int = Field(
+        default=1, description="多账号模式下共享的 Camoufox 进程数，账号之间使用独立上下文隔离"
+    )
     DISABLE_BEZIER_TRAJECTORY: bool = Field(default=True)
+    GEMINI_FALLBACK_BASE_URLS: List[str] = Field(
+        default_factory=list, description="备用中转地址，与 GEMINI_BASE_URL 一起参与模型路由"
+    )
+    ENABLE_MODEL_ROUTER: bool = Field(
+        default=True, description="人机挑战的模型请求按滚动延迟对冲、切换中转并自动降级"
+    )
+    MODEL_FALLBACKS: Dict[str, List[str]] = Field(
+        default_factory=lambda: {"gemini-2.5-pro": ["gemini-2.5-flash"]},
+        description="每个模型的降级候选，请求的模型变慢或出错时依次尝试",
+    )
+    MODEL_HEDGE_QUANTILE: float = Field(
+        default=0.9, description="请求超过该路由此分位数的延迟仍未返回时发出对冲请求"
+    )
+    MODEL_HEDGE_MIN_DELAY: float = Field(default=3, description="对冲请求的最短等待（秒）")
+    MODEL_HEDGE_DEFAULT_DELAY: float = Field(
+        default=10, description="路由样本不足时对冲请求的等待（秒）"
+    )
+    MODEL_SLOW_THRESHOLD: float = Field(
+        default=15, description="路由 p90 延迟超过该值（秒）时降级，优先使用其他中转或降级模型"
+    )
+    MODEL_STATS_WINDOW: int = Field(default=50, description="每个路由保留的最近请求数")
+    MODEL_STATS_TTL: int = Field(default=600, description="延迟统计的有效期（秒），过期后重新评估")
+    ignore_request_questions: List[str] = Field(
+        default_factory=lambda: ["Please drag the crossing to complete the lines"]
+    )
+    ENABLE_ANSWER_CACHE: bool = Field(
+        default=True,
+        description="按题目与图块/画布的感知哈希复用已通过的模型答案，命中时不再请求模型",
+    )
+    BYPASS_CACHE_MAX_ITEMS: int = Field(
+        default=64, description="Base64 上传绕过缓存的最大图片数，超出后淘汰最久未使用的图片"
+    )
+    BYPASS_CACHE_MAX_MB: int = Field(default=64, description="Base64 上传绕过缓存的内存上限（MB）")
 
     cache_dir: Path = HCAPTCHA_DIR.joinpath(".cache")
     challenge_dir: Path = HCAPTCHA_DIR.joinpath(".challenge")
     captcha_response_dir: Path = HCAPTCHA_DIR.joinpath(".captcha")
 
+    PROMOTION_REGIONS: List[str] = Field(
+        default_factory=list,
+        description="并发拉取的促销地区（国家代码），合并去重后按账号地区分发；为空时只拉取默认 feed",
+    )
+    PROMOTION_CONCURRENCY: int = Field(
+        default=1, description="同时处理的促销页面数，大于 1 时每个促销使用独立页面并发领取"
+    )
+
+    NETWORK_BLOCK_PROFILE: Literal["off", "lite", "strict"] = Field(
+        default="off",
+        description="请求拦截策略：lite 拦截视频、字体与第三方统计，strict 额外拦截图片（人机挑战与付款 iframe 除外）；"
+        "启用后 Playwright 会关闭该上下文的 HTTP 缓存，持久化 Profile 的缓存资源会重新下载",
+    )
+
+    RECORD_VIDEO_MODE: Literal["always", "off", "on-failure", "sampled"] = Field(
+        default="on-failure",
+        description="录屏策略：on-failure 低分辨率录制、仅在运行出错时保留，sampled 按比例抽样低分辨率录制",
+    )
+    RECORD_SAMPLE_RATE: float = Field(default=0.1, description="sampled 模式下录屏的运行比例")
+    RECORD_SAMPLED_WIDTH: int = Field(
+        default=960, description="sampled 与 on-failure 模式的录屏宽度（16:9），always 为 1920"
+    )
+    RECORD_MAX_TOTAL_MB: int = Field(default=2048, description="录屏目录的容量上限（MB）")
+    RECORD_MAX_AGE_DAYS: int = Field(default=7, description="录屏的保留天数")
+
+    BROWSER_CONTEXT_MODE: Literal["persistent", "storage_state"] = Field(
+        default="persistent",
+        description="persistent 加载完整的 Firefox Profile；storage_state 只从 Epic 域名的 Cookie/localStorage 快照启动临时上下文",
+    )
+    PRUNE_PROFILE_CACHE: bool = Field(
+        default=False,
+        description="启动前清理持久化 Profile 中的 HTTP 缓存、启动缓存与遥测目录，登录态不受影响",
+    )
+    SESSION_CACHE_TTL: int = Field(
+        default=6 * 3600,
+        description="会话探测通过后的缓存时长（秒），期间不再请求探测接口，不会超过登录 Cookie 的有效期",
+    )
+
+    TRACE_EXPORTER: Literal["off", "jsonl", "otlp"] = Field(
+        default="off",
+        description="分阶段耗时追踪的导出方式：jsonl 写入本地文件，otlp 通过 OTLP/HTTP 发送到 collector",
+    )
+    TRACE_FILE: str | None = Field(
+        default=None, description="jsonl 导出的文件路径，缺省为 volumes/logs/traces.jsonl"
+    )
+    OTLP_ENDPOINT: str = Field(
+        default="http://localhost:4318", description="OTLP/HTTP collector 地址（不含 /v1/traces）"
+    )
+
+    METRICS_PORT: int | None = Field(
+        default=None,
+        description="Prometheus /metrics 端口，缺省不启动；需要安装可选依赖 prometheus-client",
+    )
+    METRICS_ADDR: str = Field(default="0.0.0.0", description="Prometheus /metrics 监听地址")
+
+    LOG_LEVEL: str = Field(default="DEBUG", description="标准输出的日志级别")
+    LOG_RUNTIME_LEVEL: str = Field(default="TRACE", description="runtime.log 的日志级别")
+    LOG_ERROR_LEVEL: str = Field(default="ERROR", description="error.log 的日志级别")
+    LOG_SERIALIZE_LEVEL: str = Field(
+        default="INFO", description="serialize.log（每行一条 JSON）的日志级别"
+    )
+    LOG_ENQUEUE: bool = Field(
+        default=True, description="日志经由后台线程写入，避免文件 I/O 阻塞事件循环"
+    )
+    LOG_ROTATION: str | None = Field(default="5 MB", description="日志文件的切割策略")
+    LOG_RETENTION: str | None = Field(default=None, description="切割后旧日志的保留策略")
+    LOG_COMPRESSION: str | None = Field(default=None, description="切割后旧日志的压缩格式，如 gz")
+    LOG_SINK_OPTIONS: Dict[str, Dict[str, Any]] = Field(
+        default_factory=dict,
+        description='按 sink 覆盖上述选项，如 {"serialize": {"rotation": "1 day", "compression": "gz"}}',
+    )
+
     ENABLE_APSCHEDULER: bool = Field(default=True)
+    ENABLE_PREFLIGHT: bool = Field(
+        default=True,
+        description="启动浏览器前先根据促销窗口和本地台账判断是否有可领取的游戏",
+    )
     TASK_TIMEOUT_SECONDS: int = Field(default=900)
     REDIS_URL: str = Field(default="redis://redis:6379/0")
     CELERY_WORKER_CONCURRENCY: int = Field(default=1)
@@ -62,85 +183,25 @@ class EpicSettings(AgentConfig):
         return target_
 
 settings = EpicSettings()
-settings.ignore_request_questions = ["Please drag the crossing to complete the lines"]
-
-# ==========================================
-# [方案一修复版] AiHubMix 终极补丁
-# ==========================================
-def _apply_aihubmix_patch():
-    if not settings.GEMINI_API_KEY:
-        return
-
-    try:
-        from google import genai
-        from google.genai import types
-        
-        # 1. 劫持 Client 初始化 (自动修正中转路径)
-        orig_init = genai.Client.__init__
-        def new_init(self, *args, **kwargs):
-            if hasattr(settings.GEMINI_API_KEY, 'get_secret_value'):
-                api_key = settings.GEMINI_API_KEY.get_secret_value()
-            else:
-                api_key = str(settings.GEMINI_API_KEY)
-            
-            kwargs['api_key'] = api_key
-            
-            base_url = settings.GEMINI_BASE_URL.rstrip('/')
-            if base_url.endswith('/v1'): base_url = base_url[:-3]
-            if not base_url.endswith('/gemini'): base_url = f"{base_url}/gemini"
-            
-            kwargs['http_options'] = types.HttpOptions(base_url=base_url)
-            logger.info(f"🚀 AiHubMix 补丁已应用 | 模型: {settings.GEMINI_MODEL} | 地址: {base_url}")
-            orig_init(self, *args, **kwargs)
-        
-        genai.Client.__init__ = new_init
-
-        # 2. 劫持文件上传 (绕过 400/403 错误，并修复 TypeError)
-        try:
-            file_cache = {}
-
-            # 自定义 helper，避免依赖 google 内部库
-            def _local_to_list(c):
-                return c if isinstance(c, list) else [c]
-
-            async def patched_upload(self_files, file, **kwargs):
-                if hasattr(file, 'read'): content = file.read()
-                elif isinstance(file, (str, Path)):
-                    with open(file, 'rb') as f: content = f.read()
-                else: content = bytes(file)
-                
-                if asyncio.iscoroutine(content): content = await content
-                
-                # 伪造文件上传，实际只存内存
-                file_id = f"bypass_{id(content)}"
-                file_cache[file_id] = content
-                return types.File(name=file_id, uri=file_id, mime_type="image/png")
-
-            orig_generate = genai.models.AsyncModels.generate_content
-            async def patched_generate(self_models, model, contents, **kwargs):
-                normalized = _local_to_list(contents)
-                
-                for content in normalized:
-                    if hasattr(content, 'parts'):
-                        for i, part in enumerate(content.parts):
-                            # 如果发现是我们伪造的文件 ID，立马替换成 Base64
-                            if part.file_data and part.file_data.file_uri in file_cache:
-                                data = file_cache[part.file_data.file_uri]
-                                content.parts[i] = types.Part.from_bytes(data=data, mime_type="image/png")
-                
-                # [核心修复点] 强制使用关键字参数 model= 和 contents=
-                # 这解决了 "takes 1 positional argument but 3 were given" 的报错
-                return await orig_generate(self_models, model=model, contents=normalized, **kwargs)
-
-            genai.files.AsyncFiles.upload = patched_upload
-            genai.models.AsyncModels.generate_content = patched_generate
-            logger.info("🚀 Base64 文件绕过补丁加载成功 (参数兼容版)")
-            
-        except Exception as ie:
-            logger.warning(f"⚠️ 文件绕过补丁依然失败: {ie}")
-
-    except Exception as e:
-        logger.error(f"❌ 严重：AiHubMix 补丁加载完全失败! 原因: {e}")
-
-# 执行补丁
-_apply_aihubmix_patch()
+
+# EpicSettings 中与 AgentConfig 同名的字段，其余求解器配置由 AgentConfig 自行从环境变量读取
+AGENT_CONFIG_FIELDS = (
+    "GEMINI_API_KEY",
+    "DISABLE_BEZIER_TRAJECTORY",
+    "cache_dir",
+    "challenge_dir",
+    "captcha_response_dir",
+    "ignore_request_questions",
+)
+
+
+@cache
+def agent_config():
+    """首次调用时才导入 hcaptcha_challenger 并构造 AgentConfig，整个进程共用一份"""
+    from hcaptcha_challenger.agent import AgentConfig
+
+    overrides = {name: getattr(settings, name) for name in AGENT_CONFIG_FIELDS}
+    # AgentConfig 的校验器作用在原始字符串上
+    if isinstance(api_key := overrides["GEMINI_API_KEY"], SecretStr):
+        overrides["GEMINI_API_KEY"] = api_key.get_secret_value()
+    return AgentConfig(**overrides)
@@ -1,24 +1,77 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
-import os
+
+import json
 import sys
 from zoneinfo import ZoneInfo
+
 from loguru import logger
 
+from settings import settings
+
+TIMEZONE = ZoneInfo("Asia/Shanghai")
+
+
 def timezone_filter(record):
-    record["time"] = record["time"].astimezone(ZoneInfo("Asia/Shanghai"))
+    # 作为 patcher 使用：每条日志只转换一次时区，而不是每个 sink 各转换一次
+    record["time"] = record["time"].astimezone(TIMEZONE)
     return record
 
+
+def _serialize(record) -> str:
+    payload = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "message": record["message"],
+        "name": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "extra": record["extra"],
+    }
+    if record["exception"] is not None:
+        exc_type, exc_value, _ = record["exception"]
+        exc_name = getattr(exc_type, "__name__", None)
+        payload["exception"] = {"type": exc_name, "value": str(exc_value)}
+    record["extra"]["_serialized"] = json.dumps(payload, ensure_ascii=False, default=str)
+    return "{extra[_serialized]}\n"
+
+
+def _sink_options(name: str, level: str) -> dict:
+    options = {
+        "level": level,
+        "rotation": settings.LOG_ROTATION,
+        "retention": settings.LOG_RETENTION,
+        "compression": settings.LOG_COMPRESSION,
+        "encoding": "utf8",
+    }
+    options.update(settings.LOG_SINK_OPTIONS.get(name, {}))
+    return options
+
+
 def init_log(**sink_channel):
-    # 简单的日志初始化，不再包含任何补丁逻辑
-    log_level = os.getenv("LOG_LEVEL", "DEBUG").upper()
+    """
+    初始化日志输出
+
+    LOG_ENQUEUE 开启时所有 sink 都经由后台线程写入，事件循环里只做格式化和入队，
+    TRACE 级别的人机挑战日志不再阻塞在文件 I/O 上。
+    Args:
+        **sink_channel: runtime / error / serialize 对应的文件路径，serialize 为每行一条的 JSON
+
+    """
+    enqueue = settings.LOG_ENQUEUE
     logger.remove()
-    logger.add(sink=sys.stdout, level=log_level, filter=timezone_filter)
-    
+    logger.configure(patcher=timezone_filter)
+    logger.add(sink=sys.stdout, level=settings.LOG_LEVEL.upper(), enqueue=enqueue)
+
     # 挂载其他日志输出
     if sink_channel.get("error"):
-        logger.add(sink=sink_channel.get("error"), level="ERROR", rotation="5 MB", filter=timezone_filter)
+        options = _sink_options("error", settings.LOG_ERROR_LEVEL)
+        logger.add(sink=sink_channel["error"], enqueue=enqueue, **options)
     if sink_channel.get("runtime"):
-        logger.add(sink=sink_channel.get("runtime"), level="TRACE", rotation="5 MB", filter=timezone_filter)
-        
+        options = _sink_options("runtime", settings.LOG_RUNTIME_LEVEL)
+        logger.add(sink=sink_channel["runtime"], enqueue=enqueue, **options)
+    if sink_channel.get("serialize"):
+        options = _sink_options("serialize", settings.LOG_SERIALIZE_LEVEL)
+        logger.add(sink=sink_channel["serialize"], format=_serialize, enqueue=enqueue, **options)
+
     return logger
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/4 21:30
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 领取流程基准：在本地 Epic 商城替身上完整跑一遍 EpicAgent.collect_epic_games
+
+Usage:
+    PYTHONPATH=app:tests python tests/bench_claim_run.py --rounds 3
+    PYTHONPATH=app:tests python tests/bench_claim_run.py --browser camoufox
+    PYTHONPATH=app:tests python tests/bench_claim_run.py --concurrency 4
+
+统计口径（单位：秒，按轮次取中位数）：
+    total            collect_epic_games 的墙钟时间
+    navigation       Page.goto 的累计耗时
+    button_detection 单个促销页面处理的自身耗时（扣除导航与结账），并发模式下为各页面累计
+    checkout         即时结账与购物车结账的累计耗时
+    order_sync       订单记录同步的累计耗时
+"""
+import argparse
+import asyncio
+import contextvars
+import functools
+import json
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List
+
+from playwright.async_api import Page, async_playwright
+
+from fake_epic_store import FakeEpicStore
+from models import PromotionGame
+from services.epic_games_service import EpicAgent, EpicGames
+from services import ownership_service, session_service
+from services.ledger_service import ClaimLedger
+from services.ownership_service import URL_ORDER_HISTORY
+from services.promotions_service import parse_promotions
+from services.session_service import URL_SESSION_PROBE
+from settings import agent_config, settings
+
+STAGES = {
+    "navigation": [(Page, "goto")],
+    "button_detection": [(EpicGames, "_add_promotion")],
+    "checkout": [(EpicGames, "_handle_instant_checkout"), (EpicGames, "_purchase_free_game")],
+    "order_sync": [(EpicAgent, "_sync_order_history")],
+}
+
+_current_frame: contextvars.ContextVar[list | None] = contextvars.ContextVar(
+    "bench_frame", default=None
+)
+
+
+class StageTimer:
+    """包装被测方法，记录各阶段的自身耗时（嵌套阶段的耗时只计入最内层）"""
+
+    def __init__(self):
+        self.elapsed: Dict[str, float] = defaultdict(float)
+
+    def _wrap(self, stage: str, func):
+        timer = self
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            frame = [0.0]
+            parent = _current_frame.get()
+            token = _current_frame.set(frame)
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                total = time.perf_counter() - start
+                _current_frame.reset(token)
+                timer.elapsed[stage] += total - frame[0]
+                if parent is not None:
+                    parent[0] += total
+
+        return wrapper
+
+    @contextmanager
+    def patch(self):
+        originals = []
+        for stage, targets in STAGES.items():
+            for owner, name in targets:
+                func = getattr(owner, name)
+                originals.append((owner, name, func))
+                setattr(owner, name, self._wrap(stage, func))
+        try:
+            yield self
+        finally:
+            for owner, name, func in originals:
+                setattr(owner, name, func)
+
+
+@contextmanager
+def override(*targets):
+    """临时替换 (对象, 属性, 值)，退出时恢复原值，避免基准在测试进程内残留全局状态"""
+    originals = [(owner, name, getattr(owner, name)) for owner, name, _ in targets]
+    try:
+        for owner, name, value in targets:
+            setattr(owner, name, value)
+        yield
+    finally:
+        for owner, name, value in originals:
+            setattr(owner, name, value)
+
+
+async def run_claim_once(browser, ledger_dir: Path) -> Dict[str, float]:
+    """启动全新的商城替身与浏览器上下文，完整领取一次并返回各阶段耗时"""
+    with FakeEpicStore() as store:
+        promotions: List[PromotionGame] = parse_promotions(store.promotions_feed())
+
+        context = await browser.new_context()
+        await store.install_routes(context)
+        # 会话探测要求存在登录 Cookie
+        await context.add_cookies(
+            [{"name": "EPIC_SSO_RM", "value": "bench", "url": "https://www.epicgames.com"}]
+        )
+        page = await context.new_page()
+
+        agent = EpicAgent(page)
+        agent._ledger = ClaimLedger(agent.account.email, ledger_dir=ledger_dir)
+        agent._ownership.ledger = agent._ledger
+        agent._session.cache_path = ledger_dir.joinpath("session.json")
+
+        timer = StageTimer()
+        # page.request 不经过 context.route，订单接口直接指向本地服务
+        local_urls = override(
+            (ownership_service, "URL_ORDER_HISTORY", store.local_url(URL_ORDER_HISTORY)),
+            (session_service, "URL_SESSION_PROBE", store.local_url(URL_SESSION_PROBE)),
+        )
+        with local_urls, timer.patch():
+            start = time.perf_counter()
+            await agent.collect_epic_games(promotions=promotions)
+            timer.elapsed["total"] = time.perf_counter() - start
+
+        await context.close()
+
+        timer.elapsed["claimed"] = len(store.state.claimed)
+        timer.elapsed["promotions"] = len(promotions)
+        return dict(timer.elapsed)
+
+
+async def launch_browser(playwright, kind: str):
+    if kind == "camoufox":
+        from camoufox import AsyncNewBrowser
+
+        return await AsyncNewBrowser(playwright, headless=True)
+    return await playwright.firefox.launch(headless=True)
+
+
+async def run_benchmark(
+    rounds: int = 3, browser_kind: str = "firefox", concurrency: int = 1
+) -> List[Dict[str, float]]:
+    # 替身页面不会弹出人机验证，缩短等待挑战的上限以免基准被超时主导
+    config = agent_config()
+    overrides = override(
+        (config, "EXECUTION_TIMEOUT", 3),
+        (config, "RESPONSE_TIMEOUT", 3),
+        (settings, "PROMOTION_CONCURRENCY", concurrency),
+    )
+
+    results = []
+    with overrides:
+        async with async_playwright() as p:
+            browser = await launch_browser(p, browser_kind)
+            try:
+                for _ in range(rounds):
+                    with tempfile.TemporaryDirectory() as ledger_dir:
+                        results.append(await run_claim_once(browser, Path(ledger_dir)))
+            finally:
+                await browser.close()
+    return results
+
+
+def summarize(results: List[Dict[str, float]]) -> Dict[str, float]:
+    keys = ["total", *STAGES, "claimed", "promotions"]
+    return {k: round(statistics.median(r.get(k, 0) for r in results), 3) for k in keys}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Claim run benchmark against a fake Epic store")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--browser", choices=["firefox", "camoufox"], default="firefox")
+    parser.add_argument("--concurrency", type=int, default=1, help="PROMOTION_CONCURRENCY")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args.rounds, args.browser, args.concurrency))
+    summary = summarize(results)
+    for key, value in summary.items():
+        print(f"{key:<18}{value}")
+    json.dump({"rounds": results, "median": summary}, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
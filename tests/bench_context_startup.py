@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/11 16:00
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 上下文启动基准：持久化 Profile vs storage_state 快照
+
+Usage:
+    PYTHONPATH=app:tests python tests/bench_context_startup.py --rounds 5
+    PYTHONPATH=app:tests python tests/bench_context_startup.py --profile volumes/user_data/<email>
+
+缺省先在本地 Epic 商城替身上访问几页生成一个新的 Profile；线上 Profile 的缓存更大，
+可以用 --profile 指定一份已有 Profile 的副本（会被复制到临时目录，不会改动原目录）。
+
+统计口径（按轮次取中位数）：
+    persistent_start     launch_persistent_context 到拿到上下文的耗时（秒），包含浏览器进程启动
+    persistent_close     关闭持久化上下文（写回 Profile）的耗时（秒）
+    storage_state_start  浏览器进程启动 + new_context(storage_state) 的耗时（秒）
+    storage_state_close  导出 storage_state 并关闭上下文与浏览器的耗时（秒）
+    profile_mb           持久化 Profile 的磁盘占用
+    pruned_profile_mb    清理缓存目录后的 Profile 磁盘占用
+    storage_state_kb     精简后的 storage_state.json 大小
+"""
+import argparse
+import asyncio
+import json
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from playwright.async_api import async_playwright
+
+from fake_epic_store import FakeEpicStore
+from services.profile_service import dir_size, prune_profile, save_storage_state
+
+WARMUP_PATHS = ["/en-US/free-games", "/en-US/cart"]
+
+
+async def build_profile(playwright, profile_dir: Path, store: FakeEpicStore):
+    context = await playwright.firefox.launch_persistent_context(profile_dir, headless=True)
+    await store.install_routes(context)
+    await context.add_cookies(
+        [{"name": "EPIC_SSO_RM", "value": "bench", "url": "https://www.epicgames.com"}]
+    )
+    page = context.pages[0] if context.pages else await context.new_page()
+    for path in WARMUP_PATHS + [g.path for g in store.state.catalog]:
+        await page.goto(f"https://store.epicgames.com{path}", wait_until="domcontentloaded")
+        await page.evaluate("path => localStorage.setItem('visited', path)", path)
+    await context.close()
+
+
+async def run_once(playwright, profile_dir: Path, state_path: Path) -> Dict[str, float]:
+    result = {}
+
+    start = time.perf_counter()
+    context = await playwright.firefox.launch_persistent_context(profile_dir, headless=True)
+    result["persistent_start"] = time.perf_counter() - start
+    start = time.perf_counter()
+    await save_storage_state(context, state_path)
+    await context.close()
+    result["persistent_close"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    browser = await playwright.firefox.launch(headless=True)
+    context = await browser.new_context(storage_state=state_path)
+    result["storage_state_start"] = time.perf_counter() - start
+    start = time.perf_counter()
+    await save_storage_state(context, state_path)
+    await context.close()
+    await browser.close()
+    result["storage_state_close"] = time.perf_counter() - start
+
+    result["profile_mb"] = dir_size(profile_dir) / 1024 / 1024
+    result["storage_state_kb"] = state_path.stat().st_size / 1024
+    return result
+
+
+async def run_benchmark(rounds: int = 5, profile: Path | None = None) -> List[Dict[str, float]]:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp, FakeEpicStore() as store:
+        profile_dir = Path(tmp, "profile")
+        state_path = Path(tmp, "storage_state.json")
+        async with async_playwright() as p:
+            if profile:
+                shutil.copytree(profile, profile_dir)
+            else:
+                await build_profile(p, profile_dir, store)
+
+            for _ in range(rounds):
+                results.append(await run_once(p, profile_dir, state_path))
+
+            prune_profile(profile_dir)
+            pruned_mb = dir_size(profile_dir) / 1024 / 1024
+            for r in results:
+                r["pruned_profile_mb"] = pruned_mb
+    return results
+
+
+def summarize(results: List[Dict[str, float]]) -> Dict[str, float]:
+    return {k: round(statistics.median(r[k] for r in results), 3) for k in results[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Persistent profile vs storage_state startup")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--profile", type=Path, default=None, help="existing profile to copy")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args.rounds, args.profile))
+    summary = summarize(results)
+    for key, value in summary.items():
+        print(f"{key:<22}{value}")
+    json.dump({"rounds": results, "median": summary}, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/11 10:30
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : freeGamesPromotions 解析微基准：dict 探测 + 逐个构造模型 vs 一次性类型化校验
+
+Usage:
+    PYTHONPATH=app:tests python tests/bench_promotions_parser.py
+    PYTHONPATH=app:tests python tests/bench_promotions_parser.py --feed recorded.json --repeat 50
+
+缺省使用合成的大体积 feed（与线上响应字段一致，附带解析时会被丢弃的图片、价格、自定义属性），
+也可以传入录制的线上响应。
+"""
+import argparse
+import json
+import statistics
+import time
+from contextlib import suppress
+from pathlib import Path
+from typing import Callable, List
+
+from loguru import logger
+
+from models import PromotionGame
+from services.promotions_service import parse_promotions
+
+
+def synthetic_feed(n: int = 2000) -> bytes:
+    elements = []
+    for i in range(n):
+        free = i % 10 == 0
+        elements.append(
+            {
+                "title": f"Game {i}" if i % 7 else f"Game {i} Collection",
+                "id": f"{i:032x}",
+                "namespace": f"{i:032d}",
+                "description": "lorem ipsum " * 20,
+                "effectiveDate": "2025-07-31T15:00:00.000Z",
+                "offerType": "BUNDLE" if i % 13 == 0 else "BASE_GAME",
+                "status": "ACTIVE",
+                "isCodeRedemptionOnly": False,
+                "seller": {"id": f"seller-{i}", "name": "Publisher"},
+                "productSlug": f"game-{i}",
+                "urlSlug": f"game-{i}",
+                "keyImages": [
+                    {"type": t, "url": f"https://cdn1.epicgames.com/{i}/{t}.jpg"}
+                    for t in ("OfferImageWide", "OfferImageTall", "Thumbnail", "DieselStoreWide")
+                ],
+                "items": [{"id": f"item-{i}", "namespace": f"{i:032d}"}],
+                "customAttributes": [{"key": f"k{j}", "value": "v" * 16} for j in range(8)],
+                "categories": [{"path": "freegames"}, {"path": "games"}, {"path": "games/edition"}],
+                "tags": [{"id": str(j)} for j in range(12)],
+                "catalogNs": {"mappings": [{"pageSlug": f"game-{i}", "pageType": "productHome"}]},
+                "offerMappings": [{"pageSlug": f"game-{i}", "pageType": "productHome"}],
+                "price": {
+                    "totalPrice": {
+                        "discountPrice": 0 if free else 1999,
+                        "originalPrice": 1999,
+                        "currencyCode": "USD",
+                        "fmtPrice": {"originalPrice": "$19.99", "discountPrice": "$0.00"},
+                    },
+                    "lineOffers": [{"appliedRules": []}],
+                },
+                "promotions": {
+                    "promotionalOffers": [
+                        {
+                            "promotionalOffers": [
+                                {
+                                    "startDate": "2025-07-31T15:00:00.000Z",
+                                    "endDate": "2025-08-07T15:00:00.000Z",
+                                    "discountSetting": {
+                                        "discountType": "PERCENTAGE",
+                                        "discountPercentage": 0 if free else 50,
+                                    },
+                                }
+                            ]
+                        }
+                    ],
+                    "upcomingPromotionalOffers": [],
+                },
+            }
+        )
+    return json.dumps({"data": {"Catalog": {"searchStore": {"elements": elements}}}}).encode()
+
+
+def legacy_parse(raw: bytes) -> List[PromotionGame]:
+    """旧实现：json.loads 得到 dict，逐个元素探测字段后构造 PromotionGame"""
+    data = json.loads(raw)
+    promotions = []
+    for e in data["data"]["Catalog"]["searchStore"]["elements"]:
+        is_free = False
+        with suppress(KeyError, IndexError, TypeError):
+            offers = e["promotions"]["promotionalOffers"][0]["promotionalOffers"]
+            is_free = any(o["discountSetting"]["discountPercentage"] == 0 for o in offers)
+        if not is_free:
+            continue
+        is_bundle = e.get("offerType") == "BUNDLE" or "Collection" in e.get("title", "")
+        is_bundle = is_bundle or any("bundle" in c.get("path", "") for c in e.get("categories", []))
+        base = "bundles" if is_bundle else "p"
+        slug = e["offerMappings"][0]["pageSlug"] if e.get("offerMappings") else e["productSlug"]
+        e["url"] = f"https://store.epicgames.com/en-US/{base}/{slug}"
+        logger.info(e["url"])
+        promotions.append(PromotionGame(**e))
+    return promotions
+
+
+def measure(func: Callable[[bytes], list], raw: bytes, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(raw)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Promotions feed parser micro-benchmark")
+    parser.add_argument("--feed", type=Path, help="recorded freeGamesPromotions response")
+    parser.add_argument("--elements", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    raw = args.feed.read_bytes() if args.feed else synthetic_feed(args.elements)
+    assert [p.url for p in legacy_parse(raw)] == [p.url for p in parse_promotions(raw)]
+
+    print(f"feed_size         {len(raw) / 1024:.0f}KB")
+    print(f"legacy_ms         {measure(legacy_parse, raw, args.repeat):.2f}")
+    print(f"typed_ms          {measure(parse_promotions, raw, args.repeat):.2f}")
+
+
+if __name__ == "__main__":
+    main()
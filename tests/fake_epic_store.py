@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/4 20:10
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 本地离线的 Epic 商城替身，用于领取流程的测试与基准
+
+页面只保留领取流程依赖的元素（egs-navigation、purchase-cta-button、webPurchaseContainer、
+offer-card-layout-wrapper、订单记录 JSON），浏览器侧通过 route 把 store/www.epicgames.com
+的请求转发到本地服务，业务代码中的 URL 常量无需改动。
+"""
+import json
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+EPIC_HOSTS_PATTERN = re.compile(r"^https://(store|www|store-site-backend-static\.ak)\.epicgames\.com/")
+
+
+@dataclass
+class FakeGame:
+    slug: str
+    title: str
+    namespace: str
+    offer_id: str
+    kind: str = "product"  # product | bundle
+
+    @property
+    def path(self) -> str:
+        return f"/en-US/{'bundles' if self.kind == 'bundle' else 'p'}/{self.slug}"
+
+
+def default_catalog() -> List[FakeGame]:
+    return [
+        FakeGame("free-game-one", "Free Game One", "a" * 32, "offer-one"),
+        FakeGame("free-game-two", "Free Game Two", "b" * 32, "offer-two"),
+        FakeGame("free-game-three", "Free Game Three", "c" * 32, "offer-three"),
+        FakeGame("free-bundle", "Free Bundle Collection", "d" * 32, "offer-bundle", "bundle"),
+    ]
+
+
+@dataclass
+class StoreState:
+    catalog: List[FakeGame] = field(default_factory=default_catalog)
+    cart: List[str] = field(default_factory=list)
+    claimed: Dict[str, int] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def game(self, offer_id: str) -> FakeGame | None:
+        return next((g for g in self.catalog if g.offer_id == offer_id), None)
+
+    def claim(self, offer_ids: List[str]):
+        with self.lock:
+            for offer_id in offer_ids:
+                if self.game(offer_id) and offer_id not in self.claimed:
+                    self.claimed[offer_id] = int(time.time() * 1000)
+                if offer_id in self.cart:
+                    self.cart.remove(offer_id)
+
+
+_PURCHASE_SCRIPT = """
+<script>
+  function openPurchase(offers) {
+    const f = document.createElement("iframe");
+    f.id = "webPurchaseContainer";
+    f.src = "/purchase?offers=" + encodeURIComponent(offers);
+    document.body.appendChild(f);
+  }
+  window.addEventListener("message", (e) => {
+    if (e.data !== "purchase-complete") return;
+    document.getElementById("webPurchaseContainer")?.remove();
+    if (location.pathname.endsWith("/cart")) location.href = "/en-US/cart/success";
+  });
+</script>
+"""
+
+
+def _layout(title: str, body: str) -> str:
+    return (
+        f"<!doctype html><html><head><meta charset='utf-8'><title>{escape(title)}</title></head>"
+        f"<body><egs-navigation isloggedin='true'></egs-navigation>{body}{_PURCHASE_SCRIPT}"
+        f"</body></html>"
+    )
+
+
+class FakeEpicStore:
+    """
+    Usage:
+        with FakeEpicStore() as store:
+            await store.install_routes(context)
+            feed = store.promotions_feed()
+    """
+
+    def __init__(self, catalog: List[FakeGame] | None = None):
+        self.state = StoreState(catalog=catalog or default_catalog())
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeEpicStore":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def local_url(self, url: str) -> str:
+        return EPIC_HOSTS_PATTERN.sub(f"{self.base_url}/", url)
+
+    async def install_routes(self, context):
+        """把 Epic 域名下的请求转发到本地服务，其它外部请求一律拒绝以保证离线"""
+
+        async def forward(route):
+            url = route.request.url
+            if EPIC_HOSTS_PATTERN.match(url):
+                response = await route.fetch(url=self.local_url(url))
+                await route.fulfill(response=response)
+            elif url.startswith(self.base_url):
+                await route.continue_()
+            else:
+                await route.abort()
+
+        await context.route("**/*", forward)
+
+    # ----------------------------------------------------------------
+    # Fixtures
+    # ----------------------------------------------------------------
+
+    def promotions_feed(self) -> dict:
+        elements = []
+        for game in self.state.catalog:
+            elements.append(
+                {
+                    "title": game.title,
+                    "id": game.offer_id,
+                    "namespace": game.namespace,
+                    "description": game.title,
+                    "offerType": "BUNDLE" if game.kind == "bundle" else "BASE_GAME",
+                    "productSlug": game.slug,
+                    "offerMappings": [{"pageSlug": game.slug, "pageType": "productHome"}],
+                    "categories": [{"path": "freegames"}],
+                    "promotions": {
+                        "promotionalOffers": [
+                            {
+                                "promotionalOffers": [
+                                    {
+                                        "startDate": "2025-01-01T15:00:00.000Z",
+                                        "endDate": "2099-01-01T15:00:00.000Z",
+                                        "discountSetting": {
+                                            "discountType": "PERCENTAGE",
+                                            "discountPercentage": 0,
+                                        },
+                                    }
+                                ]
+                            }
+                        ],
+                        "upcomingPromotionalOffers": [],
+                    },
+                }
+            )
+        return {"data": {"Catalog": {"searchStore": {"elements": elements}}}}
+
+    def order_history(self, next_page_token: str | None = None, page_size: int = 10) -> dict:
+        """与线上接口一致：按时间倒序分页，nextPageToken 为下一页的起始下标"""
+        orders = []
+        with self.state.lock:
+            claimed = sorted(self.state.claimed.items(), key=lambda x: x[1], reverse=True)
+        for offer_id, created_at in claimed:
+            game = self.state.game(offer_id)
+            orders.append(
+                {
+                    "orderType": "PURCHASE",
+                    "orderId": f"order-{offer_id}",
+                    "createdAtMillis": created_at,
+                    "items": [
+                        {
+                            "description": game.title,
+                            "offerId": game.offer_id,
+                            "namespace": game.namespace,
+                        }
+                    ],
+                }
+            )
+        start = int(next_page_token or 0)
+        page = orders[start : start + page_size]
+        token = str(start + page_size) if start + page_size < len(orders) else None
+        return {"orders": page, "count": len(page), "start": start, "nextPageToken": token}
+
+    def product_page(self, game: FakeGame) -> str:
+        if game.offer_id in self.state.claimed:
+            label, action = "In Library", ""
+        elif game.kind == "bundle":
+            label = "Add To Cart"
+            action = (
+                f"fetch('/cart/add', {{method: 'POST', body: '{game.offer_id}'}})"
+                f".then(() => {{ this.textContent = 'View In Cart'; }})"
+            )
+        else:
+            label, action = "Get", f"openPurchase('{game.offer_id}')"
+        body = (
+            f"<h1>{escape(game.title)}</h1>"
+            f"<button data-testid='purchase-cta-button' onclick=\"{action}\">{label}</button>"
+        )
+        return _layout(f"{game.title} | Epic Games Store", body)
+
+    def cart_page(self) -> str:
+        with self.state.lock:
+            cart = list(self.state.cart)
+        cards = "".join(
+            f"<div data-testid='offer-card-layout-wrapper'><h2>{escape(self.state.game(o).title)}</h2>"
+            f"<span>Free</span><button><span>Move to wishlist</span></button></div>"
+            for o in cart
+        )
+        checkout = f"<button onclick=\"openPurchase('{','.join(cart)}')\"><span>Check Out</span></button>"
+        return _layout("Cart | Epic Games Store", cards + checkout)
+
+    @staticmethod
+    def purchase_page(offers: str) -> str:
+        return (
+            "<!doctype html><html><body>"
+            "<button class='payment-btn payment-confirm__btn'>PLACE ORDER</button>"
+            "<script>document.querySelector('button').addEventListener('click', async () => {"
+            f"  await fetch('/purchase/confirm-order', {{method: 'POST', body: '{escape(offers)}'}});"
+            "  parent.postMessage('purchase-complete', '*');"
+            "});</script></body></html>"
+        )
+
+    # ----------------------------------------------------------------
+    # HTTP
+    # ----------------------------------------------------------------
+
+    def _handler_class(self):
+        store = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: str, content_type: str = "text/html"):
+                data = body.encode("utf8")
+                self.send_response(status)
+                self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _json(self, payload: dict):
+                self._send(200, json.dumps(payload), "application/json")
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                path = url.path.rstrip("/")
+                games = {g.path: g for g in store.state.catalog}
+
+                if path == "/freeGamesPromotions":
+                    return self._json(store.promotions_feed())
+                if path == "/account/v2/payment/ajaxGetOrderHistory":
+                    token = parse_qs(url.query).get("nextPageToken", [None])[0]
+                    return self._json(store.order_history(token))
+                if path == "/account/v2/personal/ajaxGet":
+                    return self._json({"userInfo": {"email": {"value": "a@b.c"}}})
+                if path == "/en-US/free-games":
+                    return self._send(200, _layout("Free Games | Epic Games Store", "<h1>Free</h1>"))
+                if path == "/en-US/cart":
+                    return self._send(200, store.cart_page())
+                if path == "/en-US/cart/success":
+                    return self._send(200, _layout("Success", "<h1>Thanks for your order!</h1>"))
+                if path == "/purchase":
+                    offers = parse_qs(url.query).get("offers", [""])[0]
+                    return self._send(200, store.purchase_page(offers))
+                if game := games.get(path):
+                    return self._send(200, store.product_page(game))
+                return self._send(404, _layout("404 - Page Not Found", "<h1>404</h1>"))
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length).decode("utf8")
+                path = urlparse(self.path).path
+
+                if path == "/cart/add":
+                    with store.state.lock:
+                        if body not in store.state.cart:
+                            store.state.cart.append(body)
+                    return self._json({"success": True})
+                if path == "/purchase/confirm-order":
+                    store.state.claim([o for o in body.split(",") if o])
+                    return self._json({"success": True})
+                return self._send(404, "")
+
+        return Handler
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/14 10:20
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 账号池：单个账号失败不影响其他账号，浏览器负载计数总能归还
+"""
+import asyncio
+
+from models import Account
+from services import account_pool_service
+from services.account_pool_service import AccountPool
+from settings import settings
+
+
+class _BrokenBrowser:
+    async def new_context(self, **kwargs):
+        raise RuntimeError("Target page, context or browser has been closed")
+
+
+def test_new_context_failure_releases_browser(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "RECORD_VIDEO_MODE", "off")
+    monkeypatch.setattr(account_pool_service, "account_data_dir", lambda email: tmp_path)
+
+    pool = AccountPool([Account(email="a@b.c", password="x")])
+    pool._browsers.append(_BrokenBrowser())
+    pool._browser_load[0] = 0
+
+    assert asyncio.run(pool._run_account(pool.accounts[0])) is False
+    assert pool._browser_load[0] == 0
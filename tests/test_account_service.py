@@ -0,0 +1,22 @@
+import json
+
+from services.account_service import load_accounts
+from settings import settings
+
+
+def test_load_accounts_merges_file_with_default(tmp_path):
+    accounts_file = tmp_path.joinpath("accounts.json")
+    records = [
+        {"email": "second@example.com", "password": "p2"},
+        {"email": settings.EPIC_EMAIL, "password": "duplicate"},
+        {"email": "broken@example.com"},
+    ]
+    accounts_file.write_text(json.dumps(records), encoding="utf8")
+
+    accounts = load_accounts(accounts_file)
+    assert [a.email for a in accounts] == [settings.EPIC_EMAIL, "second@example.com"]
+    assert accounts[1].password.get_secret_value() == "p2"
+
+
+def test_load_accounts_without_file(tmp_path):
+    assert len(load_accounts(tmp_path.joinpath("missing.json"))) == 1
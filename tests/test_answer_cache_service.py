@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/9 18:40
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 人机挑战答案缓存
+"""
+import asyncio
+import random
+
+from PIL import Image, ImageDraw
+from hcaptcha_challenger.models import (
+    BoundingBoxCoordinate,
+    ImageAreaSelectChallenge,
+    ImageBinaryChallenge,
+    PointCoordinate,
+)
+
+from services.answer_cache_service import AnswerCache, dhash, install_answer_cache, settle_answers
+
+
+def _challenge_image(path, noise: int = 0):
+    image = Image.new("RGB", (300, 300), "white")
+    draw = ImageDraw.Draw(image)
+    for i in range(3):
+        draw.rectangle((i * 100 + 10, 40, i * 100 + 60, 260), fill=(40 * i, 80, 200))
+    if noise:
+        draw.point([(5, 5), (6, 6)], fill=(noise, noise, noise))
+    image.save(path)
+    return path
+
+
+def _grid_image(path, seeds):
+    """九宫格挑战：每个图块由种子生成一组随机色块"""
+    image = Image.new("RGB", (300, 300), "white")
+    draw = ImageDraw.Draw(image)
+    for i, seed in enumerate(seeds):
+        rng = random.Random(seed)
+        left, top = (i % 3) * 100, (i // 3) * 100
+        for _ in range(6):
+            x, y = rng.randrange(0, 80), rng.randrange(0, 80)
+            color = tuple(rng.randrange(256) for _ in range(3))
+            draw.rectangle((left + x, top + y, left + x + 20, top + y + 20), fill=color)
+    image.save(path)
+    return path
+
+
+class _Locator:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+    async def bounding_box(self):
+        return self.boxes[0] if self.boxes else None
+
+    async def all(self):
+        return [_Locator([box]) for box in self.boxes]
+
+
+class _Frame:
+    def __init__(self, x, y):
+        self.view = {"x": x, "y": y, "width": 300, "height": 300}
+        self.tiles = [
+            {"x": x + (i % 3) * 100, "y": y + (i // 3) * 100, "width": 100, "height": 100}
+            for i in range(9)
+        ]
+
+    def locator(self, selector):
+        if selector.endswith("canvas"):
+            return _Locator([self.view])
+        if "task" in selector:
+            return _Locator(self.tiles)
+        return _Locator([self.view])
+
+
+class _PointReasoner:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, *, challenge_screenshot, **kwargs):
+        self.calls += 1
+        return ImageAreaSelectChallenge(
+            challenge_prompt="pick", points=[PointCoordinate(x=150, y=260)]
+        )
+
+    def cache_response(self, path):
+        pass
+
+
+class _TileReasoner:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, *, challenge_screenshot, **kwargs):
+        self.calls += 1
+        return ImageBinaryChallenge(
+            challenge_prompt="cat", coordinates=[BoundingBoxCoordinate(box_2d=[0, 1])]
+        )
+
+    def cache_response(self, path):
+        pass
+
+
+class _Arm:
+    def __init__(self, x, y):
+        self.frame = _Frame(x, y)
+        self.captcha_payload = None
+        self._challenge_prompt = "Please click on the cat"
+        self._spatial_point_reasoner = _PointReasoner()
+        self._image_classifier = _TileReasoner()
+
+    async def get_challenge_frame_locator(self):
+        return self.frame
+
+
+class _Agent:
+    def __init__(self, x=100, y=200):
+        self.robotic_arm = _Arm(x, y)
+
+
+def test_dhash_tolerates_small_differences(tmp_path):
+    a = dhash(_challenge_image(tmp_path / "a.png"))
+    b = dhash(_challenge_image(tmp_path / "b.png", noise=90))
+    assert (a ^ b).bit_count() <= 10
+
+
+def test_hit_after_success_and_coordinates_follow_the_frame(tmp_path):
+    cache = AnswerCache(root=tmp_path / "answers")
+    screenshot = _challenge_image(tmp_path / "challenge.png")
+
+    first = _Agent(x=100, y=200)
+    pending = install_answer_cache(first, cache)
+    asyncio.run(first.robotic_arm._spatial_point_reasoner(challenge_screenshot=screenshot))
+    settle_answers(pending, True, first, cache)
+    assert cache.misses == 1
+
+    second = _Agent(x=110, y=180)
+    original = second.robotic_arm._spatial_point_reasoner
+    pending = install_answer_cache(second, cache)
+    response = asyncio.run(
+        second.robotic_arm._spatial_point_reasoner(challenge_screenshot=screenshot)
+    )
+    assert original.calls == 0
+    assert response.points[0] == PointCoordinate(x=160, y=240)
+    assert cache.hits == 1
+
+    # 命中的答案没能通过挑战时会被删除
+    settle_answers(pending, False, second, cache)
+    third = _Agent()
+    install_answer_cache(third, cache)
+    asyncio.run(third.robotic_arm._spatial_point_reasoner(challenge_screenshot=screenshot))
+    assert cache.misses == 2
+
+
+def test_failed_challenge_is_not_cached(tmp_path):
+    cache = AnswerCache(root=tmp_path / "answers")
+    screenshot = _challenge_image(tmp_path / "challenge.png")
+
+    agent = _Agent()
+    pending = install_answer_cache(agent, cache)
+    asyncio.run(agent.robotic_arm._spatial_point_reasoner(challenge_screenshot=screenshot))
+    settle_answers(pending, False, agent, cache)
+    assert not list((tmp_path / "answers").rglob("*.json"))
+
+
+def _classify(cache, screenshot):
+    agent = _Agent()
+    original = agent.robotic_arm._image_classifier
+    pending = install_answer_cache(agent, cache)
+    response = asyncio.run(agent.robotic_arm._image_classifier(challenge_screenshot=screenshot))
+    settle_answers(pending, True, agent, cache)
+    return original.calls, response
+
+
+def test_grid_is_cached_per_tile_and_one_new_tile_misses(tmp_path):
+    cache = AnswerCache(root=tmp_path / "answers")
+    seeds = list(range(9))
+    screenshot = _grid_image(tmp_path / "grid.png", seeds)
+
+    assert _classify(cache, screenshot)[0] == 1
+    calls, response = _classify(cache, screenshot)
+    assert calls == 0
+    assert response.convert_box_to_boolean_matrix() == [i == 1 for i in range(9)]
+
+    # 题目相同、只换了一个图块：整图哈希几乎不变，按图块缓存必须未命中
+    for tile in range(9):
+        swapped = [100 + tile if i == tile else s for i, s in enumerate(seeds)]
+        other = _grid_image(tmp_path / f"swapped-{tile}.png", swapped)
+        assert _classify(AnswerCache(root=tmp_path / "answers"), other)[0] == 1
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/9 15:30
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : AiHubMix 上传绕过缓存
+"""
+from extensions.ext_aihubmix import BypassFileCache
+
+
+def test_entry_is_released_after_last_consume():
+    cache = BypassFileCache(max_items=8, max_bytes=1024)
+    a = cache.put(b"frame")
+    assert cache.put(b"frame") == a
+
+    assert cache.consume(a) == b"frame"
+    assert a in cache
+    assert cache.consume(a) == b"frame"
+    assert a not in cache
+    assert cache.consume(a) is None
+    assert cache.stats == {"items": 0, "bytes": 0, "hits": 2, "misses": 1, "evictions": 0}
+
+
+def test_unconsumed_entries_are_evicted_by_count_and_size():
+    cache = BypassFileCache(max_items=2, max_bytes=10)
+    first = cache.put(b"1111")
+    cache.put(b"2222")
+    third = cache.put(b"3333")
+    assert first not in cache and third in cache
+
+    cache.put(b"x" * 9)
+    assert len(cache) == 1
+    assert cache.stats["evictions"] == 3
@@ -0,0 +1,94 @@
+import pytest
+
+from extensions.ext_celery import ext_celery_app
+from models import OrderItem, PromotionGame
+from schedule import collect_epic_games_task as tasks
+from services.ledger_service import ClaimLedger
+from settings import settings
+
+
+def _promotion(i: int) -> PromotionGame:
+    return PromotionGame(
+        title=f"game-{i}",
+        id=f"offer-{i}",
+        namespace=f"{i:032d}",
+        description="",
+        offerType="BASE_GAME",
+        url=f"https://store.epicgames.com/en-US/p/game-{i}",
+    )
+
+
+@pytest.fixture
+def memory_celery(monkeypatch, tmp_path):
+    ext_celery_app.conf.update(
+        broker_url="memory://",
+        result_backend="cache+memory://",
+        task_always_eager=True,
+        task_store_eager_result=True,
+    )
+    monkeypatch.setattr(tasks, "ClaimLedger", lambda email: ClaimLedger(email, ledger_dir=tmp_path))
+    yield tmp_path
+    ext_celery_app.conf.update(task_always_eager=False, task_store_eager_result=False)
+
+
+def test_discover_fans_out_unclaimed_promotions(memory_celery, monkeypatch):
+    claimed, pending = _promotion(1), _promotion(2)
+    ClaimLedger(settings.EPIC_EMAIL, ledger_dir=memory_celery).add_items(
+        [OrderItem(description="", offerId=claimed.id, namespace=claimed.namespace)]
+    )
+
+    calls = []
+
+    async def fake_claim(account, promotion):
+        calls.append((account.email, promotion.namespace))
+        ClaimLedger(account.email, ledger_dir=memory_celery).add_items(
+            [OrderItem(description="", offerId=promotion.id, namespace=promotion.namespace)]
+        )
+        return True
+
+    async def fake_discover_promotions(regions):
+        return [claimed, pending]
+
+    monkeypatch.setattr(tasks, "discover_promotions", fake_discover_promotions)
+    monkeypatch.setattr(tasks, "claim_promotion", fake_claim)
+
+    result = tasks.discover_promotions_task.delay().get(timeout=5)
+    assert result["dispatched"] == [{"email": settings.EPIC_EMAIL, "namespace": pending.namespace}]
+    assert calls == [(settings.EPIC_EMAIL, pending.namespace)]
+
+
+def test_discover_routes_accounts_by_region(memory_celery, monkeypatch):
+    us_only = _promotion(1).model_copy(update={"regions": ["US"]})
+    everywhere = _promotion(2).model_copy(update={"regions": ["US", "CN"]})
+    requested = []
+
+    async def fake_discover_promotions(regions):
+        requested.append(regions)
+        return [us_only, everywhere]
+
+    async def fake_claim(account, promotion):
+        return True
+
+    monkeypatch.setattr(settings, "EPIC_COUNTRY", "CN")
+    monkeypatch.setattr(tasks, "discover_promotions", fake_discover_promotions)
+    monkeypatch.setattr(tasks, "claim_promotion", fake_claim)
+
+    result = tasks.discover_promotions_task.delay().get(timeout=5)
+    assert requested == [["CN"]]
+    expected = [{"email": settings.EPIC_EMAIL, "namespace": everywhere.namespace}]
+    assert result["dispatched"] == expected
+
+
+def test_claim_task_reports_status_to_backend(memory_celery, monkeypatch):
+    async def fake_claim(account, promotion):
+        return True
+
+    monkeypatch.setattr(tasks, "claim_promotion", fake_claim)
+    promotion = _promotion(3).model_dump(mode="json")
+
+    async_result = tasks.claim_promotion_task.delay(settings.EPIC_EMAIL, promotion)
+    assert async_result.get(timeout=5)["status"] == "unconfirmed"
+    assert ext_celery_app.AsyncResult(async_result.id).result["namespace"] == f"{3:032d}"
+
+    unknown = tasks.claim_promotion_task.delay("nobody@example.com", promotion).get(timeout=5)
+    assert unknown["status"] == "unknown_account"
@@ -0,0 +1,97 @@
+import asyncio
+
+from playwright.async_api import TimeoutError
+
+from services.epic_games_service import CheckoutSignal, EpicGames
+from services.retry_service import RetryableError, RetryPolicy
+
+
+class _StubPage:
+    """只实现 _wait_for_checkout_signal 用到的等待接口，由 fire() 触发对应信号"""
+
+    def __init__(self):
+        self._events: dict[str, asyncio.Future] = {}
+
+    def _future(self, name: str) -> asyncio.Future:
+        return self._events.setdefault(name, asyncio.get_running_loop().create_future())
+
+    async def _wait(self, name: str, timeout: float):
+        try:
+            return await asyncio.wait_for(self._future(name), timeout / 1000)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"{name} timeout")
+
+    async def wait_for_selector(self, selector, state=None, timeout=None):
+        return await self._wait("detached", timeout)
+
+    async def wait_for_event(self, event, predicate=None, timeout=None):
+        return await self._wait(event, timeout)
+
+    async def wait_for_url(self, url, wait_until=None, timeout=None):
+        return await self._wait("success_url", timeout)
+
+    def fire(self, name: str):
+        self._future(name).set_result(True)
+
+
+def test_first_signal_after_action_wins():
+    async def scenario():
+        page = _StubPage()
+
+        async def click():
+            page.fire("detached")
+
+        return await EpicGames._wait_for_checkout_signal(page, action=click, captcha=False)
+
+    assert asyncio.run(scenario()) == CheckoutSignal.IFRAME_DETACHED
+
+
+def test_no_signal_returns_none_within_timeout():
+    async def scenario():
+        page = _StubPage()
+        return await EpicGames._wait_for_checkout_signal(page, captcha=False, timeout=50)
+
+    assert asyncio.run(asyncio.wait_for(scenario(), 2)) is None
+
+
+class _CartCard:
+    def __init__(self, cart: "_CartPage", free: bool):
+        self.cart = cart
+        self.free = free
+
+    async def query_selector(self, selector):
+        if "Free" in selector:
+            return self if self.free else None
+        return self
+
+    async def click(self):
+        self.cart.cards.remove(self)
+
+
+class _CartPage:
+    """每次移出付费游戏后购物车重新渲染，再冒出一个付费游戏，共 waves 轮"""
+
+    def __init__(self, waves: int):
+        self.cards = [_CartCard(self, free=True), _CartCard(self, free=False)]
+        self.waves = waves - 1
+
+    async def query_selector_all(self, selector):
+        return list(self.cards)
+
+    async def wait_for_function(self, expression, arg=None, timeout=None):
+        if self.waves:
+            self.waves -= 1
+            self.cards.append(_CartCard(self, free=False))
+
+
+def test_empty_cart_checks_the_cart_after_the_last_pass():
+    async def scenario(waves: int):
+        epic = EpicGames(page=None)
+        epic._cart_retry = RetryPolicy(
+            "empty_cart", max_attempts=3, base_delay=0, retry_on=(RetryableError,)
+        )
+        return await epic._empty_cart(_CartPage(waves))
+
+    # 第 3 轮（最后一轮）移出了最后一个付费游戏
+    assert asyncio.run(scenario(waves=3)) is True
+    assert asyncio.run(scenario(waves=4)) is False
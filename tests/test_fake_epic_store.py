@@ -0,0 +1,58 @@
+import asyncio
+
+import httpx
+import pytest
+
+from fake_epic_store import FakeEpicStore
+from services.promotions_service import parse_promotions
+
+
+@pytest.fixture
+def store():
+    with FakeEpicStore() as s:
+        yield s
+
+
+def test_fake_store_serves_claim_flow(store):
+    promotions = parse_promotions(store.promotions_feed())
+    assert len(promotions) == len(store.state.catalog)
+
+    with httpx.Client(base_url=store.base_url) as client:
+        for p in promotions:
+            page = client.get(store.local_url(p.url))
+            assert page.status_code == 200
+            assert "purchase-cta-button" in page.text
+
+        bundle = next(g for g in store.state.catalog if g.kind == "bundle")
+        client.post("/cart/add", content=bundle.offer_id)
+        assert "offer-card-layout-wrapper" in client.get("/en-US/cart").text
+
+        client.post("/purchase/confirm-order", content=f"{bundle.offer_id},offer-one")
+        orders = client.get("/account/v2/payment/ajaxGetOrderHistory").json()["orders"]
+        assert {o["items"][0]["offerId"] for o in orders} == {bundle.offer_id, "offer-one"}
+        assert not store.state.cart
+        assert "In Library" in client.get(bundle.path).text
+        assert client.get("/en-US/p/unknown").status_code == 404
+
+
+def test_claim_run_against_fake_store():
+    """完整的浏览器领取流程，需要本机已安装 Playwright Firefox"""
+    bench = pytest.importorskip("bench_claim_run")
+    from services import ownership_service
+    from settings import settings
+
+    order_history_url = ownership_service.URL_ORDER_HISTORY
+    concurrency = settings.PROMOTION_CONCURRENCY
+
+    try:
+        results = asyncio.run(bench.run_benchmark(rounds=1))
+    except Exception as err:
+        if "Executable doesn't exist" in str(err):
+            pytest.skip("Playwright Firefox is not installed")
+        raise
+
+    summary = bench.summarize(results)
+    assert summary["claimed"] == summary["promotions"]
+    # 基准在测试进程内运行，结束后不能残留对全局配置的修改
+    assert ownership_service.URL_ORDER_HISTORY == order_history_url
+    assert settings.PROMOTION_CONCURRENCY == concurrency
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/10 11:20
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 共享 HTTP 客户端
+"""
+import asyncio
+
+from services.http_service import aclose_http_client, get_http_client
+
+
+def test_client_is_shared_within_a_loop_and_recreated_per_loop():
+    async def _clients():
+        first, second = get_http_client(), get_http_client()
+        return first, second
+
+    first, second = asyncio.run(_clients())
+    assert first is second
+
+    async def _fresh():
+        client = get_http_client()
+        await aclose_http_client()
+        return client
+
+    third = asyncio.run(_fresh())
+    assert third is not first
+    assert third.is_closed
@@ -0,0 +1,29 @@
+from models import OrderItem
+from services.ledger_service import ClaimLedger
+
+
+def _item(i: int) -> OrderItem:
+    return OrderItem(description=f"game-{i}", offerId=f"offer-{i}", namespace=f"{i:032d}")
+
+
+def test_ledger_persists_items_and_cursor(tmp_path):
+    ledger = ClaimLedger("someone@example.com", ledger_dir=tmp_path)
+    assert ledger.cursor is None
+    assert ledger.add_items([_item(1), _item(2)], cursor=1000) == 2
+    assert ledger.add_items([_item(2), _item(3)], cursor=900) == 1
+
+    reloaded = ClaimLedger("someone@example.com", ledger_dir=tmp_path)
+    assert len(reloaded) == 3
+    assert reloaded.cursor == 1000
+    assert f"{2:032d}" in reloaded
+    assert "offer-3" in reloaded
+    assert "unknown" not in reloaded
+
+
+def test_ledger_skips_corrupted_lines(tmp_path):
+    ledger = ClaimLedger("someone@example.com", ledger_dir=tmp_path)
+    ledger.add_items([_item(1)])
+    with ledger.path.open("a", encoding="utf8") as file:
+        file.write('{"namespace": \n')
+
+    assert len(ClaimLedger("someone@example.com", ledger_dir=tmp_path)) == 1
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/12 18:10
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 后台写入的日志 sink 与 serialize 结构化输出
+"""
+import json
+import sys
+
+from loguru import logger
+
+from utils import init_log
+
+
+def test_init_log_writes_structured_json(tmp_path, monkeypatch):
+    from settings import settings
+
+    monkeypatch.setattr(settings, "LOG_SINK_OPTIONS", {"serialize": {"rotation": "1 day"}})
+    runtime, serialize = tmp_path.joinpath("runtime.log"), tmp_path.joinpath("serialize.log")
+    try:
+        init_log(runtime=runtime, serialize=serialize)
+        with logger.contextualize(account="a@b.c"):
+            logger.info("claimed {}", "Fall Guys")
+            logger.debug("challenge detail")
+        logger.complete()
+
+        records = [json.loads(line) for line in serialize.read_text(encoding="utf8").splitlines()]
+        assert [r["message"] for r in records] == ["claimed Fall Guys"]
+        assert records[0]["extra"] == {"account": "a@b.c"}
+        assert records[0]["time"].endswith("+08:00")
+        assert "challenge detail" in runtime.read_text(encoding="utf8")
+    finally:
+        logger.remove()
+        logger.configure(patcher=None)
+        logger.add(sys.stderr)
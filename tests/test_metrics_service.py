@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/12 16:30
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 调度任务、领取结果与人机挑战指标；未安装 prometheus_client 时为空操作
+"""
+import os
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+from services import metrics_service
+from services.metrics_service import browser_rss_bytes, observe_job, record_claim
+
+
+def test_browser_rss_counts_child_processes():
+    if not os.path.isdir("/proc"):
+        pytest.skip("requires /proc")
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(5)"])
+    try:
+        assert browser_rss_bytes() > 0
+    finally:
+        child.kill()
+        child.wait()
+    assert browser_rss_bytes(root=child.pid) == 0
+
+
+def test_recording_without_server_does_not_raise():
+    with pytest.raises(RuntimeError):
+        with observe_job("startup_task"):
+            raise RuntimeError("boom")
+    record_claim("skipped", 0)
+    assert metrics_service.start_metrics_server(port=None) is False
+
+
+def test_exposition():
+    prometheus_client = pytest.importorskip("prometheus_client")
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    with observe_job("daily_epic_games_task"):
+        pass
+    record_claim("succeeded", 2)
+    metrics_service.record_captcha("SUCCESS", 3.2)
+    metrics_service.record_llm_call("gemini-2.5-pro")
+    next_run = datetime(2025, 8, 14, tzinfo=timezone.utc)
+    metrics_service.set_next_run("weekly_epic_games_task", next_run)
+    metrics_service.instrument_scheduler(BackgroundScheduler())
+
+    text = prometheus_client.generate_latest(metrics_service.REGISTRY).decode()
+    assert 'epic_job_runs_total{job_id="daily_epic_games_task",status="ok"} 1.0' in text
+    assert 'epic_claims_total{result="succeeded"} 2.0' in text
+    assert 'epic_captcha_attempts_total{signal="SUCCESS"} 1.0' in text
+    assert 'epic_llm_calls_total{model="gemini-2.5-pro"} 1.0' in text
+    assert 'epic_next_run_timestamp_seconds{job_id="weekly_epic_games_task"}' in text
+
+
+def test_swallowed_failures_are_recorded_as_errors():
+    prometheus_client = pytest.importorskip("prometheus_client")
+    from apscheduler.events import (
+        EVENT_JOB_EXECUTED,
+        EVENT_JOB_SUBMITTED,
+        JobExecutionEvent,
+        JobSubmissionEvent,
+    )
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    # 浏览器任务捕获异常后返回 False，调度器只会发出 EXECUTED 事件
+    scheduler = BackgroundScheduler()
+    metrics_service.instrument_scheduler(scheduler)
+    now = datetime.now(timezone.utc)
+    scheduler._dispatch_event(JobSubmissionEvent(EVENT_JOB_SUBMITTED, "weekly_task", None, [now]))
+    scheduler._dispatch_event(
+        JobExecutionEvent(EVENT_JOB_EXECUTED, "weekly_task", None, now, retval=False)
+    )
+
+    with observe_job("swallowed_task") as run:
+        run.ok = False
+
+    text = prometheus_client.generate_latest(metrics_service.REGISTRY).decode()
+    assert 'epic_job_runs_total{job_id="weekly_task",status="error"} 1.0' in text
+    assert 'epic_job_runs_total{job_id="swallowed_task",status="error"} 1.0' in text
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/13 15:00
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 模型路由的对冲请求、失败切换与慢路由降级
+"""
+import asyncio
+
+import pytest
+
+from services.model_router_service import ModelRouter, Route, RouteStats
+
+PRO, FLASH = "gemini-2.5-pro", "gemini-2.5-flash"
+
+
+def _router(**kwargs) -> ModelRouter:
+    options = dict(hedge_min_delay=0.01, hedge_default_delay=0.05, slow_threshold=1)
+    return ModelRouter({PRO: [FLASH]}, **{**options, **kwargs})
+
+
+def test_slow_request_is_hedged_with_fallback_model():
+    router = _router()
+    calls = []
+
+    async def call(route: Route):
+        calls.append(route.model)
+        await asyncio.sleep(1 if route.model == PRO else 0.01)
+        return route.model
+
+    assert asyncio.run(router.generate(call, PRO)) == FLASH
+    assert calls == [PRO, FLASH]
+    # 被取消的慢请求记为截尾样本
+    assert router.stats(Route(PRO)).error_rate() == 0.0
+    assert len(router.stats(Route(PRO))._samples) == 1
+
+
+def test_route_that_always_loses_the_hedge_is_downgraded():
+    router = _router()
+    calls = []
+
+    async def call(route: Route):
+        calls.append(route.model)
+        await asyncio.sleep(1 if route.model == PRO else 0.001)
+        return route.model
+
+    async def run():
+        return [await router.generate(call, PRO) for _ in range(6)]
+
+    assert asyncio.run(run()) == [FLASH] * 6
+    # 前 5 次 pro 都先发、对冲落败；样本足够后 flash 直接首发，不再重复请求
+    assert calls[:10] == [PRO, FLASH] * 5
+    assert calls[10:] == [FLASH]
+    assert router.candidates(PRO)[0] == Route(FLASH)
+
+
+def test_failed_request_switches_to_next_candidate():
+    router = _router(base_urls=["https://relay.example"])
+
+    async def call(route: Route):
+        if route.base_url is None:
+            raise RuntimeError("502 Bad Gateway")
+        return route
+
+    assert asyncio.run(router.generate(call, PRO)) == Route(PRO, "https://relay.example")
+
+    async def fail(route: Route):
+        raise RuntimeError("503")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(router.generate(fail, PRO))
+
+
+def test_slow_route_is_downgraded_until_samples_expire():
+    router = _router()
+    stats = router.stats(Route(PRO))
+    for _ in range(5):
+        stats.record(3.0, True)
+
+    assert router.hedge_delay(Route(PRO)) == 3.0
+    assert router.candidates(PRO)[0] == Route(FLASH)
+
+    stats.ttl = 0
+    assert router.candidates(PRO)[0] == Route(PRO)
+
+
+def test_route_stats_error_rate():
+    stats = RouteStats(window=10, ttl=60)
+    for ok in (True, False, False, True, False):
+        stats.record(0.5, ok, now=1)
+    assert stats.error_rate(now=2) == pytest.approx(0.6)
+    assert stats.quantile(0.9, now=2) is None
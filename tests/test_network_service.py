@@ -0,0 +1,62 @@
+from services.network_service import RequestBlocker
+
+
+def test_strict_profile_blocks_heavy_resources():
+    blocker = RequestBlocker("strict")
+    store = "https://store.epicgames.com/en-US/p/game"
+
+    assert blocker.classify("https://cdn1.epicgames.com/hero.mp4", "media", store) == "media"
+    assert blocker.classify("https://cdn1.epicgames.com/cover.jpg", "image", store) == "image"
+    assert blocker.classify("https://www.googletagmanager.com/gtm.js", "script", store) == "tracker"
+    assert blocker.classify("https://store.epicgames.com/app.js", "script", store) is None
+
+
+def test_captcha_and_purchase_frames_are_allowed():
+    blocker = RequestBlocker("strict")
+    hcaptcha_frame = "https://newassets.hcaptcha.com/captcha/v1/abc/static/hcaptcha.html"
+
+    assert blocker.classify("https://imgs3.hcaptcha.com/tip/x.jpg", "image") is None
+    assert blocker.classify("https://cdn.example.com/tile.png", "image", hcaptcha_frame) is None
+    purchase_frame = "https://store.epicgames.com/purchase?offers=1"
+    assert blocker.classify("https://cdn1.epicgames.com/logo.png", "image", purchase_frame) is None
+
+
+def test_lite_profile_keeps_images():
+    blocker = RequestBlocker("lite")
+    assert blocker.classify("https://cdn1.epicgames.com/cover.jpg", "image") is None
+    assert blocker.classify("https://cdn1.epicgames.com/font.woff2", "font") == "font"
+
+
+def test_stats_report_estimated_bytes():
+    from services.network_service import ESTIMATED_BYTES, NetworkStats
+
+    stats = NetworkStats()
+    stats.blocked.update(["image", "image", "tracker"])
+    assert stats.blocked_requests == 3
+    assert stats.estimated_bytes_saved == 2 * ESTIMATED_BYTES["image"] + ESTIMATED_BYTES["tracker"]
+
+
+class _Context:
+    def __init__(self):
+        self.routes = []
+
+    async def route(self, url, handler):
+        self.routes.append(url)
+
+
+def test_only_blocked_resources_are_routed():
+    import asyncio
+
+    from services.network_service import apply_network_profile, tracker_globs
+
+    context = _Context()
+    assert asyncio.run(apply_network_profile(context, "off")) is None
+    assert context.routes == []
+
+    asyncio.run(apply_network_profile(context, "lite"))
+    assert "**/*" not in context.routes
+    assert "**/*.{woff,woff2,ttf,otf}" in context.routes
+    assert "**/*.{mp4,webm,m3u8,m4s,mov}?*" in context.routes
+    assert not any("png" in url for url in context.routes)
+    assert set(tracker_globs()) <= set(context.routes)
+    assert "*://*.googletagmanager.com/**" in context.routes
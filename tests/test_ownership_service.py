@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/10 16:30
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 订单记录分页与批量归属查询
+"""
+import asyncio
+
+from fake_epic_store import FakeEpicStore, FakeGame
+from services.ledger_service import ClaimLedger
+from services.ownership_service import OwnershipClient
+
+
+class _Response:
+    def __init__(self, payload: dict):
+        self.payload = payload
+        self.ok = True
+        self.status = 200
+
+    async def json(self):
+        return self.payload
+
+
+class _Request:
+    """以 APIRequestContext.get 的形式直接调用商城替身的订单接口"""
+
+    def __init__(self, store: FakeEpicStore):
+        self.store = store
+        self.tokens = []
+
+    async def get(self, url, params=None):
+        token = (params or {}).get("nextPageToken")
+        self.tokens.append(token)
+        return _Response(self.store.order_history(token, page_size=2))
+
+
+def _store(n: int) -> FakeEpicStore:
+    catalog = [FakeGame(f"g{i}", f"Game {i}", f"{i:032d}", f"offer-{i}") for i in range(n)]
+    store = FakeEpicStore(catalog=catalog)
+    for i, game in enumerate(catalog):
+        store.state.claimed[game.offer_id] = 1000 + i
+    return store
+
+
+def test_sync_pages_until_cursor_and_answers_in_batch(tmp_path):
+    with _store(5) as store:
+        request = _Request(store)
+        ledger = ClaimLedger("a@b.c", ledger_dir=tmp_path)
+        client = OwnershipClient(request, ledger)
+
+        assert len(asyncio.run(client.sync())) == 5
+        assert request.tokens == [None, "2", "4"]
+        assert ledger.cursor == 1004
+
+        owned = client.owned([f"{0:032d}", "offer-4", "unknown"])
+        assert owned == {f"{0:032d}": True, "offer-4": True, "unknown": False}
+
+        # 第二次同步在第一页遇到游标即停止
+        store.state.claimed["offer-new"] = 2000
+        store.state.catalog.append(FakeGame("new", "New", "n" * 32, "offer-new"))
+        request.tokens.clear()
+        assert [i.offerId for i in asyncio.run(client.sync())] == ["offer-new"]
+        assert request.tokens == [None]
+
+
+def test_truncated_sync_keeps_cursor_and_resumes(tmp_path):
+    with _store(5) as store:
+        request = _Request(store)
+        ledger = ClaimLedger("a@b.c", ledger_dir=tmp_path)
+        client = OwnershipClient(request, ledger, max_pages=1)
+
+        assert [i.offerId for i in asyncio.run(client.sync())] == ["offer-4", "offer-3"]
+        assert ledger.cursor is None
+        assert ledger.backfill == {"next_page_token": "2", "cursor": None, "latest": 1004}
+
+        # 断点之前新增的订单先同步，再从断点继续
+        store.state.claimed["offer-new"] = 2000
+        store.state.catalog.append(FakeGame("new", "New", "n" * 32, "offer-new"))
+        request.tokens.clear()
+        # 下标形式的 nextPageToken 随新订单后移，重复拉到的 offer-3 由台账去重
+        synced = [i.offerId for i in asyncio.run(client.sync())]
+        assert synced == ["offer-new", "offer-3", "offer-2"]
+        assert request.tokens == [None, "2"]
+        assert ledger.cursor is None
+
+        while ledger.backfill:
+            asyncio.run(client.sync())
+        assert ledger.cursor == 2000
+        assert all(client.owned(f"offer-{i}" for i in range(5)).values())
@@ -0,0 +1,54 @@
+from datetime import datetime, timezone
+
+from models import OrderItem
+from services.ledger_service import ClaimLedger
+from services.preflight_service import WAKEUP_DELAY, plan_run
+
+NOW = datetime(2025, 8, 7, 12, 0, tzinfo=timezone.utc)
+
+
+def _element(namespace: str, key: str, start: str, end: str, discount: int = 0) -> dict:
+    offer = {
+        "startDate": start,
+        "endDate": end,
+        "discountSetting": {"discountPercentage": discount},
+    }
+    return {
+        "title": namespace,
+        "id": f"offer-{namespace}",
+        "namespace": namespace,
+        "promotions": {key: [{"promotionalOffers": [offer]}]},
+    }
+
+
+def _feed(*elements: dict) -> dict:
+    return {"data": {"Catalog": {"searchStore": {"elements": list(elements)}}}}
+
+
+FEED = _feed(
+    _element("ns-active", "promotionalOffers", "2025-07-31T15:00:00.000Z", "2025-08-07T15:00:00.000Z"),
+    _element("ns-paid", "promotionalOffers", "2025-07-31T15:00:00.000Z", "2025-08-07T15:00:00.000Z", 50),
+    _element("ns-next", "upcomingPromotionalOffers", "2025-08-07T15:00:00.000Z", "2025-08-14T15:00:00.000Z"),
+)
+
+
+def test_plan_run_with_unclaimed_promotion():
+    plan = plan_run(FEED, set(), now=NOW)
+    assert plan.should_run
+    assert [w.namespace for w in plan.claimable] == ["ns-active"]
+    assert plan.next_wakeup == datetime(2025, 8, 7, 15, tzinfo=timezone.utc) + WAKEUP_DELAY
+
+
+def test_plan_run_skips_claimed_promotions(tmp_path):
+    ledger = ClaimLedger("someone@example.com", ledger_dir=tmp_path)
+    item = OrderItem(description="", offerId="offer-active", namespace="ns-active")
+    assert ledger.add_items([item, item]) == 1
+
+    plan = plan_run(FEED, ClaimLedger("someone@example.com", ledger_dir=tmp_path), now=NOW)
+    assert not plan.should_run
+    assert plan.next_wakeup is not None
+
+
+def test_plan_run_fails_open_without_feed():
+    assert plan_run(None, set(), now=NOW).should_run
+    assert plan_run({"data": None}, set(), now=NOW).should_run
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/11 16:20
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : storage_state 精简导出与 Profile 缓存清理
+"""
+import asyncio
+import json
+
+from services.profile_service import (
+    compact_storage_state,
+    load_storage_state,
+    prune_profile,
+    remove_profile,
+    save_storage_state,
+)
+
+
+def _state() -> dict:
+    return {
+        "cookies": [
+            {"name": "EPIC_SSO_RM", "domain": ".epicgames.com", "value": "a"},
+            {"name": "EPIC_EG1", "domain": "store.epicgames.com", "value": "b"},
+            {"name": "_ga", "domain": ".google-analytics.com", "value": "c"},
+            {"name": "x", "domain": "notepicgames.com", "value": "d"},
+        ],
+        "origins": [
+            {"origin": "https://store.epicgames.com", "localStorage": [{"name": "k", "value": ""}]},
+            {"origin": "https://www.youtube.com", "localStorage": []},
+        ],
+    }
+
+
+class _Context:
+    async def storage_state(self):
+        return _state()
+
+
+def test_compact_storage_state_keeps_epic_origins():
+    state = compact_storage_state(_state())
+    assert [c["name"] for c in state["cookies"]] == ["EPIC_SSO_RM", "EPIC_EG1"]
+    assert [o["origin"] for o in state["origins"]] == ["https://store.epicgames.com"]
+
+
+def test_save_and_load_storage_state(tmp_path):
+    path = tmp_path.joinpath("account", "storage_state.json")
+    assert load_storage_state(path) is None
+
+    asyncio.run(save_storage_state(_Context(), path))
+    state = load_storage_state(path)
+    assert len(state["cookies"]) == 2
+    assert not path.with_suffix(".tmp").exists()
+
+    path.write_text("{", encoding="utf8")
+    assert load_storage_state(path) is None
+
+
+def test_prune_profile_keeps_login_state(tmp_path):
+    tmp_path.joinpath("cache2", "entries").mkdir(parents=True)
+    tmp_path.joinpath("cache2", "entries", "blob").write_bytes(b"x" * 1024)
+    tmp_path.joinpath("startupCache").mkdir()
+    tmp_path.joinpath("startupCache", "scriptCache.bin").write_bytes(b"x" * 512)
+    tmp_path.joinpath("places.sqlite").write_bytes(b"places")
+    tmp_path.joinpath("places.sqlite-wal").write_bytes(b"wal")
+    tmp_path.joinpath("cookies.sqlite").write_bytes(b"cookies")
+    tmp_path.joinpath("storage", "default").mkdir(parents=True)
+    tmp_path.joinpath("session.json").write_text(json.dumps({"valid_until": 0}))
+
+    assert prune_profile(tmp_path) == 1536
+    remaining = sorted(p.name for p in tmp_path.iterdir())
+    assert remaining == [
+        "cookies.sqlite",
+        "places.sqlite",
+        "places.sqlite-wal",
+        "session.json",
+        "storage",
+    ]
+    assert prune_profile(tmp_path) == 0
+
+
+def test_remove_profile_keeps_snapshot_and_session(tmp_path):
+    tmp_path.joinpath("cache2", "entries").mkdir(parents=True)
+    tmp_path.joinpath("cache2", "entries", "blob").write_bytes(b"x" * 1024)
+    tmp_path.joinpath("cookies.sqlite").write_bytes(b"x" * 512)
+    tmp_path.joinpath("storage_state.json").write_text("{}")
+    tmp_path.joinpath("session.json").write_text("{}")
+
+    assert remove_profile(tmp_path, keep=("storage_state.json", "session.json")) == 1536
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["session.json", "storage_state.json"]
@@ -0,0 +1,169 @@
+import asyncio
+import json
+
+import httpx
+
+from models import Account
+from services import promotions_service
+from services.promotions_service import (
+    PromotionsClient,
+    discover_promotions,
+    parse_max_age,
+    parse_promotions,
+    promotions_for_account,
+)
+
+
+def _feed(*titles: str) -> dict:
+    elements = []
+    for i, title in enumerate(titles):
+        elements.append(
+            {
+                "title": title,
+                "id": f"offer-{i}",
+                "namespace": f"{i:032d}",
+                "description": title,
+                "offerType": "BASE_GAME",
+                "productSlug": f"game-{i}",
+                "promotions": {
+                    "promotionalOffers": [
+                        {"promotionalOffers": [{"discountSetting": {"discountPercentage": 0}}]}
+                    ]
+                },
+            }
+        )
+    return {"data": {"Catalog": {"searchStore": {"elements": elements}}}}
+
+
+class _FakeBackend:
+    def __init__(self, payload: dict, headers: dict):
+        self.payload = payload
+        self.headers = headers
+        self.calls: list[dict] = []
+
+        self.offline = False
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        if self.offline:
+            raise httpx.ConnectError("offline", request=request)
+        names = ("If-None-Match", "If-Modified-Since")
+        conditional = {k: request.headers[k] for k in names if k in request.headers}
+        self.calls.append(conditional)
+        if "ETag" in self.headers and conditional.get("If-None-Match") == self.headers["ETag"]:
+            return httpx.Response(304, headers=self.headers)
+        return httpx.Response(200, headers=self.headers, content=json.dumps(self.payload).encode())
+
+
+def _titles(backend: _FakeBackend, tmp_path, client: PromotionsClient | None = None) -> list:
+    async def _run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(backend)) as http:
+            target = client or PromotionsClient(cache_dir=tmp_path)
+            target._http = http
+            return [p.title for p in await target.get_promotions()]
+
+    return asyncio.run(_run())
+
+
+def test_parse_max_age():
+    assert parse_max_age(httpx.Headers({"Cache-Control": "public, max-age=300"})) == 300
+    assert parse_max_age(httpx.Headers({"Cache-Control": "max-age=300", "Age": "100"})) == 200
+    assert parse_max_age(httpx.Headers({"Cache-Control": "no-cache, max-age=300"})) == 0
+    assert parse_max_age(httpx.Headers({})) == 0
+
+
+def test_fresh_snapshot_skips_request(tmp_path):
+    backend = _FakeBackend(_feed("A", "B"), {"ETag": '"v1"', "Cache-Control": "max-age=600"})
+
+    client = PromotionsClient(cache_dir=tmp_path)
+    assert _titles(backend, tmp_path, client) == ["A", "B"]
+    assert _titles(backend, tmp_path, client) == ["A", "B"]
+    assert len(backend.calls) == 1
+
+    # A new process reuses the on-disk snapshot while it is still fresh
+    assert len(_titles(backend, tmp_path)) == 2
+    assert len(backend.calls) == 1
+
+
+def test_stale_snapshot_sends_conditional_request(tmp_path):
+    backend = _FakeBackend(_feed("A"), {"ETag": '"v1"', "Cache-Control": "max-age=0"})
+
+    _titles(backend, tmp_path)
+    assert backend.calls[0] == {}
+
+    backend.payload = _feed("changed")
+    assert _titles(backend, tmp_path) == ["A"]
+    assert backend.calls[1] == {"If-None-Match": '"v1"'}
+
+
+def test_network_error_falls_back_to_snapshot(tmp_path):
+    backend = _FakeBackend(_feed("A"), {"Cache-Control": "max-age=0"})
+    _titles(backend, tmp_path)
+
+    backend.offline = True
+    assert _titles(backend, tmp_path) == ["A"]
+
+
+def test_parser_ignores_unknown_fields_and_null_sections():
+    feed = _feed("Game", "Mystery Collection")
+    elements = feed["data"]["Catalog"]["searchStore"]["elements"]
+    elements[0]["keyImages"] = [{"type": "Thumbnail", "url": "https://cdn/x.png"}]
+    elements[0]["offerMappings"] = [{"pageSlug": "mapped-slug", "pageType": "productHome"}]
+    elements[1]["categories"] = None
+    elements.append({"title": "Paid", "id": "p", "namespace": "n" * 32, "promotions": None})
+
+    promotions = parse_promotions(json.dumps(feed).encode())
+    assert [p.url for p in promotions] == [
+        "https://store.epicgames.com/en-US/p/mapped-slug",
+        "https://store.epicgames.com/en-US/bundles/game-1",
+    ]
+
+
+def test_invalid_element_is_dropped_instead_of_the_feed(tmp_path):
+    feed = _feed("A", "B")
+    elements = feed["data"]["Catalog"]["searchStore"]["elements"]
+    elements[0]["namespace"] = None
+    elements.append("not-an-element")
+
+    assert [p.title for p in parse_promotions(feed)] == ["B"]
+    # 新数据只有一个坏商品时仍然使用新数据，而不是回退到旧快照
+    backend = _FakeBackend(_feed("Old"), {"Cache-Control": "max-age=0"})
+    _titles(backend, tmp_path)
+    backend.payload = feed
+    assert _titles(backend, tmp_path) == ["B"]
+
+
+def test_discover_merges_region_feeds(tmp_path, monkeypatch):
+    feeds = {"US": _feed("A", "B"), "CN": _feed("A")}
+    requested = []
+
+    def backend(request: httpx.Request) -> httpx.Response:
+        country = request.url.params["country"]
+        requested.append(country)
+        return httpx.Response(200, content=json.dumps(feeds[country]).encode())
+
+    monkeypatch.setattr(promotions_service, "_region_clients", {})
+    default_client = PromotionsClient(cache_dir=tmp_path)
+    monkeypatch.setattr(promotions_service, "promotions_client", default_client)
+
+    async def _run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(backend)) as http:
+            for country in ("US", "CN"):
+                promotions_service.client_for_region(country)._http = http
+            promotions = await discover_promotions(["us", "CN", "US"])
+            for country in ("US", "CN"):
+                await promotions_service.client_for_region(country).flush()
+            return promotions
+
+    promotions = asyncio.run(_run())
+    assert sorted(requested) == ["CN", "US"]
+    assert [(p.title, p.regions) for p in promotions] == [("A", ["US", "CN"]), ("B", ["US"])]
+    # 每个地区的快照单独保存
+    assert {p.name for p in tmp_path.glob("promotions-*.json")} >= {
+        "promotions-us.json",
+        "promotions-cn.json",
+    }
+
+    account = Account(email="a@b.c", password="x", country="cn")
+    assert [p.title for p in promotions_for_account(promotions, account)] == ["A"]
+    anywhere = Account(email="a@b.c", password="x")
+    assert len(promotions_for_account(promotions, anywhere)) == 2
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/7 22:05
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 录屏策略与录屏目录清理
+"""
+import os
+import time
+
+from loguru import logger
+
+from services import recording_service
+from services.recording_service import RecordingSession, enforce_retention
+
+
+def _video(path, size: int, age_days: float = 0):
+    path.write_bytes(b"0" * size)
+    mtime = time.time() - age_days * 86400
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_enforce_retention_removes_expired_then_oldest(tmp_path):
+    expired = _video(tmp_path / "expired.webm", 10, age_days=30)
+    oldest = _video(tmp_path / "oldest.webm", 600 * 1024, age_days=2)
+    newest = _video(tmp_path / "newest.webm", 600 * 1024, age_days=1)
+
+    removed = enforce_retention(tmp_path, max_total_mb=1, max_age_days=7)
+
+    assert removed == 2
+    assert not expired.exists() and not oldest.exists()
+    assert newest.exists()
+
+
+def test_off_and_sampled_modes(monkeypatch):
+    assert RecordingSession("off").context_options() == {}
+
+    monkeypatch.setattr(recording_service.settings, "RECORD_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(recording_service.settings, "RECORD_SAMPLED_WIDTH", 640)
+    options = RecordingSession("sampled").context_options()
+    assert options["record_video_size"] == {"width": 640, "height": 360}
+    options = RecordingSession("on-failure").context_options()
+    assert options["record_video_size"] == {"width": 640, "height": 360}
+    options = RecordingSession("always").context_options()
+    assert options["record_video_size"] == {"width": 1920, "height": 1080}
+
+
+def test_on_failure_keeps_video_only_after_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(recording_service, "RECORD_DIR", tmp_path)
+    monkeypatch.setattr(recording_service, "PENDING_DIR", tmp_path / ".pending")
+
+    with RecordingSession("on-failure") as ok:
+        ok.video_dir.mkdir(parents=True)
+        _video(ok.video_dir / "ok.webm", 10)
+    assert not ok.video_dir.exists()
+    assert not list(tmp_path.glob("*.webm"))
+
+    with RecordingSession("on-failure") as failed:
+        failed.video_dir.mkdir(parents=True)
+        _video(failed.video_dir / "failed.webm", 10)
+        logger.error("checkout failed")
+    assert [p.name for p in tmp_path.glob("*.webm")] == [f"failed-{failed.id}-failed.webm"]
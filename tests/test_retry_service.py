@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/8 21:10
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 有界重试策略
+"""
+import asyncio
+
+import pytest
+
+from services.retry_service import FatalError, RetryableError, RetryExhausted, RetryPolicy
+
+
+def _policy(**kwargs) -> RetryPolicy:
+    return RetryPolicy("test", base_delay=0, max_delay=0, **kwargs)
+
+
+def test_retries_until_success_and_records_attempts():
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise RetryableError("not yet")
+        return "done"
+
+    policy = _policy(max_attempts=5)
+    assert asyncio.run(policy.run(flaky)) == "done"
+    assert [r.outcome for r in policy.records] == ["retry", "retry", "ok"]
+
+
+def test_attempts_are_bounded():
+    async def always_fail():
+        raise RuntimeError("captcha failed")
+
+    policy = _policy(max_attempts=3)
+    with pytest.raises(RetryExhausted) as exc:
+        asyncio.run(policy.run(always_fail))
+    assert exc.value.attempts == 3
+    assert [r.outcome for r in policy.records] == ["retry", "retry", "exhausted"]
+
+
+def test_fatal_and_unlisted_errors_are_not_retried():
+    async def fatal():
+        raise FatalError("browser closed")
+
+    async def unlisted():
+        raise ValueError("bug")
+
+    policy = _policy(max_attempts=3)
+    with pytest.raises(FatalError):
+        asyncio.run(policy.run(fatal))
+
+    policy = _policy(max_attempts=3, retry_on=(RetryableError,))
+    with pytest.raises(ValueError):
+        asyncio.run(policy.run(unlisted))
+    assert [r.outcome for r in policy.records] == ["fatal"]
+
+
+def test_budget_stops_before_sleeping_past_it():
+    async def slow_fail():
+        raise RetryableError("slow")
+
+    policy = RetryPolicy("test", max_attempts=10, base_delay=5, max_delay=5, budget=0)
+    with pytest.raises(RetryExhausted) as exc:
+        asyncio.run(policy.run(slow_fail))
+    assert exc.value.attempts == 1
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/11 10:15
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 会话探测：Cookie 有效期、探测接口与 user_data 目录中的会话缓存
+"""
+import asyncio
+import time
+
+from services.session_service import SessionProbe, auth_cookie_expiry
+
+
+class _Response:
+    def __init__(self, status: int, content_type: str = "application/json"):
+        self.status = status
+        self.ok = 200 <= status < 300
+        self.headers = {"content-type": content_type}
+
+
+class _Request:
+    def __init__(self, status: int | Exception = 200):
+        self.status = status
+        self.calls = 0
+
+    async def get(self, url, **kwargs):
+        self.calls += 1
+        if isinstance(self.status, Exception):
+            raise self.status
+        return _Response(self.status)
+
+
+class _Context:
+    def __init__(self, cookies: list, status: int | Exception = 200):
+        self._cookies = cookies
+        self.request = _Request(status)
+
+    async def cookies(self, urls=None):
+        return self._cookies
+
+
+def _cookie(name: str = "EPIC_SSO_RM", expires: float = -1) -> dict:
+    return {"name": name, "value": "x", "expires": expires}
+
+
+def test_auth_cookie_expiry():
+    now = time.time()
+    assert auth_cookie_expiry([_cookie("other")]) is None
+    assert auth_cookie_expiry([_cookie(expires=now - 10)]) is None
+    assert auth_cookie_expiry([_cookie()]) == float("inf")
+    cookies = [_cookie(expires=now + 10), _cookie("EPIC_EG1", now + 20)]
+    assert auth_cookie_expiry(cookies) == now + 20
+
+
+def test_probe_runs_once_and_caches_until(tmp_path):
+    expires = time.time() + 60
+    context = _Context([_cookie(expires=expires)])
+
+    probe = SessionProbe(context, tmp_path)
+    assert asyncio.run(probe.check()) is True
+    assert asyncio.run(probe.check()) is True
+    assert context.request.calls == 1
+    # 有效期不会超过登录 Cookie 的过期时间
+    assert probe._cached_until() == expires
+
+    # 下一次运行（新的上下文）在有效期内不再请求探测接口
+    context = _Context([_cookie(expires=expires)])
+    assert asyncio.run(SessionProbe(context, tmp_path).check()) is True
+    assert context.request.calls == 0
+
+
+def test_probe_detects_logged_out_session(tmp_path):
+    context = _Context([_cookie()], status=401)
+    probe = SessionProbe(context, tmp_path)
+    probe.mark_valid(expiry=0)  # 已过期的缓存
+    assert asyncio.run(probe.check()) is True  # 同一次运行内沿用 mark_valid 的结果
+
+    probe = SessionProbe(context, tmp_path)
+    assert asyncio.run(probe.check()) is False
+    assert not probe.cache_path.exists()
+
+    # 登出后只剩非登录 Cookie，即使本地缓存仍在有效期内也需要重新登录
+    probe = SessionProbe(_Context([_cookie("_ga")]), tmp_path)
+    probe._save(time.time() + 3600)
+    assert asyncio.run(probe.check()) is False
+
+    # 没有 Cookie 或登录 Cookie 已过期时不需要请求接口
+    for cookies in ([], [_cookie(expires=time.time() - 1)]):
+        context = _Context(cookies)
+        assert asyncio.run(SessionProbe(context, tmp_path).check()) is False
+        assert context.request.calls == 0
+
+
+def test_probe_is_inconclusive_on_request_error(tmp_path):
+    context = _Context([_cookie()], status=RuntimeError("offline"))
+    assert asyncio.run(SessionProbe(context, tmp_path).check()) is None
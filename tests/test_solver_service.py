@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/9 11:00
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : 求解器按页面复用
+"""
+from services.solver_service import SolverManager
+
+
+class _StubPage:
+    def __init__(self):
+        self.handlers = {}
+        self.context = object()
+
+    def on(self, event, handler):
+        self.handlers.setdefault(event, []).append(handler)
+
+    def once(self, event, handler):
+        self.on(event, handler)
+
+    def close(self):
+        for handler in self.handlers.pop("close", []):
+            handler(self)
+
+
+def test_agent_is_created_once_per_page(monkeypatch):
+    created = []
+
+    class _Agent:
+        def __init__(self, page, agent_config):
+            created.append(page)
+            page.on("response", lambda r: None)
+            self.robotic_arm = None
+
+    monkeypatch.setattr("hcaptcha_challenger.agent.AgentV", _Agent)
+    manager = SolverManager()
+    page = _StubPage()
+
+    assert manager.get(page) is manager.get(page)
+    assert len(created) == 1
+    assert len(page.handlers["response"]) == 1
+
+    page.close()
+    manager.get(page)
+    assert len(created) == 2
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/12 11:30
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : span 嵌套、属性继承、token 用量累加与 JSONL/OTLP 导出
+"""
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from services import tracing_service
+from services.tracing_service import (
+    JsonlSpanExporter,
+    OtlpSpanExporter,
+    Tracer,
+    record_llm_usage,
+    summarize_spans,
+)
+
+
+def _read(path) -> list:
+    return [json.loads(line) for line in path.read_text(encoding="utf8").splitlines()]
+
+
+def test_nested_spans_are_exported_to_jsonl(tmp_path):
+    exporter = JsonlSpanExporter(tmp_path.joinpath("traces.jsonl"))
+    tracer = Tracer(exporter)
+
+    @tracer.traced("checkout.cart")
+    async def checkout():
+        with tracer.span("captcha.challenge") as s:
+            with tracer.span("llm.generate_content") as llm:
+                usage = SimpleNamespace(
+                    prompt_token_count=100, candidates_token_count=20, total_token_count=120
+                )
+                record_llm_usage(llm, "gemini-2.5-pro", SimpleNamespace(usage_metadata=usage))
+            s.set(**{"captcha.signal": "SUCCESS"})
+
+    async def run():
+        with tracer.attributes(account="a@b.c"), tracer.span("run"):
+            await checkout()
+
+    asyncio.run(run())
+    exporter.flush()
+
+    spans = {s["name"]: s for s in _read(exporter.path)}
+    assert list(spans) == ["llm.generate_content", "captcha.challenge", "checkout.cart", "run"]
+    assert {s["trace_id"] for s in spans.values()} == {spans["run"]["trace_id"]}
+    assert spans["checkout.cart"]["parent_id"] == spans["run"]["span_id"]
+    assert all(s["attributes"]["account"] == "a@b.c" for s in spans.values())
+
+    captcha = spans["captcha.challenge"]["attributes"]
+    assert captcha["llm.total_tokens"] == 120
+    assert captcha["llm.models"] == ["gemini-2.5-pro"]
+    assert spans["run"]["attributes"]["llm.calls"] == 1
+
+
+def test_span_records_errors_and_otlp_encoding():
+    exporter = OtlpSpanExporter("http://collector:4318", batch_size=100)
+    tracer = Tracer(exporter)
+
+    with pytest.raises(RuntimeError):
+        with tracer.span("order.sync", **{"retry": 2, "ok": False}):
+            raise RuntimeError("boom")
+
+    payload = exporter.encode(exporter._buffer)
+    otlp_span = payload["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert otlp_span["name"] == "order.sync"
+    assert otlp_span["status"]["code"] == 2
+    assert {"key": "retry", "value": {"intValue": "2"}} in otlp_span["attributes"]
+    assert {"key": "ok", "value": {"boolValue": False}} in otlp_span["attributes"]
+
+
+def test_summarize_spans():
+    records = [{"name": "page.goto", "duration_ms": float(i)} for i in range(1, 101)]
+    records.append({"name": "login", "duration_ms": 5.0})
+    summary = summarize_spans(records)
+    assert list(summary) == ["page.goto", "login"]
+    assert summary["page.goto"]["count"] == 100
+    assert summary["page.goto"]["p95"] == 96.0
+
+
+def test_otlp_flush_does_not_wait_for_collector(monkeypatch):
+    posted = []
+
+    class _Response:
+        def raise_for_status(self):
+            pass
+
+    def slow_post(url, json=None, timeout=None):
+        time.sleep(0.3)
+        posted.append(json)
+        return _Response()
+
+    monkeypatch.setattr(tracing_service.httpx, "post", slow_post)
+    exporter = OtlpSpanExporter("http://collector:4318")
+    tracer = Tracer(exporter)
+    with tracer.span("page.goto"):
+        pass
+
+    start = time.perf_counter()
+    tracer.flush()
+    assert time.perf_counter() - start < 0.1
+    assert not posted
+
+    assert exporter.shutdown(timeout=2)
+    assert len(posted) == 1